@@ -0,0 +1,192 @@
+#Command line front end for vectorMagnet: field maps from batch files without Matlab, and end-to-end timing.
+#Run from the repository root as: python -m FrontEndPython.cli --help
+import argparse
+import csv
+import os
+import sys
+import time
+import numpy as np
+try:
+    from MultiAxisClass.vectorMagnet import vectorMagnet
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+    from MultiAxisClass.fieldSweep import fieldSweep
+    from MultiAxisClass.coordinates import sphericalToCartesian, alignmentFrame
+except ImportError:
+    #Run as a script, put the repository root on the python path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from MultiAxisClass.vectorMagnet import vectorMagnet
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+    from MultiAxisClass.fieldSweep import fieldSweep
+    from MultiAxisClass.coordinates import sphericalToCartesian, alignmentFrame
+
+#Number of field values per row for each coordinate system
+COORDINATE_VALUES = {'cartesian': 3, 'spherical': 3, 'polar': 2}
+
+OUTPUT_COLUMNS = ['index', 'coordinates', 'target1', 'target2', 'target3', 'dwell', 'Bx', 'By', 'Bz', 'state',
+                  'rampTime', 'elapsed']
+
+def parseBatch(lines, defaultCoordinates: str = 'cartesian') -> list[tuple[str, tuple[float, ...], float]]:
+    """Parses batch lines into (coordinates, values, dwell) points.
+    Each line is comma or whitespace separated: an optional coordinate name (cartesian, spherical, polar), the field
+    values in the present units (3, or 2 for polar magnitude and angle), and an optional dwell time in seconds.
+    Blank lines, lines starting with # and one non-numeric header line before the first point are skipped.
+    """
+    points = []
+    headerSkipped = False
+    for lineNumber, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.replace(',', ' ').split()
+        coordinates = defaultCoordinates
+        if fields[0].lower() in COORDINATE_VALUES:
+            coordinates = fields.pop(0).lower()
+        try:
+            numbers = [float(field) for field in fields]
+        except ValueError:
+            if not points and not headerSkipped:
+                headerSkipped = True
+                continue
+            raise Exception("Line " + str(lineNumber) + ": values must be numbers: " + line)
+        count = COORDINATE_VALUES[coordinates]
+        if len(numbers) not in (count, count+1):
+            raise Exception("Line " + str(lineNumber) + ": " + coordinates + " needs " + str(count)
+                            + " values and an optional dwell time: " + line)
+        dwell = numbers[count] if len(numbers) > count else 0.0
+        if dwell < 0:
+            raise Exception("Line " + str(lineNumber) + ": dwell time must not be negative.")
+        points.append((coordinates, tuple(numbers[:count]), dwell))
+    return points
+
+def batchSweep(magnet, points, waitTimeout: float | None = None) -> fieldSweep:
+    """Builds a Cartesian fieldSweep of the batch points in the given order, so every point is checked against the
+    field limits before anything is sent. Spherical points are converted directly and polar points through the
+    present alignment vectors; the ranges only those coordinates have are checked first."""
+    for index, (coordinates, values, dwell) in enumerate(points):
+        if coordinates != 'cartesian' and values[0] < 0:
+            raise Exception("Point " + str(index) + ": negative magnitude.")
+        if coordinates == 'spherical' and not 0 <= values[2] <= 180:
+            raise Exception("Point " + str(index) + ": inclination out of range.")
+    cartesian = []
+    frame = None
+    for coordinates, values, dwell in points:
+        if coordinates == 'cartesian':
+            cartesian.append(values)
+        elif coordinates == 'spherical':
+            cartesian.append(sphericalToCartesian(values))
+        else:
+            if frame is None:
+                frame = alignmentFrame.fromMagnet(magnet)
+            cartesian.append(frame.polarToCartesian(values))
+    return fieldSweep(magnet, np.array(cartesian, dtype=float).reshape(-1, 3), 'cartesian',
+                      [dwell for _, _, dwell in points], waitTimeout=waitTimeout)
+
+def runBatch(magnet, points, output, waitTimeout: float | None = None, log=sys.stderr) -> dict:
+    """Drives the magnet through points, writing one CSV readback row per point to output.
+    All points are validated first, see batchSweep(). Returns a summary with the total time, per-point ramp times
+    and throughput."""
+    sweep = batchSweep(magnet, points, waitTimeout)
+    writer = csv.writer(output)
+    writer.writerow(OUTPUT_COLUMNS)
+    startTime = time.monotonic()
+    rampTimes = []
+    previousElapsed = 0.0
+    for readback in sweep:
+        index = readback.index
+        coordinates, values, dwell = points[index]
+        rampTime = readback.arrivalTime - previousElapsed
+        previousElapsed = readback.elapsed
+        rampTimes.append(rampTime)
+        field, state = readback.field, readback.state
+        paddedValues = list(values) + [''] * (3 - len(values))
+        writer.writerow([index, coordinates, *paddedValues, dwell, *field, state, f'{rampTime:.3f}',
+                         f'{time.monotonic() - startTime:.3f}'])
+        output.flush()
+        if log is not None:
+            print(f"Point {index+1}/{len(points)} reached in {rampTime:.2f} s", file=log)
+    totalTime = time.monotonic() - startTime
+    return {
+        'points': len(points),
+        'totalTime': totalTime,
+        'meanRampTime': sum(rampTimes)/len(rampTimes) if rampTimes else 0.0,
+        'maxRampTime': max(rampTimes, default=0.0),
+        'pointsPerMinute': 60*len(points)/totalTime if totalTime > 0 else 0.0,
+    }
+
+def formatSummary(summary: dict, transactionSummary: dict | None = None) -> str:
+    lines = [f"{summary['points']} points in {summary['totalTime']:.2f} s "
+             f"({summary['pointsPerMinute']:.2f} points/min)",
+             f"Ramp and settle time per point: mean {summary['meanRampTime']:.2f} s, max {summary['maxRampTime']:.2f} s"]
+    if transactionSummary is not None:
+        lines.append(f"{transactionSummary['transactions']} pipe transactions, "
+                     f"{transactionSummary['latencyTotal']:.2f} s waiting for responses, "
+                     f"{transactionSummary['sleepTotal']:.2f} s in the query rate limit, "
+                     f"{transactionSummary['errorCheckTransactions']} error checks")
+    return '\n'.join(lines)
+
+def buildParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Run vector magnet targets from the command line.')
+    parser.add_argument('--program', default=None, help='Multi-Axis executable. Defaults to the lab install path.')
+    parser.add_argument('--simulator', action='store_true', help='Run against the simulated Multi-Axis program.')
+    parser.add_argument('--simulator-ramp-rate', type=float, default=0.1, help='Simulated ramp rate in tesla per second.')
+    parser.add_argument('--settings', default=None, help='.sav file to load before connecting.')
+    parser.add_argument('--query-interval', type=float, default=1.001, help='Minimum seconds between instrument queries.')
+    parser.add_argument('--record', default=None, help='Record all pipe traffic to this session file.')
+    parser.add_argument('--replay', default=None, help='Replay a recorded session file instead of running Multi-Axis.')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay this many times faster than recorded, 0 for no delays.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Drive through the targets in a batch or CSV file.')
+    run.add_argument('batchFile', help="Batch file, or '-' for stdin. See parseBatch for the line format.")
+    run.add_argument('--coordinates', choices=sorted(COORDINATE_VALUES), default='cartesian',
+                     help='Coordinates of rows that do not name them.')
+    run.add_argument('--output', default='-', help="CSV file for the readbacks, '-' for stdout.")
+    run.add_argument('--wait-timeout', type=float, default=None, help='Seconds to wait for each point.')
+    run.add_argument('--zero', action='store_true', help='Ramp to zero after the last point.')
+    run.add_argument('--transactions', action='store_true', help='Also report pipe transaction statistics.')
+
+    commands.add_parser('status', help='Print field, state, target and time to target.')
+    commands.add_parser('zero', help='Ramp to zero field and wait.')
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = buildParser().parse_args(argv)
+    points = None
+    if args.command == 'run':
+        if args.batchFile == '-':
+            points = parseBatch(sys.stdin, args.coordinates)
+        else:
+            with open(args.batchFile) as batchFile:
+                points = parseBatch(batchFile, args.coordinates)
+
+    program = simulatorCommand(rampRate=args.simulator_ramp_rate) if args.simulator else args.program
+    magnet = vectorMagnet(multiProgramPath=program, queryInterval=args.query_interval, recordPath=args.record,
+                          replayPath=args.replay, replaySpeed=args.replay_speed or None)
+    transactions = magnet.enableTransactionLog() if getattr(args, 'transactions', False) else None
+    try:
+        magnet.startup(settingsFile=args.settings or False)
+        if args.command == 'status':
+            snapshot = magnet.getStatusSnapshot()
+            for name, value in snapshot._asdict().items():
+                print(f"{name}: {value}")
+        elif args.command == 'zero':
+            magnet.enableZeroMode()
+            magnet.waitUntilHolding()
+        else:
+            output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+            try:
+                summary = runBatch(magnet, points, output, args.wait_timeout)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+            if args.zero:
+                magnet.enableZeroMode()
+                magnet.waitUntilHolding(timeout=args.wait_timeout)
+            print(formatSummary(summary, None if transactions is None else transactions.summary()), file=sys.stderr)
+    finally:
+        magnet.exit_program()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
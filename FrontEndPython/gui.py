@@ -0,0 +1,206 @@
+#Live field display for vectorMagnet.
+#A background thread does all instrument I/O and hands samples to the Tk thread through a queue, so the window
+#never waits on the query rate limit or a slow response. Plots are min/max decimated to the canvas width, and the
+#history halves its resolution when full, so memory and redraw time stay flat over days of running.
+#Run from the repository root as: python -m FrontEndPython.gui --help
+import argparse
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+import numpy as np
+try:
+    from MultiAxisClass.vectorMagnet import vectorMagnet
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+except ImportError:
+    #Run as a script, put the repository root on the python path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from MultiAxisClass.vectorMagnet import vectorMagnet
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+
+STATE_NAMES = {0: 'DISCONNECTED', 1: 'RAMPING', 2: 'HOLDING', 3: 'PAUSED', 4: 'ZEROING', 5: 'AT ZERO FIELD',
+               6: 'QUENCH DETECTED', 7: 'HEATING SWITCHES', 8: 'COOLING SWITCHES'}
+
+#Plot spans offered in the window, in seconds. None shows the whole history.
+PLOT_SPANS = {'10 min': 600, '1 h': 3600, '12 h': 43200, 'All': None}
+TRACE_COLOURS = {'|B|': 'black', 'Bx': 'red', 'By': 'green', 'Bz': 'blue'}
+
+def decimate(times: np.ndarray, values: np.ndarray, maxPoints: int) -> tuple[np.ndarray, np.ndarray]:
+    """Reduces a trace to at most maxPoints points by keeping the minimum and maximum of each bucket,
+    so short spikes survive. Shorter traces are returned unchanged."""
+    count = len(times)
+    if count <= maxPoints:
+        return times, values
+    buckets = max(1, maxPoints//2)
+    edges = np.linspace(0, count, buckets + 1).astype(int)
+    argMin = np.array([start + int(np.argmin(values[start:end])) for start, end in zip(edges[:-1], edges[1:])])
+    argMax = np.array([start + int(np.argmax(values[start:end])) for start, end in zip(edges[:-1], edges[1:])])
+    #Keep each pair in time order so the line does not double back
+    first = np.minimum(argMin, argMax)
+    second = np.maximum(argMin, argMax)
+    kept = np.column_stack((first, second)).ravel()
+    return times[kept], values[kept]
+
+class sampleHistory:
+    """Time, Bx, By, Bz rows in a fixed size array. When it fills, every other row is dropped, so older data is
+    kept at progressively lower resolution instead of being discarded."""
+    def __init__(self, capacity: int = 200000):
+        self.rows = np.empty((capacity, 4))
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp: float, field: tuple[float, float, float]):
+        with self._lock:
+            if self.count == len(self.rows):
+                half = self.rows[:self.count:2]
+                self.count = len(half)
+                self.rows[:self.count] = half
+            self.rows[self.count] = (timestamp, *field)
+            self.count += 1
+
+    def window(self, span: float | None) -> np.ndarray:
+        """Returns a copy of the rows within span seconds of the newest one (all rows if span is None)."""
+        with self._lock:
+            rows = self.rows[:self.count].copy()
+        if span is None or not len(rows):
+            return rows
+        return rows[np.searchsorted(rows[:, 0], rows[-1, 0] - span):]
+
+class fieldAcquisition:
+    """Reads a status snapshot from magnet every interval seconds on a background thread.
+    Each snapshot is added to history and put on samples for the display; errors go on samples as exceptions."""
+    def __init__(self, magnet, interval: float | None = None, history: sampleHistory | None = None):
+        self.magnet = magnet
+        #A snapshot takes four queries
+        self.interval = 4*magnet.queryLimiter.interval if interval is None else interval
+        self.history = sampleHistory() if history is None else history
+        self.samples = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.__acquireLoop, name='fieldAcquisition', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __acquireLoop(self):
+        while not self._stop.is_set():
+            cycleStart = time.monotonic()
+            try:
+                snapshot = self.magnet.getStatusSnapshot()
+            except Exception as error:
+                self.samples.put(error)
+            else:
+                self.history.append(snapshot.timestamp, snapshot.field)
+                self.samples.put(snapshot)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - cycleStart)))
+
+class fieldDisplay:
+    """Tk window showing the latest |B|, Bx, By, Bz, state and time to target, and a plot of the history.
+    Only drains acquisition.samples from the Tk event loop; it never calls the magnet itself."""
+    def __init__(self, root: tk.Tk, acquisition: fieldAcquisition, refreshInterval: int = 200):
+        self.root = root
+        self.acquisition = acquisition
+        self.refreshInterval = refreshInterval
+        self.units = 'T' if acquisition.magnet.fieldUnits in (None, 1) else 'kG'
+        root.title('Vector magnet')
+
+        readouts = ttk.Frame(root, padding=8)
+        readouts.pack(side=tk.TOP, fill=tk.X)
+        self.values = {}
+        for column, name in enumerate(('|B|', 'Bx', 'By', 'Bz', 'State', 'Time to target')):
+            ttk.Label(readouts, text=name).grid(row=0, column=column, padx=6)
+            self.values[name] = tk.StringVar(value='-')
+            ttk.Label(readouts, textvariable=self.values[name], font=('TkFixedFont', 14)).grid(row=1, column=column,
+                                                                                               padx=6)
+        controls = ttk.Frame(root, padding=(8, 0))
+        controls.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(controls, text='Span').pack(side=tk.LEFT)
+        self.span = tk.StringVar(value='10 min')
+        ttk.Combobox(controls, textvariable=self.span, values=list(PLOT_SPANS), width=8,
+                     state='readonly').pack(side=tk.LEFT, padx=4)
+        self.status = tk.StringVar(value='')
+        ttk.Label(controls, textvariable=self.status, foreground='red').pack(side=tk.LEFT, padx=8)
+
+        self.canvas = tk.Canvas(root, width=800, height=300, background='white')
+        self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        root.after(self.refreshInterval, self.refresh)
+
+    def refresh(self):
+        latest = None
+        try:
+            while True:
+                sample = self.acquisition.samples.get_nowait()
+                if isinstance(sample, Exception):
+                    self.status.set('Read failed: ' + str(sample))
+                else:
+                    latest = sample
+        except queue.Empty:
+            pass
+        if latest is not None:
+            self.status.set('')
+            Bx, By, Bz = latest.field
+            for name, value in (('|B|', math.sqrt(Bx*Bx + By*By + Bz*Bz)), ('Bx', Bx), ('By', By), ('Bz', Bz)):
+                self.values[name].set(f'{value:+.5f} {self.units}')
+            self.values['State'].set(STATE_NAMES.get(latest.state, str(latest.state)))
+            self.values['Time to target'].set(f'{latest.timeToTarget:.1f} s')
+            self.drawPlot()
+        self.root.after(self.refreshInterval, self.refresh)
+
+    def drawPlot(self):
+        self.canvas.delete('all')
+        width = max(self.canvas.winfo_width(), 100)
+        height = max(self.canvas.winfo_height(), 100)
+        rows = self.acquisition.history.window(PLOT_SPANS[self.span.get()])
+        if len(rows) < 2:
+            return
+        traces = {'|B|': np.linalg.norm(rows[:, 1:], axis=1), 'Bx': rows[:, 1], 'By': rows[:, 2], 'Bz': rows[:, 3]}
+        low = min(float(values.min()) for values in traces.values())
+        high = max(float(values.max()) for values in traces.values())
+        if high - low < 1e-9:
+            low, high = low - 1, high + 1
+        start, end = rows[0, 0], rows[-1, 0]
+        margin = 10
+        for name, values in traces.items():
+            times, kept = decimate(rows[:, 0], values, width)
+            x = margin + (times - start)/max(end - start, 1e-9)*(width - 2*margin)
+            y = height - margin - (kept - low)/(high - low)*(height - 2*margin)
+            self.canvas.create_line(*np.column_stack((x, y)).ravel().tolist(), fill=TRACE_COLOURS[name])
+        self.canvas.create_text(margin, margin, anchor=tk.NW, text=f'{high:+.4f} {self.units}')
+        self.canvas.create_text(margin, height - margin, anchor=tk.SW, text=f'{low:+.4f} {self.units}')
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Live vector magnet field display.')
+    parser.add_argument('--program', default=None, help='Multi-Axis executable. Defaults to the lab install path.')
+    parser.add_argument('--simulator', action='store_true', help='Run against the simulated Multi-Axis program.')
+    parser.add_argument('--query-interval', type=float, default=1.001, help='Minimum seconds between instrument queries.')
+    parser.add_argument('--interval', type=float, default=None, help='Seconds between samples.')
+    args = parser.parse_args(argv)
+
+    program = simulatorCommand() if args.simulator else args.program
+    magnet = vectorMagnet(multiProgramPath=program, queryInterval=args.query_interval)
+    magnet.startup()
+    magnet.getUnits()
+    acquisition = fieldAcquisition(magnet, args.interval)
+    acquisition.start()
+    root = tk.Tk()
+    fieldDisplay(root, acquisition)
+    try:
+        root.mainloop()
+    finally:
+        acquisition.stop()
+        magnet.exit_program()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+#asyncio version of vectorMagnet for event loop based acquisition code.
+#Uses asyncio subprocess pipes, so waiting on the 1 Hz query limit or a response never blocks the loop.
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+try:
+    from .commandChannel import rateLimiter, unlimitedQueries
+    from .fieldLimits import fieldLimits
+    from .multiAxisSettings import readSettings
+    from .multiAxisErrors import errorFromString, QuenchError, NotConnectedError, MultiAxisTimeoutError, \
+        ConnectionAttemptTimeoutError, RampStoppedError, ProgramExitedError
+    from .vectorMagnet import formatNumericInput, parseVector, checkVectorNumber, checkTableRow, checkTarget, \
+        limitsInUnits, DISCONNECTED, RAMPING, HOLDING, ZEROING, AT_ZERO, QUENCH_DETECTED, DEFAULT_PROGRAM_PATH, \
+        DEFAULT_CONFIG_PATH, DEFAULT_QUERY_INTERVAL, DEFAULT_READ_TIMEOUT
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from commandChannel import rateLimiter, unlimitedQueries
+    from fieldLimits import fieldLimits
+    from multiAxisSettings import readSettings
+    from multiAxisErrors import errorFromString, QuenchError, NotConnectedError, MultiAxisTimeoutError, \
+        ConnectionAttemptTimeoutError, RampStoppedError, ProgramExitedError
+    from vectorMagnet import formatNumericInput, parseVector, checkVectorNumber, checkTableRow, checkTarget, \
+        limitsInUnits, DISCONNECTED, RAMPING, HOLDING, ZEROING, AT_ZERO, QUENCH_DETECTED, DEFAULT_PROGRAM_PATH, \
+        DEFAULT_CONFIG_PATH, DEFAULT_QUERY_INTERVAL, DEFAULT_READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+class asyncVectorMagnet:
+    """Awaitable equivalent of vectorMagnet. Method names, arguments and return values match vectorMagnet.
+    Concurrent tasks may share one instance; each transaction and its error check run under an asyncio lock.
+    Example:
+        magnet = asyncVectorMagnet()
+        await magnet.initialize_program()
+        await magnet.connect()
+        Bx, By, Bz = await magnet.getFieldCartesian()
+    """
+    def __init__(self, multiProgramPath: str | list[str] | None = None, multiAxisConfig: str | None = None,
+                 queryInterval: float = DEFAULT_QUERY_INTERVAL, readTimeout: float | None = DEFAULT_READ_TIMEOUT):
+        """Arguments as for vectorMagnet. readTimeout is the longest wait for a query response before
+        MultiAxisTimeoutError is raised, None to wait forever."""
+        self.multiProgramPath = DEFAULT_PROGRAM_PATH if multiProgramPath is None else multiProgramPath
+        self.multiAxisConfig = DEFAULT_CONFIG_PATH if multiAxisConfig is None else multiAxisConfig
+        self.multiSubProcess = None
+        self.queryLimiter = rateLimiter(queryInterval)
+        self.readTimeout = readTimeout
+        #Responses still owed to queries that timed out, discarded when they arrive
+        self._lateResponses = 0
+        #Client-side target checks, as in vectorMagnet
+        self.fieldLimits = None
+        self.fieldUnits = None
+        self.settings = None
+        self._settingsLimits = None
+        #Per task, so one task's deferredErrorChecks() block does not skip another task's checks. Tasks created
+        #inside the block inherit it, as with any context variable.
+        self._errorCheckTask = contextvars.ContextVar('deferErrorChecks', default=False)
+        self._lock = None
+
+    async def initialize_program(self):
+        if isinstance(self.multiProgramPath, str):
+            programArgs = [self.multiProgramPath, '-p']
+        else:
+            programArgs = list(self.multiProgramPath)+['-p']
+        self._lock = asyncio.Lock()
+        #A freshly started program may be configured differently from the last one
+        self.fieldUnits = None
+        self.multiSubProcess = await asyncio.create_subprocess_exec(*programArgs, stdin=asyncio.subprocess.PIPE,
+                                                                    stdout=asyncio.subprocess.PIPE)
+
+    async def exit_program(self):
+        """Disconnects from all system devices and gracefully exits Multi-Axis program"""
+        async with self._lock:
+            await self.__write(b'EXIT\n')
+        await self.multiSubProcess.wait()
+
+    async def __write(self, data: bytes):
+        self.multiSubProcess.stdin.write(data)
+        await self.multiSubProcess.stdin.drain()
+
+    async def __transactQuery(self, commandString: bytes) -> str:
+        if commandString not in unlimitedQueries:
+            delay = self.queryLimiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        try:
+            await self.__write(commandString+b'?\n')
+            deadline = None if self.readTimeout is None else time.monotonic() + self.readTimeout
+            while True:
+                try:
+                    readBits = await asyncio.wait_for(self.multiSubProcess.stdout.readline(),
+                                                      None if deadline is None else max(0.0, deadline-time.monotonic()))
+                except asyncio.TimeoutError:
+                    self._lateResponses += 1
+                    raise MultiAxisTimeoutError("No response to " + commandString.decode('ascii') + "? within "
+                                                + str(self.readTimeout) + " s") from None
+                if not readBits:
+                    raise ProgramExitedError("Multi-Axis exited, its output pipe is closed")
+                if self._lateResponses:
+                    self._lateResponses -= 1
+                    continue
+                return readBits.decode('ascii').rstrip()
+        except asyncio.CancelledError:
+            #The query is already in the pipe, so its answer is discarded when it arrives
+            self._lateResponses += 1
+            raise
+
+    async def __raiseQueuedError(self):
+        errorCount = int((await self.__transactQuery(b'SYST:ERR:COUN')).strip())
+        if errorCount > 0:
+            errorString = await self.__transactQuery(b'SYST:ERR')
+            for _ in range(errorCount-1):
+                await self.__transactQuery(b'SYST:ERR')
+            raise errorFromString(errorString)
+
+    async def __sendCommand(self, commandString: bytes):
+        async with self._lock:
+            await self.__write(commandString+b'\n')
+            if not self.deferErrorChecks:
+                await self.__raiseQueuedError()
+
+    async def __sendQuery(self, commandString: bytes) -> str:
+        async with self._lock:
+            decodedString = await self.__transactQuery(commandString)
+            if not self.deferErrorChecks:
+                await self.__raiseQueuedError()
+        return decodedString
+
+    async def _sendUnsafeCommand(self, commandString: bytes):
+        """Sends command without error checking. Intended for tests."""
+        async with self._lock:
+            await self.__write(commandString+b'\n')
+
+    async def getError(self) -> str:
+        """Returns last-in-first-out error string, {0,"No error"} if the queue is empty."""
+        async with self._lock:
+            return await self.__transactQuery(b'SYST:ERR')
+
+    async def getErrorCount(self) -> int:
+        """Returns error count as int"""
+        async with self._lock:
+            return int((await self.__transactQuery(b'SYST:ERR:COUN')).strip())
+
+    async def checkErrors(self):
+        """Raises the most recent queued error, if any. The whole queue is drained."""
+        async with self._lock:
+            await self.__raiseQueuedError()
+
+    @property
+    def deferErrorChecks(self) -> bool:
+        """True while the calling task is inside deferredErrorChecks()."""
+        return self._errorCheckTask.get()
+
+    @deferErrorChecks.setter
+    def deferErrorChecks(self, deferred: bool):
+        self._errorCheckTask.set(deferred)
+
+    @contextlib.asynccontextmanager
+    async def deferredErrorChecks(self):
+        """Skips the per-call error count round-trip for this task inside the block and checks once when it exits
+        normally."""
+        previous = self.deferErrorChecks
+        self.deferErrorChecks = True
+        try:
+            yield self
+        finally:
+            self.deferErrorChecks = previous
+        if not previous:
+            await self.checkErrors()
+
+    async def clearErrorQueue(self):
+        await self.__sendCommand(b'*CLS')
+
+    async def getState(self) -> int:
+        """Returns the Multi-Axis state. See vectorMagnet.getState for the values."""
+        return int((await self.__sendQuery(b'STATE')).strip())
+
+    async def connect(self, timeout: float = 15) -> int:
+        """Connects to Model 430's. Returns current state.
+        System settings should be loaded prior."""
+        await self.__sendCommand(b'SYST:CONN')
+        startTime = time.monotonic()
+        while True:
+            stateVal = await self.getState()
+            if stateVal:
+                return stateVal
+            if await self.getErrorCount() > 0:
+                logger.error("Unable to Connect. There is an active error")
+                raise errorFromString(await self.getError())
+            if time.monotonic()-startTime > timeout:
+                raise ConnectionAttemptTimeoutError()
+
+    async def waitUntilHolding(self, timeout: float | None = None, arrivalMargin: float = 2.0, maxSleep: float = 10.0) -> int:
+        """Waits until HOLDING (2) or AT ZERO FIELD (5) and returns that state. See vectorMagnet.waitUntilHolding."""
+        startTime = time.monotonic()
+        arriving = False
+        while True:
+            stateVal = await self.getState()
+            if stateVal in (HOLDING, AT_ZERO):
+                return stateVal
+            if stateVal == QUENCH_DETECTED:
+                raise QuenchError()
+            if stateVal == DISCONNECTED:
+                raise NotConnectedError()
+            remaining = None if timeout is None else timeout-(time.monotonic()-startTime)
+            if remaining is not None and remaining <= 0:
+                raise MultiAxisTimeoutError("Target not reached before timeout. STATE = " + str(stateVal))
+            if stateVal not in (RAMPING, ZEROING):
+                raise RampStoppedError("Ramp stopped before reaching the target. STATE = " + str(stateVal))
+            if arriving:
+                waitTime = self.queryLimiter.interval
+                await asyncio.sleep(waitTime if remaining is None else min(waitTime, remaining))
+                continue
+            timeLeft = await self.getTimeToTarget()
+            arriving = timeLeft <= arrivalMargin
+            sleepTime = min(timeLeft-arrivalMargin, maxSleep)
+            if remaining is not None:
+                sleepTime = min(sleepTime, remaining)
+            if sleepTime > 0:
+                await asyncio.sleep(sleepTime)
+
+    async def disconnect(self):
+        """Disconnects from all system devices"""
+        await self.__sendCommand(b'SYST:DISC')
+
+    async def getFieldSpherical(self) -> tuple[float, float, float]:
+        """Returns field in spherical coordinates with currently active units. Format is: r, phi, theta"""
+        return parseVector(await self.__sendQuery(b'FIELD'))
+
+    async def getFieldCartesian(self) -> tuple[float, float, float]:
+        """Returns Bx, By, & Bz in Cartesian coordinates with currently active units"""
+        return parseVector(await self.__sendQuery(b'FIELD:CART'))
+
+    async def getIDN(self) -> str:
+        return await self.__sendQuery(b'*IDN')
+
+    async def loadSettings(self, filePath: str):
+        """Loads all magnet parameters, sample alignment settings, and table contents.
+        Parses the file for fieldLimits where readable, replacing limits set with setFieldLimits() with a warning.
+        Where it is not, limits set with setFieldLimits() are kept. See vectorMagnet.loadSettings."""
+        await self.__sendCommand(b'LOAD:SET '+filePath.encode('ascii'))
+        try:
+            self.settings = readSettings(filePath)
+        except (OSError, ValueError) as error:
+            logger.info("Settings file %s not parsed, only limits set with setFieldLimits() are kept: %s", filePath, error)
+            self.settings = None
+            if self.fieldLimits is self._settingsLimits:
+                self.fieldLimits = None
+            self._settingsLimits = None
+            self.fieldUnits = None
+            return
+        if self.fieldLimits is not None and self.fieldLimits is not self._settingsLimits:
+            logger.warning("Field limits set with setFieldLimits() are replaced by those in %s", filePath)
+        self.fieldLimits = self._settingsLimits = self.settings.fieldLimits()
+        self.fieldUnits = self.settings.units
+
+    async def saveSettings(self, filePath: str):
+        """Creates .Sav settings file at filepath."""
+        await self.__sendCommand(b'SAVE:SET '+filePath.encode('ascii'))
+
+    async def configureUnits(self, units: int):
+        """Field units may only be changed when disconnected. 0: Kilogauss, 1: Tesla"""
+        await self.__sendCommand(b'CONF:UNITS '+str(units).encode('ascii'))
+        #With deferred error checks the command may yet be rejected, so the units are read again when next needed
+        self.fieldUnits = None if self.deferErrorChecks else units
+
+    async def getUnits(self) -> int:
+        """Returns current field units. 0: Kilogauss, 1: Tesla"""
+        self.fieldUnits = int((await self.__sendQuery(b'UNITS')).strip())
+        return self.fieldUnits
+
+    def setFieldLimits(self, xCoilLimit: float | None, yCoilLimit: float | None, zCoilLimit: float | None,
+                       magnitudeLimit: float, units: int = 1):
+        """Enables client-side target checks. See vectorMagnet.setFieldLimits."""
+        self.fieldLimits = fieldLimits(xCoilLimit, yCoilLimit, zCoilLimit, magnitudeLimit, units)
+
+    async def activeFieldLimits(self) -> fieldLimits | None:
+        """Returns fieldLimits converted to the present field units, or None if no limits are set.
+        The units are read with getUnits() if they are not known yet."""
+        if self.fieldLimits is not None and self.fieldUnits is None:
+            await self.getUnits()
+        return limitsInUnits(self.fieldLimits, self.fieldUnits)
+
+    async def setSampleAlignmentVector(self, vectorNumber: int, magnitude: float, azimuth: float, inclination: float):
+        """Sets sample alignment vector 1 or 2 in spherical coordinates."""
+        checkVectorNumber(vectorNumber)
+        await self.__sendCommand(b'CONF:ALIGN'+str(vectorNumber).encode('ascii')+b' '+formatNumericInput(magnitude)+b','
+                                 +formatNumericInput(azimuth)+b','+formatNumericInput(inclination))
+
+    async def configureTargetToAlignmentVector(self, vectorNumber: int):
+        """Sets the target field to the specified alignment vector and begins ramping. Vector number should be 1 or 2."""
+        checkVectorNumber(vectorNumber)
+        await self.__sendCommand(b'CONF:TARG:ALIGN'+str(vectorNumber).encode('ascii'))
+
+    async def setTargetFieldSpherical(self, magnitude: float, azimuth: float, inclination: float, dwellTime: float | None = None):
+        """Sets target field in spherical coordinates, adds it to the vector table, and begins ramping."""
+        limits = await self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkSpherical(magnitude, azimuth, inclination))
+        values = [magnitude, azimuth, inclination] + ([] if dwellTime is None else [dwellTime])
+        await self.__sendCommand(b'CONF:TARG:VEC '+b','.join(formatNumericInput(v) for v in values))
+
+    async def setTargetFieldCartesian(self, Bx: float, By: float, Bz: float, dwellTime: float | None = None):
+        """Sets target field in Cartesian coordinates, adds it to the vector table, and begins ramping."""
+        limits = await self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkCartesian(Bx, By, Bz))
+        values = [Bx, By, Bz] + ([] if dwellTime is None else [dwellTime])
+        await self.__sendCommand(b'CONF:TARG:VEC:CART '+b','.join(formatNumericInput(v) for v in values))
+
+    async def setTargetToVectorTableRow(self, tableRow: int):
+        """Sets the target field to the specified table row and begins ramping."""
+        checkTableRow(tableRow)
+        await self.__sendCommand(b'CONF:TARG:VEC:TAB '+str(tableRow).encode('ascii'))
+
+    async def setTargetToPolar(self, magnitude: float, angle: float, dwellTime: float | None = None):
+        """Sets target field in polar coordinates, adds it to the polar table, and begins ramping.
+        Checked against fieldLimits in the sample plane of the alignment vectors."""
+        limits = await self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkPolar(magnitude, angle, await self.getSampleAlignmentVectorCartesian(1),
+                                          await self.getSampleAlignmentVectorCartesian(2)))
+        values = [magnitude, angle] + ([] if dwellTime is None else [dwellTime])
+        await self.__sendCommand(b'CONF:TARG:POL '+b','.join(formatNumericInput(v) for v in values))
+
+    async def setTargetToPolarTableRow(self, tableRow: int):
+        """Sets the target field to the specified table row and begins ramping."""
+        checkTableRow(tableRow)
+        await self.__sendCommand(b'CONF:TARG:POL:TABL '+str(tableRow).encode('ascii'))
+
+    async def enablePauseMode(self):
+        """Pauses all connected devices at the present operating field."""
+        await self.__sendCommand(b'PAUSE')
+
+    async def enableRampMode(self):
+        """Resumes ramping to the target field."""
+        await self.__sendCommand(b'RAMP')
+
+    async def enableZeroMode(self):
+        """Sets the target field to zero and begins ramping."""
+        await self.__sendCommand(b'ZERO')
+
+    async def enablePersistentMode(self, persistentState: bool):
+        await self.__sendCommand(b'PERS '+str(int(persistentState)).encode('ascii'))
+
+    async def getPersistentMode(self) -> bool:
+        """Returns whether persistent mode is enabled."""
+        return bool(int((await self.__sendQuery(b'PERS')).strip()))
+
+    async def getSampleAlignmentVectorSpherical(self, vectorNumber: int) -> tuple[float, float, float]:
+        """Returns the sample alignment vector in spherical coordinates (r, phi, theta)."""
+        checkVectorNumber(vectorNumber)
+        return parseVector(await self.__sendQuery(b'ALIGN'+str(vectorNumber).encode('ascii')))
+
+    async def getSampleAlignmentVectorCartesian(self, vectorNumber: int) -> tuple[float, float, float]:
+        """Returns the sample alignment vector in Cartesian coordinates (Bx, By, Bz)."""
+        checkVectorNumber(vectorNumber)
+        return parseVector(await self.__sendQuery(b'ALIGN'+str(vectorNumber).encode('ascii')+b':CART'))
+
+    async def getSampleAlignmentPlane(self) -> tuple[float, float, float]:
+        """Returns (a, b, c) for the sample plane equation ax + by + cz = 0."""
+        return parseVector(await self.__sendQuery(b'PLANE'))
+
+    async def getTargetFieldSpherical(self) -> tuple[float, float, float]:
+        """Returns the target field in spherical coordinates (r, phi, theta)."""
+        return parseVector(await self.__sendQuery(b'TARG'))
+
+    async def getTargetFieldCartesian(self) -> tuple[float, float, float]:
+        """Returns the target field in Cartesian coordinates (Bx, By, Bz)."""
+        return parseVector(await self.__sendQuery(b'TARG:CART'))
+
+    async def getTimeToTarget(self) -> float:
+        """Returns the estimated time to reach the target field in seconds."""
+        return float((await self.__sendQuery(b'TARG:TIME')).strip())
@@ -0,0 +1,244 @@
+#Owns the stdin/stdout pipe of the Multi-Axis program.
+#A single worker thread executes requests in submission order, so any number of threads
+#(Matlab callbacks, the poller, monitors) can share one vectorMagnet without mixing up responses.
+#A second thread reads response lines as they arrive, so a hung or dead program surfaces as an exception
+#after the read timeout instead of blocking the caller forever.
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+try:
+    from .multiAxisErrors import errorFromString, MultiAxisTimeoutError, ProgramExitedError
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from multiAxisErrors import errorFromString, MultiAxisTimeoutError, ProgramExitedError
+
+logger = logging.getLogger(__name__)
+
+#Queries answered by Multi-Axis itself rather than the Model 430's. These do not count against the 1 Hz limit.
+unlimitedQueries = frozenset({b'SYST:ERR', b'SYST:ERR:COUN'})
+
+class rateLimiter:
+    """Token bucket with a single token refilled every interval seconds.
+    wait() only sleeps for whatever is left of the interval since the last instrument query.
+    """
+    def __init__(self, interval: float = 1.001, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.lastQueryTime = None
+
+    def reserve(self) -> float:
+        """Takes the next token without blocking. Returns how long the caller must wait before querying.
+        Used by asyncVectorMagnet, which waits with asyncio.sleep instead."""
+        now = self.clock()
+        delay = 0.0
+        if self.lastQueryTime is not None:
+            delay = max(0.0, self.interval - (now - self.lastQueryTime))
+        self.lastQueryTime = now + delay
+        return delay
+
+    def wait(self) -> float:
+        """Blocks until a query is allowed and takes the token. Returns the time slept in seconds."""
+        delay = self.reserve()
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+class channelRequest:
+    """One unit of work for the channel. commands is a list of (ascii command, isQuery) pairs executed
+    back to back with nothing from other threads in between, optionally followed by one error queue check.
+    readTimeout, if not None, replaces the channel's read timeout for this request.
+    pipelined requests write all their lines in one flush after a single rate limit wait, then read the responses.
+    """
+    def __init__(self, commands: list[tuple[bytes, bool]], checkErrors: bool, readTimeout: float | None = None,
+                 pipelined: bool = False):
+        self.commands = commands
+        self.checkErrors = checkErrors
+        self.readTimeout = readTimeout
+        self.pipelined = pipelined
+        self.future = concurrent.futures.Future()
+
+class commandChannel:
+    """Serializes all traffic on the Multi-Axis pipe through one worker thread.
+    process only needs stdin, stdout and poll() like subprocess.Popen.
+    listener, if given, is called from the worker as listener(command, isQuery, response) after every
+    transaction, in pipe order. transactionLog, if set, receives timing for every transaction.
+    readTimeout is the longest wait in seconds for a query response before MultiAxisTimeoutError, None to wait
+    forever. If the program exits or closes its output, requests raise ProgramExitedError.
+    """
+    def __init__(self, process, queryLimiter: rateLimiter, listener=None, transactionLog=None,
+                 readTimeout: float | None = None):
+        self.process = process
+        self.queryLimiter = queryLimiter
+        self.listener = listener
+        self.transactionLog = transactionLog
+        self.readTimeout = readTimeout
+        self._requests = queue.Queue()
+        self._closed = False
+        #Response lines from the reader thread. None marks the end of the program's output.
+        self._lines = queue.Queue()
+        #Responses still owed to queries that timed out. They are discarded when they turn up.
+        self._lateResponses = 0
+        self._reader = threading.Thread(target=self._readLines, name='multiAxisReader', daemon=True)
+        self._reader.start()
+        self._worker = threading.Thread(target=self._run, name='multiAxisChannel', daemon=True)
+        self._worker.start()
+
+    def submit(self, commands: list[tuple[bytes, bool]], checkErrors: bool = True,
+               readTimeout: float | None = None, pipelined: bool = False) -> concurrent.futures.Future:
+        """Queues commands and returns a future resolving to the list of query responses, in order.
+        If checkErrors is set and the error queue is not empty afterwards, the future raises the most recent error
+        as its multiAxisErrors class. readTimeout overrides the channel's read timeout for this request.
+        pipelined sends all commands in one write instead of one at a time, see channelRequest.
+        """
+        if self._closed:
+            raise RuntimeError("Command channel is closed.")
+        request = channelRequest(commands, checkErrors, readTimeout, pipelined)
+        self._requests.put(request)
+        return request.future
+
+    def query(self, commandString: bytes, checkErrors: bool = True) -> str:
+        """Sends commandString? and blocks until its response arrives."""
+        return self.submit([(commandString, True)], checkErrors).result()[0]
+
+    def command(self, commandString: bytes, checkErrors: bool = True):
+        """Sends commandString and blocks until it has been written (and checked, if checkErrors)."""
+        self.submit([(commandString, False)], checkErrors).result()
+
+    def close(self):
+        """Stops the worker once all queued requests are done."""
+        if self._closed:
+            return
+        self._closed = True
+        self._requests.put(None)
+        if threading.current_thread() is not self._worker:
+            self._worker.join()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                responses = self._execute(request)
+            except BaseException as error:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(responses)
+
+    def _readLines(self):
+        try:
+            for line in iter(self.process.stdout.readline, b''):
+                self._lines.put(line)
+        except (OSError, ValueError):
+            #The pipe was closed under us
+            pass
+        self._lines.put(None)
+
+    def _exitedError(self) -> ProgramExitedError:
+        exitCode = self.process.poll()
+        if exitCode is None:
+            return ProgramExitedError("Multi-Axis exited, its output pipe is closed")
+        return ProgramExitedError("Multi-Axis exited with code " + str(exitCode))
+
+    def _readResponse(self, commandString: bytes, readTimeout: float | None) -> str:
+        deadline = None if readTimeout is None else time.monotonic() + readTimeout
+        while True:
+            try:
+                line = self._lines.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._lateResponses += 1
+                raise MultiAxisTimeoutError("No response to " + commandString.decode('ascii') + "? within "
+                                            + str(readTimeout) + " s") from None
+            if line is None:
+                #Leave the marker for the requests that follow
+                self._lines.put(None)
+                raise self._exitedError()
+            if self._lateResponses:
+                self._lateResponses -= 1
+                continue
+            return line.decode('ascii').rstrip()
+
+    def _write(self, data: bytes):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            raise self._exitedError() from None
+
+    def _execute(self, request: channelRequest) -> list[str]:
+        readTimeout = self.readTimeout if request.readTimeout is None else request.readTimeout
+        if request.pipelined:
+            responses = self._transactPipelined(request.commands, readTimeout)
+        else:
+            responses = []
+            for commandString, isQuery in request.commands:
+                response = self._transact(commandString, isQuery, readTimeout=readTimeout)
+                if isQuery:
+                    responses.append(response)
+        if request.checkErrors:
+            self._raiseQueuedError(readTimeout)
+        return responses
+
+    def _transact(self, commandString: bytes, isQuery: bool, errorCheck: bool = False,
+                  readTimeout: float | None = None) -> str | None:
+        response = None
+        sleepTime = 0.0
+        if isQuery:
+            if commandString not in unlimitedQueries:
+                sleepTime = self.queryLimiter.wait()
+            data = commandString+b'?\n'
+            startTime = time.perf_counter()
+            self._write(data)
+            response = self._readResponse(commandString, readTimeout)
+        else:
+            data = commandString+b'\n'
+            startTime = time.perf_counter()
+            self._write(data)
+        if self.transactionLog is not None:
+            self.transactionLog.record(commandString, isQuery, len(data), response, time.perf_counter()-startTime,
+                                       sleepTime, errorCheck)
+        if self.listener is not None:
+            self.listener(commandString, isQuery, response)
+        return response
+
+    def _transactPipelined(self, commands: list[tuple[bytes, bool]], readTimeout: float | None) -> list[str]:
+        sleepTime = 0.0
+        if any(isQuery and commandString not in unlimitedQueries for commandString, isQuery in commands):
+            sleepTime = self.queryLimiter.wait()
+        lines = [commandString + (b'?\n' if isQuery else b'\n') for commandString, isQuery in commands]
+        startTime = time.perf_counter()
+        self._write(b''.join(lines))
+        responses = []
+        for index, ((commandString, isQuery), data) in enumerate(zip(commands, lines)):
+            try:
+                response = self._readResponse(commandString, readTimeout) if isQuery else None
+            except MultiAxisTimeoutError:
+                #The rest of the batch is owed too
+                self._lateResponses += sum(query for _, query in commands[index+1:])
+                raise
+            if self.transactionLog is not None:
+                #Latency is measured from the shared write, sleepTime is charged to the first line
+                self.transactionLog.record(commandString, isQuery, len(data), response, time.perf_counter()-startTime,
+                                           sleepTime, False)
+                sleepTime = 0.0
+            if self.listener is not None:
+                self.listener(commandString, isQuery, response)
+            if isQuery:
+                responses.append(response)
+        return responses
+
+    def _raiseQueuedError(self, readTimeout: float | None = None):
+        """Raises the most recent queued error, if any. The whole queue is drained.
+        Older errors are reported but only the most recent is raised."""
+        errorCount = int(self._transact(b'SYST:ERR:COUN', True, True, readTimeout).strip())
+        if errorCount > 0:
+            errorString = self._transact(b'SYST:ERR', True, True, readTimeout)
+            for _ in range(errorCount-1):
+                logger.warning("Earlier error: %s", self._transact(b'SYST:ERR', True, True, readTimeout))
+            logger.info("Error detected following command: %s", errorString)
+            raise errorFromString(errorString)
@@ -0,0 +1,82 @@
+#Array versions of the Multi-Axis coordinate conventions, for planning and checking sweeps without round-trips.
+#Spherical is magnitude, azimuth from +x in the xy-plane, inclination from +z, angles in degrees.
+#Polar is magnitude, angle in the sample plane measured from alignment vector 1 toward alignment vector 2.
+#Every function takes a single point or an (..., 3) / (..., 2) array and returns the same leading shape.
+import numpy as np
+
+def sphericalToCartesian(points) -> np.ndarray:
+    """Converts magnitude, azimuth, inclination to Bx, By, Bz."""
+    points = np.asarray(points, dtype=float)
+    magnitude, phi, theta = points[..., 0], np.radians(points[..., 1]), np.radians(points[..., 2])
+    return np.stack((magnitude*np.sin(theta)*np.cos(phi), magnitude*np.sin(theta)*np.sin(phi),
+                     magnitude*np.cos(theta)), axis=-1)
+
+def cartesianToSpherical(points) -> np.ndarray:
+    """Converts Bx, By, Bz to magnitude, azimuth (-180 to 180), inclination (0 to 180). Zero field gives all zeros."""
+    points = np.asarray(points, dtype=float)
+    magnitude = np.linalg.norm(points, axis=-1)
+    safeMagnitude = np.where(magnitude == 0, 1.0, magnitude)
+    azimuth = np.degrees(np.arctan2(points[..., 1], points[..., 0]))
+    inclination = np.degrees(np.arccos(np.clip(points[..., 2]/safeMagnitude, -1.0, 1.0)))
+    inclination = np.where(magnitude == 0, 0.0, inclination)
+    return np.stack((magnitude, azimuth, inclination), axis=-1)
+
+class alignmentFrame:
+    """Sample frame defined by the two alignment vectors (ALIGN1, ALIGN2), given in Cartesian coordinates.
+    u1 is alignment vector 1, u2 the part of alignment vector 2 perpendicular to it and normal = u1 x u2,
+    the same normal that PLANE? reports. All three are unit vectors.
+    """
+    def __init__(self, alignment1, alignment2):
+        alignment1 = np.asarray(alignment1, dtype=float)
+        alignment2 = np.asarray(alignment2, dtype=float)
+        n1 = np.linalg.norm(alignment1)
+        if n1 == 0:
+            raise Exception("Alignment vector 1 must be nonzero.")
+        self.u1 = alignment1/n1
+        u2 = alignment2 - np.dot(self.u1, alignment2)*self.u1
+        n2 = np.linalg.norm(u2)
+        if n2 <= 1e-12*np.linalg.norm(alignment2):
+            raise Exception("Alignment vectors must not be parallel.")
+        self.u2 = u2/n2
+        self.normal = np.cross(self.u1, self.u2)
+        #Rows are the frame axes, so basis @ v gives frame coordinates
+        self.basis = np.vstack((self.u1, self.u2, self.normal))
+
+    @classmethod
+    def fromSpherical(cls, alignment1, alignment2) -> 'alignmentFrame':
+        """Frame from alignment vectors given as magnitude, azimuth, inclination."""
+        return cls(sphericalToCartesian(alignment1), sphericalToCartesian(alignment2))
+
+    @classmethod
+    def fromMagnet(cls, magnet) -> 'alignmentFrame':
+        """Frame from the alignment vectors presently set in Multi-Axis."""
+        return cls(magnet.getSampleAlignmentVectorCartesian(1), magnet.getSampleAlignmentVectorCartesian(2))
+
+    def plane(self) -> tuple[float, float, float]:
+        """Coefficients (a, b, c) of the sample plane ax + by + cz = 0, as getSampleAlignmentPlane()."""
+        return tuple(float(n) for n in self.normal)
+
+    def polarToCartesian(self, points) -> np.ndarray:
+        """Converts magnitude, angle to Bx, By, Bz."""
+        points = np.asarray(points, dtype=float)
+        rad = np.radians(points[..., 1])
+        return points[..., 0, None]*(np.cos(rad)[..., None]*self.u1 + np.sin(rad)[..., None]*self.u2)
+
+    def cartesianToPolar(self, points) -> np.ndarray:
+        """Converts Bx, By, Bz to magnitude, angle (-180 to 180) of their projection on the sample plane.
+        Use outOfPlane() to see how much of each field is lost by the projection."""
+        frame = self.toFrame(points)
+        return np.stack((np.hypot(frame[..., 0], frame[..., 1]),
+                         np.degrees(np.arctan2(frame[..., 1], frame[..., 0]))), axis=-1)
+
+    def outOfPlane(self, points) -> np.ndarray:
+        """Component of Bx, By, Bz along the plane normal."""
+        return np.asarray(points, dtype=float) @ self.normal
+
+    def toFrame(self, points) -> np.ndarray:
+        """Converts lab Bx, By, Bz to components along u1, u2, normal."""
+        return np.asarray(points, dtype=float) @ self.basis.T
+
+    def fromFrame(self, points) -> np.ndarray:
+        """Converts components along u1, u2, normal to lab Bx, By, Bz."""
+        return np.asarray(points, dtype=float) @ self.basis
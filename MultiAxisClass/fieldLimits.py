@@ -0,0 +1,117 @@
+#Client-side copy of the Multi-Axis target checks.
+#Targets that the instrument would reject are caught locally, with the same error codes, before any round-trip.
+import math
+try:
+    import numpy as np
+except ImportError:
+    #Only the array validation needs numpy
+    np = None
+else:
+    try:
+        from .coordinates import sphericalToCartesian, alignmentFrame
+    except ImportError:
+        #Imported as a top level module, e.g. from Matlab with this folder on the python path
+        from coordinates import sphericalToCartesian, alignmentFrame
+
+#Error codes shared with the instrument, see vectorMagnet.__init__
+MAGNITUDE_LIMIT = -152
+NEGATIVE_MAGNITUDE = -153
+INCLINATION_RANGE = -154
+COIL_LIMIT = (-155, -157, -159)
+COIL_MISSING = (-156, -158, -160)
+
+#Relative slack so values read back from the instrument at the limit still pass
+TOLERANCE = 1e-9
+
+class fieldLimits:
+    """Per-axis coil limits and maximum field magnitude, all in the given units (0: kilogauss, 1: tesla).
+    A coil limit of 0 or None means that axis has no coil.
+    check* methods return 0 for a valid target or the error code the instrument would raise.
+    validate* methods do the same for whole (N, 3) or (N, 2) arrays and need numpy.
+    The spherical and polar checks convert through coordinates, so without numpy they check only the magnitude.
+    """
+    def __init__(self, xCoilLimit: float | None, yCoilLimit: float | None, zCoilLimit: float | None,
+                 magnitudeLimit: float, units: int = 1):
+        self.coilLimits = (xCoilLimit, yCoilLimit, zCoilLimit)
+        self.magnitudeLimit = magnitudeLimit
+        self.units = units
+
+    def inUnits(self, units: int) -> 'fieldLimits':
+        """Returns these limits expressed in other field units."""
+        if units == self.units:
+            return self
+        scale = 10.0 if units == 0 else 0.1
+        return fieldLimits(*[None if limit is None else limit*scale for limit in self.coilLimits],
+                           self.magnitudeLimit*scale, units)
+
+    def checkCartesian(self, Bx: float, By: float, Bz: float) -> int:
+        if math.sqrt(Bx*Bx + By*By + Bz*Bz) > self.magnitudeLimit*(1+TOLERANCE):
+            return MAGNITUDE_LIMIT
+        for axis, (component, limit) in enumerate(zip((Bx, By, Bz), self.coilLimits)):
+            if not limit:
+                if abs(component) > self.magnitudeLimit*TOLERANCE:
+                    return COIL_MISSING[axis]
+            elif abs(component) > limit*(1+TOLERANCE):
+                return COIL_LIMIT[axis]
+        return 0
+
+    def checkSpherical(self, magnitude: float, azimuth: float, inclination: float) -> int:
+        if magnitude < 0:
+            return NEGATIVE_MAGNITUDE
+        if not 0 <= inclination <= 180:
+            return INCLINATION_RANGE
+        if np is None:
+            #Only the magnitude can be checked without the coordinate conversion, the instrument checks the coils
+            return MAGNITUDE_LIMIT if magnitude > self.magnitudeLimit*(1+TOLERANCE) else 0
+        return self.checkCartesian(*sphericalToCartesian((magnitude, azimuth, inclination)).tolist())
+
+    def checkPolar(self, magnitude: float, angle: float, alignment1: tuple[float, float, float] | None = None,
+                   alignment2: tuple[float, float, float] | None = None) -> int:
+        """Polar targets lie in the sample plane from alignment vector 1 toward alignment vector 2.
+        Without the Cartesian alignment vectors, or without numpy, only the magnitude is checked.
+        Raises if the alignment vectors are parallel, as validatePolar does."""
+        frame = None
+        if alignment1 is not None and alignment2 is not None and np is not None:
+            frame = alignmentFrame(alignment1, alignment2)
+        if magnitude < 0:
+            return NEGATIVE_MAGNITUDE
+        if magnitude > self.magnitudeLimit*(1+TOLERANCE):
+            return MAGNITUDE_LIMIT
+        if frame is None:
+            return 0
+        return self.checkCartesian(*frame.polarToCartesian((magnitude, angle)).tolist())
+
+    def validateCartesian(self, points) -> 'np.ndarray':
+        """Returns an int array with the error code for each row of Bx, By, Bz (0 where valid)."""
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        codes = np.zeros(len(points), dtype=int)
+        for axis in (2, 1, 0):
+            limit = self.coilLimits[axis]
+            if not limit:
+                codes[np.abs(points[:, axis]) > self.magnitudeLimit*TOLERANCE] = COIL_MISSING[axis]
+            else:
+                codes[np.abs(points[:, axis]) > limit*(1+TOLERANCE)] = COIL_LIMIT[axis]
+        codes[np.linalg.norm(points, axis=1) > self.magnitudeLimit*(1+TOLERANCE)] = MAGNITUDE_LIMIT
+        return codes
+
+    def validateSpherical(self, points) -> 'np.ndarray':
+        """Returns an int array with the error code for each row of magnitude, azimuth, inclination (0 where valid)."""
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        magnitude = points[:, 0]
+        codes = self.validateCartesian(sphericalToCartesian(points))
+        codes[(points[:, 2] < 0) | (points[:, 2] > 180)] = INCLINATION_RANGE
+        codes[magnitude < 0] = NEGATIVE_MAGNITUDE
+        return codes
+
+    def validatePolar(self, points, alignment1: tuple[float, float, float] | None = None,
+                      alignment2: tuple[float, float, float] | None = None) -> 'np.ndarray':
+        """Returns an int array with the error code for each row of magnitude, angle (0 where valid)."""
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        magnitude = points[:, 0]
+        if alignment1 is None or alignment2 is None:
+            codes = np.zeros(len(points), dtype=int)
+            codes[magnitude > self.magnitudeLimit*(1+TOLERANCE)] = MAGNITUDE_LIMIT
+        else:
+            codes = self.validateCartesian(alignmentFrame(alignment1, alignment2).polarToCartesian(points))
+        codes[magnitude < 0] = NEGATIVE_MAGNITUDE
+        return codes
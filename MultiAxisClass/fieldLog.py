@@ -0,0 +1,197 @@
+#Long running field logs on disk instead of in growing MATLAB arrays.
+#Samples are appended to a memory-mapped file of fixed size records, grown one chunk at a time, so memory use stays
+#constant and at most flushInterval seconds of data is lost if the process dies.
+import logging
+import os
+import struct
+import threading
+import time
+import numpy as np
+try:
+    from .coordinates import cartesianToSpherical
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from coordinates import cartesianToSpherical
+
+logger = logging.getLogger(__name__)
+
+#File layout: 64 byte header, then count records of recordDtype. The header count is only advanced on flush.
+MAGIC = b'VMFIELD1'
+#MAGIC, coordinates (0: cartesian, 1: spherical), units (0: kG, 1: T, 255: unknown), count
+HEADER = struct.Struct('<8sBB6xQ40x')
+HEADER_SIZE = HEADER.size
+COORDINATES = ('cartesian', 'spherical')
+
+#field holds Bx, By, Bz or magnitude, azimuth, inclination depending on the header
+recordDtype = np.dtype([('time', '<f8'), ('field', '<f8', (3,)), ('state', '<i2')], align=False)
+
+def _readHeader(file) -> tuple[int, int, int]:
+    file.seek(0)
+    magic, coordinates, units, count = HEADER.unpack(file.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise Exception("Not a field log file.")
+    return coordinates, units, count
+
+class fieldLogRecorder:
+    """Appends timestamped field and state samples from a vectorMagnet to filePath.
+    coordinates is 'cartesian' or 'spherical'; spherical samples are converted from getFieldCartesian(). An existing
+    log is appended to, provided it uses the same coordinates. The file grows by chunkSize records (a day at 1 Hz by default).
+    Call sample() yourself, or start() to sample every interval seconds from a background thread. With
+    vectorMagnet.startPolling() running, samples come from the poll cache and cost no extra queries.
+    magnet may be None when samples are only added with append().
+    """
+    def __init__(self, magnet, filePath: str, coordinates: str = 'cartesian', interval: float = 1.0,
+                 flushInterval: float = 10.0, chunkSize: int = 86400):
+        if coordinates not in COORDINATES:
+            raise Exception("coordinates must be 'cartesian' or 'spherical'.")
+        self.magnet = magnet
+        self.filePath = filePath
+        self.coordinates = coordinates
+        self.interval = interval
+        self.flushInterval = flushInterval
+        self.chunkSize = chunkSize
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        units = 255 if magnet is None or magnet.fieldUnits is None else magnet.fieldUnits
+        if os.path.exists(filePath) and os.path.getsize(filePath) >= HEADER_SIZE:
+            self._file = open(filePath, 'r+b')
+            fileCoordinates, units, self.count = _readHeader(self._file)
+            if COORDINATES[fileCoordinates] != coordinates:
+                self._file.close()
+                raise Exception("Existing log " + filePath + " holds " + COORDINATES[fileCoordinates] + " fields.")
+        else:
+            self._file = open(filePath, 'w+b')
+            self.count = 0
+            self._file.write(HEADER.pack(MAGIC, COORDINATES.index(coordinates), units, 0))
+        self.units = units
+        self.capacity = 0
+        self._records = None
+        self._reserve(self.count + 1)
+        self._lastFlush = time.monotonic()
+        #sample() times are this Unix time plus monotonic time since, so clock steps cannot reorder the log.
+        #Appending to a log never starts before its last sample.
+        self._startTime = time.time()
+        if self.count:
+            self._startTime = max(self._startTime, float(self._records['time'][self.count-1]))
+        self._startMonotonic = time.monotonic()
+
+    def _reserve(self, needed: int):
+        """Grows the file to whole chunks holding at least needed records and remaps it."""
+        if needed <= self.capacity:
+            return
+        capacity = -(-needed//self.chunkSize)*self.chunkSize
+        if self._records is not None:
+            self._records.flush()
+            del self._records
+        self._file.truncate(HEADER_SIZE + capacity*recordDtype.itemsize)
+        self._records = np.memmap(self._file, dtype=recordDtype, mode='r+', offset=HEADER_SIZE, shape=(capacity,))
+        self.capacity = capacity
+
+    def append(self, timestamp: float, field: tuple[float, float, float], state: int):
+        """Appends one sample. Used by sample(); also handy for logging values read elsewhere.
+        Timestamps must not decrease, fieldLogReader.timeRange() relies on the order."""
+        with self._lock:
+            self._reserve(self.count + 1)
+            self._records[self.count] = (timestamp, field, state)
+            self.count += 1
+            if time.monotonic() - self._lastFlush >= self.flushInterval:
+                self._flush()
+
+    def sample(self):
+        """Reads the field and state from the magnet and appends them with the present time.
+        The time is measured with time.monotonic() from when the recorder opened, so it never goes backwards."""
+        field = self.magnet.getFieldCartesian()
+        if self.coordinates == 'spherical':
+            #FIELD? is not polled, converting keeps spherical logs on the poll cache too
+            field = cartesianToSpherical(field)
+        state = self.magnet.getState()
+        self.append(self._startTime + time.monotonic() - self._startMonotonic, field, state)
+
+    def _flush(self):
+        self._records.flush()
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, COORDINATES.index(self.coordinates), self.units, self.count))
+        self._file.flush()
+        self._lastFlush = time.monotonic()
+
+    def flush(self):
+        """Writes outstanding samples and the record count to disk."""
+        with self._lock:
+            self._flush()
+
+    def start(self):
+        """Samples every interval seconds from a background thread until stop()."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__recordLoop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def close(self):
+        """Stops sampling and closes the file. The unused tail of the last chunk is kept for later appends."""
+        self.stop()
+        with self._lock:
+            self._flush()
+            del self._records
+            self._records = None
+            self._file.close()
+
+    def __recordLoop(self):
+        nextTime = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as error:
+                #Keep logging through transient errors, the gap shows up in the timestamps
+                logger.warning("Field log sample failed: %s", error)
+            nextTime += self.interval
+            self._stop.wait(max(0.0, nextTime - time.monotonic()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class fieldLogReader:
+    """Read-only view of a field log. Only the pages that are sliced are loaded.
+    Samples are in time order, so timeRange() finds its bounds by binary search.
+    Call refresh() to see samples flushed by a recorder that is still running.
+    """
+    def __init__(self, filePath: str):
+        self.filePath = filePath
+        self.refresh()
+
+    def refresh(self):
+        with open(self.filePath, 'rb') as file:
+            coordinates, units, count = _readHeader(file)
+        self.coordinates = COORDINATES[coordinates]
+        self.units = None if units == 255 else units
+        self.count = count
+        if count:
+            self.records = np.memmap(self.filePath, dtype=recordDtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=recordDtype)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def timeRange(self, start: float | None = None, stop: float | None = None) -> np.ndarray:
+        """Returns a copy of the samples with start <= time < stop (Unix seconds, None for open ended)."""
+        times = self.records['time']
+        first = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        last = self.count if stop is None else int(np.searchsorted(times, stop, side='left'))
+        return np.array(self.records[first:last])
@@ -0,0 +1,197 @@
+#Field map sweeps on top of vectorMagnet.
+#Points are validated and ordered up front, then driven one target at a time with a readback per point.
+import time
+from typing import NamedTuple
+import numpy as np
+try:
+    from .coordinates import sphericalToCartesian
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from coordinates import sphericalToCartesian
+
+class sweepReadback(NamedTuple):
+    """Result for one swept point. index is the row of the point in the array passed to fieldSweep."""
+    index: int
+    target: tuple[float, float, float]
+    field: tuple[float, float, float]
+    state: int
+    arrivalTime: float
+    elapsed: float
+
+def sphericalToCartesianArray(points: np.ndarray) -> np.ndarray:
+    """Converts (N, 3) rows of magnitude, azimuth, inclination (degrees) to Bx, By, Bz."""
+    return sphericalToCartesian(np.atleast_2d(points))
+
+def nearestNeighbourOrder(points: np.ndarray, start: np.ndarray | None = None) -> np.ndarray:
+    """Greedy visiting order of Cartesian points starting closest to start (the origin if None)."""
+    count = len(points)
+    order = np.empty(count, dtype=int)
+    visited = np.zeros(count, dtype=bool)
+    current = np.zeros(3) if start is None else np.asarray(start, dtype=float)
+    for step in range(count):
+        distance = np.linalg.norm(points - current, axis=1)
+        distance[visited] = np.inf
+        nextIndex = int(np.argmin(distance))
+        order[step] = nextIndex
+        visited[nextIndex] = True
+        current = points[nextIndex]
+    return order
+
+def twoOptOrder(points: np.ndarray, order: np.ndarray, start: np.ndarray | None = None, maxPasses: int = 20) -> np.ndarray:
+    """Improves an open path by reversing segments while that shortens the total ramp distance."""
+    origin = np.zeros(3) if start is None else np.asarray(start, dtype=float)
+    order = order.copy()
+    for _ in range(maxPasses):
+        improved = False
+        path = np.vstack((origin, points[order]))
+        for i in range(1, len(path)-1):
+            #Reverse path[i:j+1]. Compare edges (i-1, i) + (j, j+1) with (i-1, j) + (i, j+1); j+1 may be past the end.
+            a, b = path[i-1], path[i]
+            j = np.arange(i+1, len(path))
+            c = path[j]
+            d = np.vstack((path[i+2:], np.full((1, 3), np.nan)))[j-i-1]
+            before = np.linalg.norm(a-b) + np.nan_to_num(np.linalg.norm(c-d, axis=1))
+            after = np.linalg.norm(c-a, axis=1) + np.nan_to_num(np.linalg.norm(b-d, axis=1))
+            gain = before - after
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-12:
+                end = int(j[best])
+                order[i-1:end] = order[i-1:end][::-1]
+                path = np.vstack((origin, points[order]))
+                improved = True
+        if not improved:
+            break
+    return order
+
+def pathLength(points: np.ndarray, order: np.ndarray, start: np.ndarray | None = None) -> float:
+    """Total straight-line ramp distance visiting points in order from start (the origin if None)."""
+    origin = np.zeros((1, 3)) if start is None else np.asarray(start, dtype=float).reshape(1, 3)
+    path = np.vstack((origin, points[order]))
+    return float(np.linalg.norm(np.diff(path, axis=0), axis=1).sum())
+
+class fieldSweep:
+    """Sweeps a vectorMagnet through an array of field points.
+    points is an (N, 3) array of Bx, By, Bz (coordinates='cartesian') or magnitude, azimuth, inclination
+    (coordinates='spherical') in the present field units. dwellTimes is a scalar or length N array of seconds
+    to hold each point before the readback; it is also stored in the instrument vector table.
+    order is 'given', 'nearest' (greedy nearest neighbour from the present field) or 'shortest'
+    (nearest neighbour refined by 2-opt, for sweeps up to a few thousand points).
+    Iterating the sweep drives the magnet and yields one sweepReadback per point, in visiting order.
+    With a tableManager as tables, points already in the vector table are driven by row number instead of being
+    appended again, so repeating a sweep does not grow the table.
+    Example:
+        sweep = fieldSweep(magnet, np.array([[0, 0, 0.1], [0, 0.1, 0]]), order='nearest')
+        for readback in sweep:
+            print(readback.index, readback.field)
+    """
+    def __init__(self, magnet, points, coordinates: str = 'cartesian', dwellTimes=None, order: str = 'given',
+                 startField: tuple[float, float, float] | None = None, waitTimeout: float | None = None,
+                 rampModel=None, tables=None):
+        if coordinates not in ('cartesian', 'spherical'):
+            raise Exception("coordinates must be 'cartesian' or 'spherical'.")
+        if order not in ('given', 'nearest', 'shortest'):
+            raise Exception("order must be 'given', 'nearest' or 'shortest'.")
+        self.magnet = magnet
+        self.coordinates = coordinates
+        self.points = np.atleast_2d(np.asarray(points, dtype=float))
+        dwell = np.zeros(len(self.points)) if dwellTimes is None else np.asarray(dwellTimes, dtype=float)
+        self.dwellTimes = np.broadcast_to(dwell, (len(self.points),)).copy()
+        self.waitTimeout = waitTimeout
+        self.rampModel = rampModel
+        self.tables = tables
+        self.validate()
+
+        if coordinates == 'spherical':
+            self.cartesianPoints = sphericalToCartesianArray(self.points)
+        else:
+            self.cartesianPoints = self.points
+        self.startField = startField
+        if order == 'given':
+            self.order = np.arange(len(self.points))
+        else:
+            if self.startField is None:
+                self.startField = magnet.getFieldCartesian()
+            self.order = nearestNeighbourOrder(self.cartesianPoints, self.startField)
+            if order == 'shortest':
+                self.order = twoOptOrder(self.cartesianPoints, self.order, self.startField)
+
+    def validate(self):
+        """Raises if any point or dwell time is malformed. Checks all points before anything is sent."""
+        if self.points.ndim != 2 or self.points.shape[1] != 3:
+            raise Exception("Sweep points must be an (N, 3) array.")
+        badRows = np.flatnonzero(~np.isfinite(self.points).all(axis=1))
+        if len(badRows):
+            raise Exception("Sweep points contain non-finite values at rows " + str(badRows.tolist()))
+        if self.coordinates == 'spherical':
+            badRows = np.flatnonzero(self.points[:, 0] < 0)
+            if len(badRows):
+                raise Exception("Negative magnitude at rows " + str(badRows.tolist()))
+            badRows = np.flatnonzero((self.points[:, 2] < 0) | (self.points[:, 2] > 180))
+            if len(badRows):
+                raise Exception("Inclination out of range at rows " + str(badRows.tolist()))
+        if not np.isfinite(self.dwellTimes).all() or (self.dwellTimes < 0).any():
+            raise Exception("Dwell times must be finite and non-negative.")
+        limits = self.magnet.activeFieldLimits()
+        if limits is not None:
+            if self.coordinates == 'cartesian':
+                codes = limits.validateCartesian(self.points)
+            else:
+                codes = limits.validateSpherical(self.points)
+            badRows = np.flatnonzero(codes)
+            if len(badRows):
+                raise Exception("Sweep points exceed field limits at rows " + str(badRows.tolist())
+                                + ", first error code " + str(codes[badRows[0]]))
+
+    def totalDistance(self) -> float:
+        """Straight-line ramp distance of the sweep in the chosen order, from the start field."""
+        return pathLength(self.cartesianPoints, self.order, self.startField)
+
+    def estimatedDuration(self, rampModel=None) -> float:
+        """Predicted run time in seconds of the whole sweep, ramps plus dwells, without touching the magnet.
+        Uses the sweep's rampModel if none is given. Starts from the origin if the start field is not known."""
+        model = self.rampModel if rampModel is None else rampModel
+        start = (0.0, 0.0, 0.0) if self.startField is None else self.startField
+        return float(model.predictPath(self.cartesianPoints[self.order], start).sum() + self.dwellTimes.sum())
+
+    def uploadTable(self, replace: bool = False) -> bool:
+        """Adds every point of the sweep to the vector table in one upload, see tableManager.upload().
+        Needs tables and a disconnected magnet. Returns True if the table changed."""
+        if self.tables is None:
+            raise Exception("uploadTable needs a tableManager as tables.")
+        rows = np.column_stack((self.cartesianPoints[self.order], self.dwellTimes[self.order]))
+        return self.tables.upload(vectorRows=rows, replace=replace)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        startTime = time.monotonic()
+        expectedDurations = None
+        if self.rampModel is not None:
+            start = self.magnet.getFieldCartesian() if self.startField is None else self.startField
+            expectedDurations = self.rampModel.predictPath(self.cartesianPoints[self.order], start)
+        for step, index in enumerate(self.order):
+            point = self.points[index]
+            dwell = float(self.dwellTimes[index])
+            if self.tables is not None:
+                self.tables.setTargetVector(*self.cartesianPoints[index], dwell)
+            elif self.coordinates == 'cartesian':
+                self.magnet.setTargetFieldCartesian(*point, dwell)
+            else:
+                self.magnet.setTargetFieldSpherical(*point, dwell)
+            #With a ramp model the wait sleeps on the prediction instead of querying TARG:TIME?
+            rampStart = time.monotonic()
+            state = self.magnet.waitUntilHolding(timeout=self.waitTimeout, expectedDuration=None
+                                                 if expectedDurations is None else float(expectedDurations[step]))
+            arrivalTime = time.monotonic()
+            if self.rampModel is not None:
+                previous = start if step == 0 else self.cartesianPoints[self.order[step-1]]
+                self.rampModel.observe(previous, self.cartesianPoints[index], arrivalTime-rampStart)
+            if dwell > 0:
+                time.sleep(dwell)
+            if self.coordinates == 'cartesian':
+                field = self.magnet.getFieldCartesian()
+            else:
+                field = self.magnet.getFieldSpherical()
+            yield sweepReadback(int(index), tuple(float(p) for p in point), field, state,
+                                arrivalTime-startTime, time.monotonic()-startTime)
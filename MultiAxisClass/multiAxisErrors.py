@@ -0,0 +1,186 @@
+#Exceptions for the Multi-Axis error queue, one class per error code.
+#Error strings read from SYST:ERR? look like -152,"Magnitude exceeds limit" and are mapped to a class by code.
+#str() of every error keeps that exact format, so matching on str(magnet.magnitudeLimitError) keeps working.
+
+#Error code -> exception class. Filled in as the classes below are defined.
+errorClasses = {}
+
+class MultiAxisError(Exception):
+    """Base class for errors reported by Multi-Axis. code is None for errors raised by the driver itself."""
+    code = None
+    message = 'Unknown error'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'code' in cls.__dict__ and cls.code is not None:
+            errorClasses[cls.code] = cls
+
+    def __init__(self, message: str | None = None, code: int | None = None):
+        if message is not None:
+            self.message = message
+        if code is not None:
+            self.code = code
+        super().__init__(str(self))
+
+    def __str__(self):
+        if self.code is None:
+            return self.message
+        return f'{self.code},"{self.message}"'
+
+#-1xx: the command itself was rejected
+class CommandError(MultiAxisError):
+    pass
+
+class UnrecognizedCommandError(CommandError):
+    code = -101
+    message = 'Unrecognized command'
+
+class InvalidArgumentError(CommandError):
+    code = -102
+    message = 'Invalid argument'
+
+class NonBooleanArgumentError(CommandError):
+    code = -103
+    message = 'Non-boolean argument'
+
+class MissingParameterError(CommandError):
+    code = -104
+    message = 'Missing parameter'
+
+class ValueRangeError(CommandError):
+    code = -105
+    message = 'Value out of range'
+
+#-15x/-160: the requested target field is not reachable
+class TargetError(CommandError):
+    pass
+
+class NonNumericalEntryError(TargetError):
+    code = -151
+    message = 'Non-numerical entry'
+
+class MagnitudeLimitError(TargetError):
+    code = -152
+    message = 'Magnitude exceeds limit'
+
+class NegativeMagnitudeError(TargetError):
+    code = -153
+    message = 'Negative magnitude'
+
+class InclinationRangeError(TargetError):
+    code = -154
+    message = 'Inclination out of range'
+
+class CoilLimitError(TargetError):
+    """Field exceeds the limit of one of the coils. axis is 'x', 'y' or 'z'."""
+    axis = None
+
+class CoilMissingError(TargetError):
+    """Field needs a coil that is not installed. axis is 'x', 'y' or 'z'."""
+    axis = None
+
+class XCoilLimitError(CoilLimitError):
+    code = -155
+    message = 'Field exceeds x-coil limit'
+    axis = 'x'
+
+class XCoilMissingError(CoilMissingError):
+    code = -156
+    message = 'Field requires x-coil'
+    axis = 'x'
+
+class YCoilLimitError(CoilLimitError):
+    code = -157
+    message = 'Field exceeds y-coil limit'
+    axis = 'y'
+
+class YCoilMissingError(CoilMissingError):
+    code = -158
+    message = 'Field requires y-coil'
+    axis = 'y'
+
+class ZCoilLimitError(CoilLimitError):
+    code = -159
+    message = 'Field exceeds z-coil limit'
+    axis = 'z'
+
+class ZCoilMissingError(CoilMissingError):
+    code = -160
+    message = 'Field requires z-coil'
+    axis = 'z'
+
+#-2xx: the query was rejected
+class UnrecognizedQueryError(MultiAxisError):
+    code = -201
+    message = 'Unrecognized query'
+
+#-3xx: the command is not allowed in the present system state
+class SystemStateError(MultiAxisError):
+    pass
+
+class NotConnectedError(SystemStateError):
+    code = -301
+    message = 'Not connected'
+
+class SwitchTransitionError(SystemStateError):
+    code = -302
+    message = 'Switch in transition'
+
+class QuenchError(SystemStateError):
+    code = -303
+    message = 'Quench condition'
+
+class UnitsConnectedError(SystemStateError):
+    code = -304
+    message = 'No units change while connected'
+
+class CannotEnterPersistenceError(SystemStateError):
+    code = -305
+    message = 'Cannot enter persistence'
+
+class PersistentError(SystemStateError):
+    code = -306
+    message = 'System is persistent'
+
+class NoSwitchError(SystemStateError):
+    code = -307
+    message = 'No switch installed'
+
+class LoadConnectedError(SystemStateError):
+    code = -308
+    message = 'Cannot LOAD while connected'
+
+#Raised by the driver, not the instrument
+class MultiAxisTimeoutError(MultiAxisError, TimeoutError):
+    message = 'Timed out waiting for Multi-Axis'
+
+class ConnectionAttemptTimeoutError(MultiAxisTimeoutError):
+    message = 'Connection attempt exceeded time limit. Program in unknown state'
+
+class ProgramExitedError(MultiAxisError):
+    message = 'Multi-Axis program is not running'
+
+class RampStoppedError(MultiAxisError):
+    """The magnet stopped short of the target in a state it will not leave by itself, e.g. PAUSED."""
+    message = 'Ramp stopped before reaching the target'
+
+def errorFromString(errorString: str) -> MultiAxisError:
+    """Builds the exception for an error string such as -152,"Magnitude exceeds limit".
+    Unknown codes give a plain MultiAxisError carrying the code and message."""
+    codeString, _, message = errorString.strip().partition(',')
+    message = message.strip().strip('"')
+    try:
+        code = int(codeString)
+    except ValueError:
+        return MultiAxisError(errorString.strip())
+    errorClass = errorClasses.get(code)
+    if errorClass is None:
+        return MultiAxisError(message, code)
+    return errorClass(message or None)
+
+def errorFromCode(code: int) -> MultiAxisError:
+    """Builds the exception for an error code with its standard message."""
+    errorClass = errorClasses.get(code)
+    if errorClass is None:
+        return MultiAxisError(code=code)
+    return errorClass()
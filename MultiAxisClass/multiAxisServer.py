@@ -0,0 +1,247 @@
+#Shares one Multi-Axis session between processes.
+#The server owns the vectorMagnet (and so the pipe) and answers newline delimited JSON requests on a localhost
+#TCP socket. Identical read requests that arrive while one is in flight share its result, so any number of
+#clients polling the field cost one instrument read. multiAxisClient has the same method names as vectorMagnet.
+#Run as a script to start a server, see main().
+import argparse
+import concurrent.futures
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+try:
+    from .vectorMagnet import vectorMagnet, statusSnapshot
+    from .multiAxisSimulator import simulatorCommand
+    from . import multiAxisErrors
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from vectorMagnet import vectorMagnet, statusSnapshot
+    from multiAxisSimulator import simulatorCommand
+    import multiAxisErrors
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7180
+
+#vectorMagnet methods that only read and can be shared between identical concurrent requests
+coalescedMethods = frozenset({
+    'getState', 'getFieldCartesian', 'getFieldSpherical', 'getTargetFieldCartesian', 'getTargetFieldSpherical',
+    'getTimeToTarget', 'getStatusSnapshot', 'getIDN', 'getUnits', 'getPersistentMode', 'getErrorCount',
+    'getSampleAlignmentVectorSpherical', 'getSampleAlignmentVectorCartesian', 'getSampleAlignmentPlane',
+})
+
+#Methods that manage the session itself or do not take or return plain values. They stay with the server.
+serverOnlyMethods = frozenset({
+    'initialize_program', 'exit_program', 'startup', 'waitUntilReady', 'startPolling', 'stopPolling',
+    'enableTransactionLog', 'disableTransactionLog', 'deferredErrorChecks', 'activeFieldLimits', 'getCachedSample',
+    'queryMany',
+})
+
+remoteMethods = tuple(sorted(name for name in dir(vectorMagnet)
+                             if not name.startswith('_') and callable(getattr(vectorMagnet, name))
+                             and not isinstance(getattr(vectorMagnet, name), BaseException)
+                             and name not in serverOnlyMethods))
+
+def _encodeError(error: BaseException) -> dict:
+    return {'type': type(error).__name__, 'code': getattr(error, 'code', None),
+            'message': getattr(error, 'message', str(error))}
+
+def _decodeError(error: dict) -> Exception:
+    """Rebuilds the exception raised on the server, as its multiAxisErrors class where there is one."""
+    if error['code'] is not None:
+        return multiAxisErrors.errorFromString(str(error['code']) + ',"' + error['message'] + '"')
+    errorClass = getattr(multiAxisErrors, error['type'], None)
+    if isinstance(errorClass, type) and issubclass(errorClass, multiAxisErrors.MultiAxisError):
+        return errorClass(error['message'])
+    return Exception(error['message'])
+
+class multiAxisServer:
+    """Serves magnet, an initialized vectorMagnet, to multiAxisClient connections on host:port.
+    Each connection is handled on its own thread; the magnet's command channel keeps the pipe traffic in order.
+    Calls in coalescedMethods with the same arguments share one instrument read while it is in flight, and for
+    coalesceWindow seconds after it completes.
+    Example:
+        server = multiAxisServer(magnet)
+        server.start()
+        ...
+        server.close()
+    """
+    def __init__(self, magnet, host: str = '127.0.0.1', port: int = DEFAULT_PORT, coalesceWindow: float = 0.0):
+        self.magnet = magnet
+        self.coalesceWindow = coalesceWindow
+        self._inFlight = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        #Requests received, and calls actually made on the magnet after coalescing
+        self.requestCount = 0
+        self.executeCount = 0
+
+        server = self
+        class requestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server._handleConnection(self.rfile, self.wfile)
+
+        self._tcpServer = socketserver.ThreadingTCPServer((host, port), requestHandler, bind_and_activate=False)
+        self._tcpServer.daemon_threads = True
+        self._tcpServer.allow_reuse_address = True
+        self._tcpServer.server_bind()
+        self._tcpServer.server_activate()
+        self.address = self._tcpServer.server_address
+
+    def start(self):
+        """Serves from a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._tcpServer.serve_forever, name='multiAxisServer', daemon=True)
+            self._thread.start()
+            logger.info("Serving Multi-Axis on %s:%d", *self.address)
+
+    def serveForever(self):
+        """Serves on the calling thread until close() is called from another thread."""
+        logger.info("Serving Multi-Axis on %s:%d", *self.address)
+        self._tcpServer.serve_forever()
+
+    def close(self):
+        """Stops serving. The magnet is left running."""
+        self._tcpServer.shutdown()
+        self._tcpServer.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def call(self, method: str, args: list, kwargs: dict):
+        """Runs one client request on the magnet, sharing the result with identical concurrent reads."""
+        if method not in remoteMethods:
+            raise Exception("Method " + method + " is not available over the server.")
+        with self._lock:
+            self.requestCount += 1
+        if method not in coalescedMethods:
+            return self.__execute(method, args, kwargs)
+        key = (method, json.dumps(args), json.dumps(kwargs, sort_keys=True))
+        with self._lock:
+            shared = self._inFlight.get(key)
+            if shared is not None:
+                future, completedAt = shared
+                if completedAt is None or time.monotonic() - completedAt <= self.coalesceWindow:
+                    owner = False
+                else:
+                    shared = None
+            if shared is None:
+                future = concurrent.futures.Future()
+                self._inFlight[key] = (future, None)
+                owner = True
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self.__execute(method, args, kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        with self._lock:
+            if self.coalesceWindow > 0 and future.exception() is None:
+                self._inFlight[key] = (future, time.monotonic())
+            else:
+                del self._inFlight[key]
+        return future.result()
+
+    def __execute(self, method: str, args: list, kwargs: dict):
+        with self._lock:
+            self.executeCount += 1
+        return getattr(self.magnet, method)(*args, **kwargs)
+
+    def _handleConnection(self, rfile, wfile):
+        for line in rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                logger.warning("Ignoring malformed request %r", line[:80])
+                continue
+            reply = {'id': request.get('id')}
+            try:
+                reply['result'] = self.call(request['method'], request.get('args', []), request.get('kwargs', {}))
+            except Exception as error:
+                reply['error'] = _encodeError(error)
+            wfile.write(json.dumps(reply).encode('ascii') + b'\n')
+            wfile.flush()
+
+class multiAxisClient:
+    """Connection to a multiAxisServer. Has the methods of vectorMagnet except those in serverOnlyMethods, with the
+    same arguments and return values; errors raised on the server are raised again here as the same class.
+    One client may be shared by threads, its calls are sent one at a time.
+    Example:
+        magnet = multiAxisClient()
+        Bx, By, Bz = magnet.getFieldCartesian()
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT, timeout: float | None = None):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+        self._nextId = 0
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._lock:
+            self._nextId += 1
+            request = {'id': self._nextId, 'method': method, 'args': list(args), 'kwargs': kwargs}
+            self._file.write(json.dumps(request).encode('ascii') + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise multiAxisErrors.ProgramExitedError("Multi-Axis server closed the connection")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise _decodeError(reply['error'])
+        result = reply['result']
+        #JSON has no tuples; vectorMagnet returns tuples for vectors and snapshots
+        if isinstance(result, list):
+            result = tuple(tuple(value) if isinstance(value, list) else value for value in result)
+            if method == 'getStatusSnapshot':
+                result = statusSnapshot(*result)
+        return result
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _remoteMethod(name: str):
+    def method(self, *args, **kwargs):
+        return self._call(name, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(vectorMagnet, name).__doc__
+    return method
+
+for _name in remoteMethods:
+    setattr(multiAxisClient, _name, _remoteMethod(_name))
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Owns one Multi-Axis session and shares it with local clients.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port on localhost.')
+    parser.add_argument('--program', default=None, help='Multi-Axis executable. Defaults to the lab install path.')
+    parser.add_argument('--simulator', action='store_true', help='Serve a simulated Multi-Axis instead.')
+    parser.add_argument('--settings', default=None, help='.sav file to load before connecting.')
+    parser.add_argument('--query-interval', type=float, default=1.001, help='Minimum seconds between instrument queries.')
+    parser.add_argument('--coalesce-window', type=float, default=0.0,
+                        help='Seconds a completed read is reused for identical requests.')
+    parser.add_argument('--no-connect', action='store_true', help='Do not connect to the Model 430s on startup.')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    program = simulatorCommand() if args.simulator else args.program
+    magnet = vectorMagnet(multiProgramPath=program, queryInterval=args.query_interval)
+    magnet.startup(settingsFile=args.settings or False, connect=not args.no_connect)
+    server = multiAxisServer(magnet, port=args.port, coalesceWindow=args.coalesce_window)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._tcpServer.server_close()
+        magnet.exit_program()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#Reader for Multi-Axis .sav settings files, so limits, ramp rates and table contents are known without querying.
+#Multi-Axis saves its settings as a LabVIEW configuration file: [Section] headers followed by key = value lines,
+#strings optionally in double quotes and booleans as TRUE/FALSE. The sections read are:
+#   [System]            Units (0 kG, 1 T), Magnitude Limit, Sample Alignment 1 and 2 ("magnitude, azimuth, inclination")
+#   [X Axis] .. [Z Axis] Installed, Coil Constant (field units per A), Current Limit (A), Field Limit, Ramp Rate (A/s),
+#                        Switch Installed
+#   [Vector Table]      Row 1, Row 2, ... as "Bx, By, Bz, hold time"
+#   [Polar Table]       Row 1, Row 2, ... as "magnitude, angle, hold time"
+#Keys are matched without regard to case. Every key, read or not, is also kept as a string in settings.raw.
+import configparser
+import os
+import threading
+from typing import NamedTuple
+try:
+    from .fieldLimits import fieldLimits
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from fieldLimits import fieldLimits
+
+AXES = ('x', 'y', 'z')
+
+class axisSettings(NamedTuple):
+    """Settings of one coil. Fields are in the file's units, currents in amperes."""
+    installed: bool
+    coilConstant: float
+    currentLimit: float
+    fieldLimit: float
+    rampRate: float
+    switchInstalled: bool
+
+    @property
+    def fieldRampRate(self) -> float:
+        """Ramp rate in field units per second."""
+        return self.rampRate*self.coilConstant
+
+class multiAxisSettings(NamedTuple):
+    """Contents of a .sav file. axes holds the x, y and z axisSettings. Alignment vectors are spherical.
+    vectorTable rows are (Bx, By, Bz, hold time); polarTable rows are (magnitude, angle, hold time)."""
+    units: int
+    magnitudeLimit: float
+    axes: tuple[axisSettings, axisSettings, axisSettings]
+    alignment1: tuple[float, float, float]
+    alignment2: tuple[float, float, float]
+    vectorTable: tuple[tuple[float, float, float, float], ...]
+    polarTable: tuple[tuple[float, float, float], ...]
+    raw: dict
+
+    def fieldLimits(self) -> fieldLimits:
+        """The coil and magnitude limits, for vectorMagnet.fieldLimits."""
+        return fieldLimits(*[axis.fieldLimit if axis.installed else None for axis in self.axes],
+                           self.magnitudeLimit, self.units)
+
+    def rampModel(self, overhead: float = 0.0):
+        """A rampModel with the per-axis ramp rates, in the file's units. Needs numpy."""
+        try:
+            from .rampModel import rampModel
+        except ImportError:
+            #Imported as a top level module, e.g. from Matlab with this folder on the python path
+            from rampModel import rampModel
+        return rampModel.fromCurrentRates([axis.rampRate if axis.installed else 0.0 for axis in self.axes],
+                                          [axis.coilConstant for axis in self.axes], overhead=overhead)
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+def _boolean(value: str) -> bool:
+    value = _unquote(value).upper()
+    if value not in ('TRUE', 'FALSE', '1', '0'):
+        raise ValueError("Not a boolean: " + value)
+    return value in ('TRUE', '1')
+
+def _numbers(value: str, count: int) -> tuple[float, ...]:
+    numbers = tuple(float(part) for part in _unquote(value).replace(';', ',').split(','))
+    if len(numbers) != count:
+        raise ValueError("Expected " + str(count) + " numbers: " + value)
+    return numbers
+
+def _tableRows(parser: configparser.ConfigParser, section: str, count: int) -> tuple:
+    if not parser.has_section(section):
+        return ()
+    rows = {}
+    for key, value in parser.items(section):
+        if key.startswith('row '):
+            rows[int(key[4:])] = _numbers(value, count)
+    #Rows are numbered from 1 and must not have gaps, as on the instrument
+    if sorted(rows) != list(range(1, len(rows) + 1)):
+        raise ValueError("[" + section + "] rows must be numbered 1 to " + str(len(rows)))
+    return tuple(rows[row] for row in range(1, len(rows) + 1))
+
+def parseSettings(text: str) -> multiAxisSettings:
+    """Parses the text of a .sav file. Raises ValueError naming the first missing or malformed entry."""
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read_string(text)
+    except configparser.Error as error:
+        raise ValueError("Not a Multi-Axis settings file: " + str(error)) from error
+
+    def get(section: str, key: str, convert=float, default=None):
+        if not parser.has_option(section, key):
+            if default is not None:
+                return default
+            raise ValueError("[" + section + "] " + key + " is missing")
+        try:
+            return convert(parser.get(section, key))
+        except ValueError as error:
+            raise ValueError("[" + section + "] " + key + ": " + str(error)) from error
+
+    number = lambda value: float(_unquote(value))
+    axes = []
+    for axis in AXES:
+        section = axis.upper() + ' Axis'
+        installed = get(section, 'installed', _boolean, True) if parser.has_section(section) else False
+        if not installed:
+            axes.append(axisSettings(False, 0.0, 0.0, 0.0, 0.0, False))
+            continue
+        axes.append(axisSettings(True, get(section, 'coil constant', number), get(section, 'current limit', number),
+                                 get(section, 'field limit', number), get(section, 'ramp rate', number),
+                                 get(section, 'switch installed', _boolean, False)))
+    units = int(get('System', 'units', number))
+    if units not in (0, 1):
+        raise ValueError("[System] units must be 0 or 1")
+    return multiAxisSettings(
+        units=units,
+        magnitudeLimit=get('System', 'magnitude limit', number),
+        axes=tuple(axes),
+        alignment1=get('System', 'sample alignment 1', lambda value: _numbers(value, 3)),
+        alignment2=get('System', 'sample alignment 2', lambda value: _numbers(value, 3)),
+        vectorTable=_tableRows(parser, 'Vector Table', 4),
+        polarTable=_tableRows(parser, 'Polar Table', 3),
+        raw={section: dict(parser.items(section)) for section in parser.sections()},
+    )
+
+def _formatRow(values) -> str:
+    return '"' + ', '.join(f'{value:.15g}' for value in values) + '"'
+
+def formatSettings(settings: multiAxisSettings) -> str:
+    """Writes settings in the .sav layout read by parseSettings. Keys only present in raw are not written, so
+    this is for new files such as the simulator's; use replaceTables() to change a file saved by Multi-Axis."""
+    boolean = lambda value: 'TRUE' if value else 'FALSE'
+    row = _formatRow
+    lines = ['[System]', f'Units = {settings.units}', f'Magnitude Limit = {settings.magnitudeLimit:.15g}',
+             'Sample Alignment 1 = ' + row(settings.alignment1), 'Sample Alignment 2 = ' + row(settings.alignment2)]
+    for name, axis in zip(AXES, settings.axes):
+        lines += ['', '[' + name.upper() + ' Axis]', 'Installed = ' + boolean(axis.installed)]
+        if axis.installed:
+            lines += [f'Coil Constant = {axis.coilConstant:.15g}', f'Current Limit = {axis.currentLimit:.15g}',
+                      f'Field Limit = {axis.fieldLimit:.15g}', f'Ramp Rate = {axis.rampRate:.15g}',
+                      'Switch Installed = ' + boolean(axis.switchInstalled)]
+    for section, table in (('Vector Table', settings.vectorTable), ('Polar Table', settings.polarTable)):
+        lines += ['', '[' + section + ']'] + [f'Row {index} = ' + row(values) for index, values in enumerate(table, 1)]
+    return '\n'.join(lines) + '\n'
+
+#Sections rewritten by replaceTables, by lower case name
+TABLE_SECTIONS = {'vector table': 'Vector Table', 'polar table': 'Polar Table'}
+
+def replaceTables(text: str, vectorTable, polarTable) -> str:
+    """Returns the text of a .sav file with its [Vector Table] and [Polar Table] sections replaced by the given rows.
+    Every other line is kept exactly as it was, including keys parseSettings does not read and the line endings.
+    Missing table sections are added at the end."""
+    newline = '\r\n' if '\r\n' in text else '\n'
+    tables = {'vector table': vectorTable, 'polar table': polarTable}
+
+    def sectionLines(name: str) -> list[str]:
+        return (['[' + TABLE_SECTIONS[name] + ']' + newline]
+                + [f'Row {index} = ' + _formatRow(values) + newline for index, values in enumerate(tables[name], 1)])
+
+    output = []
+    written = set()
+    skipping = False
+    #Blank lines at the end of a replaced section still separate it from the next one
+    trailingBlanks = []
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith('[') and stripped.endswith(']'):
+            output += trailingBlanks
+            trailingBlanks = []
+            name = stripped[1:-1].strip().lower()
+            skipping = name in tables
+            if skipping:
+                #A repeated table section is dropped, configparser would have merged it into the first
+                if name not in written:
+                    output += sectionLines(name)
+                    written.add(name)
+                continue
+        if not skipping:
+            output.append(line)
+        elif stripped:
+            trailingBlanks = []
+        else:
+            trailingBlanks.append(line)
+    output += trailingBlanks
+    for name in tables:
+        if name not in written:
+            if output and not output[-1].endswith(('\n', '\r')):
+                output.append(newline)
+            output += [newline] + sectionLines(name)
+    return ''.join(output)
+
+#Parsed files by absolute path, with the modification time and size they were parsed at
+_cache = {}
+_cacheLock = threading.Lock()
+
+def readSettings(filePath: str) -> multiAxisSettings:
+    """Parses a .sav file. The result is cached and reused until the file's modification time or size changes."""
+    path = os.path.abspath(filePath)
+    status = os.stat(path)
+    key = (status.st_mtime_ns, status.st_size)
+    with _cacheLock:
+        cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    #Files are written in the Windows code page by Multi-Axis; only ASCII is expected
+    with open(path, encoding='latin-1') as settingsFile:
+        settings = parseSettings(settingsFile.read())
+    with _cacheLock:
+        _cache[path] = (key, settings)
+    return settings
+
+def clearSettingsCache():
+    with _cacheLock:
+        _cache.clear()
+
+def diffSettings(old: multiAxisSettings, new: multiAxisSettings) -> list[tuple[str, object, object]]:
+    """Lists the differences between two settings as (name, old value, new value), e.g.
+    ('axes.z.rampRate', 0.02, 0.01) or ('vectorTable[3]', None, (0.0, 0.0, 1.0, 0.0)) for an added row."""
+    differences = []
+    for name in ('units', 'magnitudeLimit', 'alignment1', 'alignment2'):
+        if getattr(old, name) != getattr(new, name):
+            differences.append((name, getattr(old, name), getattr(new, name)))
+    for axis, oldAxis, newAxis in zip(AXES, old.axes, new.axes):
+        for name in axisSettings._fields:
+            if getattr(oldAxis, name) != getattr(newAxis, name):
+                differences.append(('axes.' + axis + '.' + name, getattr(oldAxis, name), getattr(newAxis, name)))
+    for name in ('vectorTable', 'polarTable'):
+        oldTable, newTable = getattr(old, name), getattr(new, name)
+        for index in range(max(len(oldTable), len(newTable))):
+            oldRow = oldTable[index] if index < len(oldTable) else None
+            newRow = newTable[index] if index < len(newTable) else None
+            if oldRow != newRow:
+                #Named by table row, which starts at 1
+                differences.append((name + '[' + str(index + 1) + ']', oldRow, newRow))
+    return differences
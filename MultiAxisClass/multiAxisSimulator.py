@@ -0,0 +1,507 @@
+#Stand-in for the AMI Multi-Axis-Operation program running in pipe mode (-p)
+#Reads SCPI lines on stdin and writes one response line per query on stdout, like the real program.
+#Intended for tests and benchmarks on machines without the magnet attached.
+#Simulator-only commands live under the SIM: prefix and are never sent by vectorMagnet.
+import argparse
+import math
+import os
+import sys
+import time
+try:
+    from .multiAxisErrors import errorClasses
+    from .multiAxisSettings import axisSettings, multiAxisSettings, parseSettings, formatSettings
+except ImportError:
+    #Run as a script, this folder is on the python path
+    from multiAxisErrors import errorClasses
+    from multiAxisSettings import axisSettings, multiAxisSettings, parseSettings, formatSettings
+
+#Messages are taken from the driver's exception classes so both sides agree on the wording
+errorMessages = {code: errorClass.message for code, errorClass in errorClasses.items()}
+
+#Coil constant written to saved settings, in tesla per ampere
+SIMULATED_COIL_CONSTANT = 0.1
+
+#Long SCPI keywords. Any prefix of at least three characters is accepted, as the program accepts both TAB and TABL.
+scpiKeywords = ('CONFIGURE', 'CONNECT', 'DISCONNECT', 'SYSTEM', 'ERROR', 'COUNT', 'TARGET', 'VECTOR', 'CARTESIAN',
+                'TABLE', 'POLAR', 'ALIGN', 'UNITS', 'SETTINGS', 'LOAD', 'SAVE', 'PERSISTENT', 'STATE', 'FIELD',
+                'TIME', 'PLANE', 'PAUSE', 'RAMP', 'ZERO', 'EXIT', 'VIOLATIONS', 'STALL', 'SIM')
+
+#Queries that are answered by the Model 430's and therefore subject to the one sample per second limit
+instrumentQueries = frozenset({'STATE', 'FIELD', 'FIELD:CARTESIAN', 'TARGET', 'TARGET:CARTESIAN', 'TARGET:TIME'})
+
+DISCONNECTED = 0
+RAMPING = 1
+HOLDING = 2
+PAUSED = 3
+ZEROING = 4
+AT_ZERO = 5
+QUENCH = 6
+HEATING_SWITCH = 7
+COOLING_SWITCH = 8
+
+TESLA_PER_UNIT = {0: 0.1, 1: 1.0}
+
+
+class simulatorError(Exception):
+    """Raised internally to push an error code onto the simulated error queue."""
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+def sphericalToCartesian(magnitude: float, azimuth: float, inclination: float) -> list[float]:
+    """Azimuth is measured from +x in the xy-plane and inclination from +z, both in degrees."""
+    phi = math.radians(azimuth)
+    theta = math.radians(inclination)
+    return [magnitude*math.sin(theta)*math.cos(phi), magnitude*math.sin(theta)*math.sin(phi), magnitude*math.cos(theta)]
+
+
+def cartesianToSpherical(Bx: float, By: float, Bz: float) -> list[float]:
+    magnitude = math.sqrt(Bx*Bx + By*By + Bz*Bz)
+    if magnitude == 0:
+        return [0.0, 0.0, 0.0]
+    return [magnitude, math.degrees(math.atan2(By, Bx)), math.degrees(math.acos(max(-1.0, min(1.0, Bz/magnitude))))]
+
+
+def _normalizeKeyword(token: str) -> str:
+    stripped = token.rstrip('0123456789')
+    suffix = token[len(stripped):]
+    if len(stripped) >= 3:
+        for keyword in scpiKeywords:
+            if keyword.startswith(stripped):
+                return keyword + suffix
+    return token
+
+
+def _formatNumber(value: float) -> str:
+    return f'{value:.10g}'
+
+
+class multiAxisSimulator:
+    """Simulated Multi-Axis program state machine.
+    Field is held internally in tesla and ramps in a straight line at rampRate (tesla per second).
+    coilLimits and magnitudeLimit are in tesla. queryInterval, when non-zero, delays answers to
+    instrument queries that arrive faster than the Model 430's allow and counts them as violations.
+    """
+    def __init__(self, rampRate: float = 0.1, queryInterval: float = 0.0, connectDelay: float = 0.0,
+                 coilLimits: tuple[float, float, float] = (1.0, 1.0, 9.0), magnitudeLimit: float = 9.0,
+                 switchInstalled: bool = True, switchTime: float = 0.0, clock=time.monotonic, sleep=time.sleep):
+        self.rampRate = rampRate
+        self.queryInterval = queryInterval
+        self.connectDelay = connectDelay
+        self.coilLimits = tuple(coilLimits)
+        self.magnitudeLimit = magnitudeLimit
+        self.switchInstalled = switchInstalled
+        self.switchTime = switchTime
+        self.clock = clock
+        self.sleep = sleep
+
+        self.units = 1
+        self.errorQueue = []
+        self.connectedAt = None
+        self.mode = DISCONNECTED
+        self.persistent = False
+        self.switchDoneAt = None
+        self.switchTarget = None
+        self.rampOrigin = [0.0, 0.0, 0.0]
+        self.rampStart = 0.0
+        self.field = [0.0, 0.0, 0.0]
+        self.target = [0.0, 0.0, 0.0]
+        self.alignment = {1: [1.0, 0.0, 0.0], 2: [0.0, 1.0, 0.0]}
+        self.vectorTable = []
+        self.polarTable = []
+        self.lastInstrumentQuery = None
+        self.violations = 0
+        self.running = True
+
+    # --- time evolution ---
+    def _fieldAt(self, now: float) -> list[float]:
+        if self.mode not in (RAMPING, ZEROING):
+            return list(self.field)
+        distance = math.dist(self.rampOrigin, self.target)
+        if distance == 0 or self.rampRate <= 0:
+            return list(self.target)
+        fraction = (now - self.rampStart)*self.rampRate/distance
+        if fraction >= 1.0:
+            return list(self.target)
+        return [o + (t - o)*fraction for o, t in zip(self.rampOrigin, self.target)]
+
+    def _update(self):
+        now = self.clock()
+        if self.connectedAt is not None and self.mode == DISCONNECTED and now >= self.connectedAt:
+            self.mode = PAUSED
+        if self.switchDoneAt is not None and now >= self.switchDoneAt:
+            self.persistent = self.switchTarget
+            self.switchDoneAt = None
+            self.mode = HOLDING
+        if self.mode in (RAMPING, ZEROING):
+            self.field = self._fieldAt(now)
+            if self.field == self.target:
+                self.mode = HOLDING if self.mode == RAMPING else AT_ZERO
+                self.field = list(self.target)
+
+    def _startRamp(self, target: list[float], mode: int = RAMPING):
+        self.field = self._fieldAt(self.clock())
+        self.rampOrigin = list(self.field)
+        self.rampStart = self.clock()
+        self.target = list(target)
+        self.mode = mode
+
+    def timeToTarget(self) -> float:
+        if self.mode not in (RAMPING, ZEROING) or self.rampRate <= 0:
+            return 0.0
+        return math.dist(self._fieldAt(self.clock()), self.target)/self.rampRate
+
+    # --- settings files ---
+    def _saveSettings(self, filePath: str):
+        axes = tuple(axisSettings(True, self._fromTesla(SIMULATED_COIL_CONSTANT), limit/SIMULATED_COIL_CONSTANT,
+                                  self._fromTesla(limit), self.rampRate/SIMULATED_COIL_CONSTANT, self.switchInstalled)
+                     if limit else axisSettings(False, 0.0, 0.0, 0.0, 0.0, False) for limit in self.coilLimits)
+        settings = multiAxisSettings(self.units, self._fromTesla(self.magnitudeLimit), axes,
+                                     *[tuple(cartesianToSpherical(*[self._fromTesla(b) for b in self.alignment[i]]))
+                                       for i in (1, 2)],
+                                     tuple(tuple(row) for row in self.vectorTable),
+                                     tuple(tuple(row) for row in self.polarTable), {})
+        try:
+            with open(filePath, 'w') as settingsFile:
+                settingsFile.write(formatSettings(settings))
+        except OSError:
+            raise simulatorError(-102)
+
+    def _loadSettings(self, filePath: str):
+        try:
+            with open(filePath, encoding='latin-1') as settingsFile:
+                settings = parseSettings(settingsFile.read())
+        except (OSError, ValueError):
+            #The real program's error for unreadable files is not documented
+            raise simulatorError(-102)
+        self.units = settings.units
+        self.magnitudeLimit = self._toTesla(settings.magnitudeLimit)
+        self.coilLimits = tuple(self._toTesla(axis.fieldLimit) if axis.installed else 0.0 for axis in settings.axes)
+        self.switchInstalled = any(axis.switchInstalled for axis in settings.axes)
+        #The simulated field ramps in a straight line, at the rate of the slowest installed axis
+        rates = [self._toTesla(axis.fieldRampRate) for axis in settings.axes if axis.installed and axis.rampRate > 0]
+        if rates:
+            self.rampRate = min(rates)
+        for index, alignment in ((1, settings.alignment1), (2, settings.alignment2)):
+            self.alignment[index] = [self._toTesla(b) for b in sphericalToCartesian(*alignment)]
+        self.vectorTable = [list(row) for row in settings.vectorTable]
+        self.polarTable = [list(row) for row in settings.polarTable]
+
+    # --- argument handling ---
+    def _toTesla(self, value: float) -> float:
+        return value*TESLA_PER_UNIT[self.units]
+
+    def _fromTesla(self, value: float) -> float:
+        return value/TESLA_PER_UNIT[self.units]
+
+    def _numbers(self, arguments: str, minimum: int, maximum: int) -> list[float]:
+        parts = [p.strip() for p in arguments.split(',')] if arguments.strip() else []
+        if len(parts) < minimum:
+            raise simulatorError(-104)
+        if len(parts) > maximum:
+            raise simulatorError(-102)
+        try:
+            return [float(p) for p in parts]
+        except ValueError:
+            raise simulatorError(-151)
+
+    def _checkSpherical(self, magnitude: float, inclination: float):
+        if magnitude < 0:
+            raise simulatorError(-153)
+        if not 0 <= inclination <= 180:
+            raise simulatorError(-154)
+
+    def _checkLimits(self, cartesianTesla: list[float]):
+        if math.sqrt(sum(b*b for b in cartesianTesla)) > self.magnitudeLimit + 1e-12:
+            raise simulatorError(-152)
+        for axis, (component, limit) in enumerate(zip(cartesianTesla, self.coilLimits)):
+            if limit is None or limit == 0:
+                if abs(component) > 1e-12:
+                    raise simulatorError(-156 - 2*axis)
+            elif abs(component) > limit + 1e-12:
+                raise simulatorError(-155 - 2*axis)
+
+    def _requireConnected(self):
+        if self.mode == DISCONNECTED:
+            raise simulatorError(-301)
+        if self.mode == QUENCH:
+            raise simulatorError(-303)
+        if self.switchDoneAt is not None:
+            raise simulatorError(-302)
+        if self.persistent:
+            raise simulatorError(-306)
+
+    def _polarToCartesian(self, magnitude: float, angle: float) -> list[float]:
+        """Polar targets lie in the sample plane, measured from alignment vector 1 toward alignment vector 2."""
+        u1 = self.alignment[1]
+        n1 = math.sqrt(sum(a*a for a in u1))
+        u1 = [a/n1 for a in u1]
+        v2 = self.alignment[2]
+        projection = sum(a*b for a, b in zip(u1, v2))
+        u2 = [b - projection*a for a, b in zip(u1, v2)]
+        n2 = math.sqrt(sum(a*a for a in u2))
+        u2 = [a/n2 for a in u2]
+        rad = math.radians(angle)
+        return [magnitude*(math.cos(rad)*a + math.sin(rad)*b) for a, b in zip(u1, u2)]
+
+    def _rampToSpherical(self, magnitude: float, azimuth: float, inclination: float):
+        self._checkSpherical(magnitude, inclination)
+        target = [self._toTesla(b) for b in sphericalToCartesian(magnitude, azimuth, inclination)]
+        self._checkLimits(target)
+        self._startRamp(target)
+
+    # --- command handlers ---
+    def _command(self, header: str, arguments: str):
+        if header == '*CLS':
+            self.errorQueue.clear()
+        elif header == 'EXIT':
+            self.running = False
+        elif header == 'SYSTEM:CONNECT':
+            if self.connectedAt is None:
+                self.connectedAt = self.clock() + self.connectDelay
+        elif header == 'SYSTEM:DISCONNECT':
+            self.field = self._fieldAt(self.clock())
+            self.connectedAt = None
+            self.mode = DISCONNECTED
+        elif header == 'LOAD:SETTINGS':
+            if self.connectedAt is not None:
+                raise simulatorError(-308)
+            if not arguments.strip():
+                raise simulatorError(-104)
+            #Paths that do not exist here are accepted and ignored, so tests can use the lab paths
+            if os.path.isfile(arguments.strip()):
+                self._loadSettings(arguments.strip())
+        elif header == 'SAVE:SETTINGS':
+            if not arguments.strip():
+                raise simulatorError(-104)
+            self._saveSettings(arguments.strip())
+        elif header == 'CONFIGURE:UNITS':
+            if not arguments.strip():
+                raise simulatorError(-104)
+            if self.connectedAt is not None:
+                raise simulatorError(-304)
+            if arguments.strip() not in ('0', '1'):
+                raise simulatorError(-102)
+            self.units = int(arguments.strip())
+        elif header in ('CONFIGURE:ALIGN1', 'CONFIGURE:ALIGN2'):
+            magnitude, azimuth, inclination = self._numbers(arguments, 3, 3)
+            self._checkSpherical(magnitude, inclination)
+            if magnitude == 0:
+                raise simulatorError(-105)
+            self.alignment[int(header[-1])] = [self._toTesla(b) for b in sphericalToCartesian(magnitude, azimuth, inclination)]
+        elif header in ('CONFIGURE:TARGET:ALIGN1', 'CONFIGURE:TARGET:ALIGN2'):
+            self._requireConnected()
+            target = list(self.alignment[int(header[-1])])
+            self._checkLimits(target)
+            self._startRamp(target)
+        elif header == 'CONFIGURE:TARGET:VECTOR':
+            values = self._numbers(arguments, 3, 4)
+            self._requireConnected()
+            self._rampToSpherical(*values[:3])
+            self.vectorTable.append([self._fromTesla(b) for b in self.target] + [values[3] if len(values) > 3 else 0.0])
+        elif header == 'CONFIGURE:TARGET:VECTOR:CARTESIAN':
+            values = self._numbers(arguments, 3, 4)
+            self._requireConnected()
+            target = [self._toTesla(b) for b in values[:3]]
+            self._checkLimits(target)
+            self._startRamp(target)
+            self.vectorTable.append(values[:3] + [values[3] if len(values) > 3 else 0.0])
+        elif header == 'CONFIGURE:TARGET:VECTOR:TABLE':
+            row = self._tableRow(arguments, self.vectorTable)
+            self._requireConnected()
+            target = [self._toTesla(b) for b in self.vectorTable[row][:3]]
+            self._checkLimits(target)
+            self._startRamp(target)
+        elif header == 'CONFIGURE:TARGET:POLAR':
+            values = self._numbers(arguments, 2, 3)
+            self._requireConnected()
+            if values[0] < 0:
+                raise simulatorError(-153)
+            target = self._polarToCartesian(self._toTesla(values[0]), values[1])
+            self._checkLimits(target)
+            self._startRamp(target)
+            self.polarTable.append(values[:2] + [values[2] if len(values) > 2 else 0.0])
+        elif header == 'CONFIGURE:TARGET:POLAR:TABLE':
+            row = self._tableRow(arguments, self.polarTable)
+            self._requireConnected()
+            magnitude, angle = self.polarTable[row][:2]
+            target = self._polarToCartesian(self._toTesla(magnitude), angle)
+            self._checkLimits(target)
+            self._startRamp(target)
+        elif header == 'PAUSE':
+            self._requireConnected()
+            self.field = self._fieldAt(self.clock())
+            self.mode = PAUSED
+        elif header == 'RAMP':
+            self._requireConnected()
+            self._startRamp(self.target)
+        elif header == 'ZERO':
+            self._requireConnected()
+            self._startRamp([0.0, 0.0, 0.0], ZEROING)
+        elif header == 'PERSISTENT':
+            argument = arguments.strip()
+            if not argument:
+                raise simulatorError(-104)
+            if argument not in ('0', '1'):
+                raise simulatorError(-103)
+            if not self.switchInstalled:
+                raise simulatorError(-307)
+            if self.mode == DISCONNECTED:
+                raise simulatorError(-301)
+            if self.switchDoneAt is not None:
+                raise simulatorError(-302)
+            enable = argument == '1'
+            if enable and self.mode in (RAMPING, ZEROING, QUENCH):
+                raise simulatorError(-305)
+            if enable != self.persistent:
+                self.switchTarget = enable
+                self.switchDoneAt = self.clock() + self.switchTime
+                self.mode = COOLING_SWITCH if enable else HEATING_SWITCH
+        elif header == 'SIM:QUENCH':
+            self.field = self._fieldAt(self.clock())
+            self.mode = QUENCH
+        elif header == 'SIM:STALL':
+            #Stops answering for a while, like a hung program
+            self.sleep(self._numbers(arguments, 1, 1)[0])
+        else:
+            raise simulatorError(-101)
+
+    def _tableRow(self, arguments: str, table: list) -> int:
+        if not arguments.strip():
+            raise simulatorError(-104)
+        try:
+            row = int(arguments.strip())
+        except ValueError:
+            raise simulatorError(-151)
+        if not 1 <= row <= len(table):
+            raise simulatorError(-105)
+        return row - 1
+
+    def _query(self, header: str, arguments: str) -> str:
+        if header in instrumentQueries:
+            self._throttle()
+        if header == '*IDN':
+            return 'AMERICAN MAGNETICS INC.,MULTI-AXIS SIMULATOR,0,1.0'
+        if header == 'SYSTEM:ERROR':
+            if not self.errorQueue:
+                return '0,"No error"'
+            code = self.errorQueue.pop()
+            return f'{code},"{errorMessages[code]}"'
+        if header == 'SYSTEM:ERROR:COUNT':
+            return str(len(self.errorQueue))
+        if header == 'STATE':
+            return str(self.mode)
+        if header == 'UNITS':
+            return str(self.units)
+        if header == 'PERSISTENT':
+            return str(int(self.persistent))
+        if header == 'FIELD':
+            return self._formatVector(cartesianToSpherical(*self._inUnits(self.field)))
+        if header == 'FIELD:CARTESIAN':
+            return self._formatVector(self._inUnits(self.field))
+        if header == 'TARGET':
+            return self._formatVector(cartesianToSpherical(*self._inUnits(self.target)))
+        if header == 'TARGET:CARTESIAN':
+            return self._formatVector(self._inUnits(self.target))
+        if header == 'TARGET:TIME':
+            return _formatNumber(self.timeToTarget())
+        if header in ('ALIGN1', 'ALIGN2'):
+            return self._formatVector(cartesianToSpherical(*self._inUnits(self.alignment[int(header[-1])])))
+        if header in ('ALIGN1:CARTESIAN', 'ALIGN2:CARTESIAN'):
+            return self._formatVector(self._inUnits(self.alignment[int(header[5])]))
+        if header == 'PLANE':
+            a, b = self.alignment[1], self.alignment[2]
+            normal = [a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0]]
+            norm = math.sqrt(sum(n*n for n in normal)) or 1.0
+            return self._formatVector([n/norm for n in normal])
+        if header == 'SIM:VIOLATIONS':
+            return str(self.violations)
+        raise simulatorError(-201)
+
+    def _throttle(self):
+        now = self.clock()
+        if self.queryInterval > 0 and self.lastInstrumentQuery is not None:
+            remaining = self.queryInterval - (now - self.lastInstrumentQuery)
+            if remaining > 0:
+                self.violations += 1
+                self.sleep(remaining)
+                now = self.clock()
+        self.lastInstrumentQuery = now
+
+    def _inUnits(self, vector: list[float]) -> list[float]:
+        return [self._fromTesla(b) for b in vector]
+
+    def _formatVector(self, vector: list[float]) -> str:
+        return ','.join(_formatNumber(v) for v in vector)
+
+    def handleLine(self, line: str) -> str | None:
+        """Processes one line of input. Returns the response line for queries and None for commands.
+        Errors are pushed onto the queue. Failed queries answer with an empty line so replies stay in step.
+        """
+        line = line.strip()
+        if not line:
+            return None
+        header, _, arguments = line.partition(' ')
+        isQuery = header.endswith('?')
+        header = ':'.join(_normalizeKeyword(token) for token in header.rstrip('?').upper().split(':'))
+        self._update()
+        try:
+            if isQuery:
+                return self._query(header, arguments)
+            self._command(header, arguments)
+        except simulatorError as error:
+            self.errorQueue.append(error.code)
+            if isQuery:
+                return ''
+        return None
+
+
+def simulatorCommand(**options) -> list[str]:
+    """Returns an argument list that launches the simulator, suitable for vectorMagnet(multiProgramPath=...).
+    Keyword names match the command line options, e.g. simulatorCommand(rampRate=0.5, queryInterval=1.0).
+    """
+    command = [sys.executable, os.path.abspath(__file__)]
+    for name, value in options.items():
+        flag = '--' + ''.join('-' + c.lower() if c.isupper() else c for c in name)
+        if isinstance(value, bool):
+            if value:
+                command.append(flag)
+        elif isinstance(value, (list, tuple)):
+            command += [flag] + [str(v) for v in value]
+        else:
+            command += [flag, str(value)]
+    return command
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Simulated AMI Multi-Axis-Operation program speaking the pipe protocol.')
+    parser.add_argument('-p', action='store_true', help='Pipe mode. Accepted for parity with Multi-Axis-Operation.')
+    parser.add_argument('--ramp-rate', type=float, default=0.1, help='Ramp rate in tesla per second.')
+    parser.add_argument('--query-interval', type=float, default=0.0,
+                        help='Minimum seconds between instrument queries. Use 1 to enforce the Model 430 limit.')
+    parser.add_argument('--connect-delay', type=float, default=0.0, help='Seconds between SYST:CONN and a connected state.')
+    parser.add_argument('--coil-limits', type=float, nargs=3, default=(1.0, 1.0, 9.0), help='x, y, z coil limits in tesla.')
+    parser.add_argument('--magnitude-limit', type=float, default=9.0, help='Field magnitude limit in tesla.')
+    parser.add_argument('--no-switch', action='store_true', help='Simulate a system without persistent switches.')
+    parser.add_argument('--switch-time', type=float, default=0.0, help='Seconds spent heating or cooling the switches.')
+    parser.add_argument('--startup-delay', type=float, default=0.0,
+                        help='Seconds before the program starts reading commands, like Multi-Axis loading on launch.')
+    args = parser.parse_args(argv)
+
+    simulator = multiAxisSimulator(rampRate=args.ramp_rate, queryInterval=args.query_interval,
+                                   connectDelay=args.connect_delay, coilLimits=args.coil_limits,
+                                   magnitudeLimit=args.magnitude_limit, switchInstalled=not args.no_switch,
+                                   switchTime=args.switch_time)
+    time.sleep(args.startup_delay)
+    for rawLine in sys.stdin.buffer:
+        response = simulator.handleLine(rawLine.decode('ascii', errors='replace'))
+        if response is not None:
+            sys.stdout.buffer.write(response.encode('ascii') + b'\n')
+            sys.stdout.buffer.flush()
+        if not simulator.running:
+            break
+
+
+if __name__ == '__main__':
+    main()
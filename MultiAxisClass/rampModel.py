@@ -0,0 +1,89 @@
+#Offline ramp duration estimates, so sweeps can be scheduled and waited on without TARG:TIME? queries.
+#Each axis ramps at its own field rate and Multi-Axis drives the axes together so they arrive at once,
+#making a transition as long as its slowest axis, or as long as the vector rate allows if one is set.
+#Calibration fits a scale and a fixed overhead to observed ramps.
+import numpy as np
+
+class rampModel:
+    """Predicts ramp durations in seconds from ramp rates in field units per second.
+    duration = overhead + scale*max(|dBx|/xRate, |dBy|/yRate, |dBz|/zRate, |dB|/vectorRate)
+    An axis rate of None (or axisRates None) leaves that axis unlimited, as does a vectorRate of None.
+    scale and overhead start at 1 and 0 and are refined by calibrate() from observe()d ramps.
+    Example:
+        model = rampModel((0.01, 0.01, 0.02))
+        print(model.predictPath(points, start=magnet.getFieldCartesian()).sum(), "seconds")
+    """
+    def __init__(self, axisRates: tuple[float | None, float | None, float | None] | None = None,
+                 vectorRate: float | None = None, overhead: float = 0.0, scale: float = 1.0):
+        if axisRates is None and vectorRate is None:
+            raise Exception("rampModel needs axisRates or a vectorRate.")
+        self.axisRates = (None, None, None) if axisRates is None else tuple(axisRates)
+        for rate in self.axisRates + (vectorRate,):
+            if rate is not None and rate <= 0:
+                raise Exception("Ramp rates must be positive.")
+        self.vectorRate = vectorRate
+        self.overhead = overhead
+        self.scale = scale
+        self._observations = []
+
+    @classmethod
+    def fromCurrentRates(cls, currentRates: tuple[float, float, float], coilConstants: tuple[float, float, float],
+                         overhead: float = 0.0) -> 'rampModel':
+        """Model from supply ramp rates in A/s and coil constants in field units per A, as in the .sav settings."""
+        return cls(tuple(None if not rate or not constant else abs(rate*constant)
+                         for rate, constant in zip(currentRates, coilConstants)), overhead=overhead)
+
+    def _rawDuration(self, startFields, targetFields) -> np.ndarray:
+        change = np.asarray(targetFields, dtype=float) - np.asarray(startFields, dtype=float)
+        #Unlimited axes divide by infinity
+        rates = np.array([np.inf if rate is None else rate for rate in self.axisRates])
+        duration = (np.abs(change)/rates).max(axis=-1)
+        if self.vectorRate is not None:
+            duration = np.maximum(duration, np.linalg.norm(change, axis=-1)/self.vectorRate)
+        return duration
+
+    def predict(self, startFields, targetFields) -> np.ndarray | float:
+        """Ramp durations from Cartesian start fields to target fields, (N, 3) arrays or single points.
+        A transition with no change takes no time."""
+        raw = self._rawDuration(startFields, targetFields)
+        duration = np.where(raw > 0, self.overhead + self.scale*raw, 0.0)
+        return float(duration) if duration.ndim == 0 else duration
+
+    def predictPath(self, points, start=(0.0, 0.0, 0.0)) -> np.ndarray:
+        """Durations of each leg visiting the (N, 3) Cartesian points in order from start."""
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        starts = np.vstack((np.asarray(start, dtype=float).reshape(1, 3), points[:-1]))
+        return np.atleast_1d(self.predict(starts, points))
+
+    def observe(self, startField, targetField, duration: float):
+        """Records a measured ramp, e.g. from getTimeToTarget() right after setting a target, or from the time
+        between setting it and waitUntilHolding() returning."""
+        self._observations.append((tuple(startField), tuple(targetField), float(duration)))
+
+    def calibrate(self, minObservations: int = 2) -> tuple[float, float]:
+        """Fits scale and overhead to the observed ramps by least squares and returns them.
+        Keeps the previous values if there are too few usable observations."""
+        if len(self._observations) < minObservations:
+            return self.scale, self.overhead
+        starts, targets, durations = zip(*self._observations)
+        raw = self._rawDuration(starts, targets)
+        durations = np.array(durations)
+        usable = raw > 0
+        if usable.sum() < minObservations or np.ptp(raw[usable]) == 0:
+            #All the same length, only the scale can be fitted
+            if usable.any():
+                self.scale = float(durations[usable].sum()/raw[usable].sum())
+                self.overhead = 0.0
+            return self.scale, self.overhead
+        design = np.column_stack((raw[usable], np.ones(usable.sum())))
+        (scale, overhead), *_ = np.linalg.lstsq(design, durations[usable], rcond=None)
+        self.scale = float(scale)
+        self.overhead = max(0.0, float(overhead))
+        return self.scale, self.overhead
+
+    def residuals(self) -> np.ndarray:
+        """Observed minus predicted duration for each observation."""
+        if not self._observations:
+            return np.zeros(0)
+        starts, targets, durations = zip(*self._observations)
+        return np.array(durations) - self.predict(starts, targets)
@@ -0,0 +1,160 @@
+#Background monitor for quenches, persistent switch transitions and field excursions.
+#Reads STATE? and FIELD:CART? as one channel request per cycle, so user commands queued in between are never
+#held back by more than one watchdog request, and reacts with callbacks and/or an automatic pause or zero.
+import collections
+import logging
+import threading
+import time
+from typing import NamedTuple
+try:
+    from .vectorMagnet import parseVector, QUENCH_DETECTED, HEATING_SWITCHES, COOLING_SWITCHES
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from vectorMagnet import parseVector, QUENCH_DETECTED, HEATING_SWITCHES, COOLING_SWITCHES
+
+logger = logging.getLogger(__name__)
+
+#Event kinds passed to callbacks
+QUENCH = 'quench'
+SWITCH = 'switch'
+STATE = 'state'
+FIELD = 'field'
+
+class watchdogEvent(NamedTuple):
+    """One detected condition. detectedAt is time.time(). latencyBound is the time from the last sample that did
+    not show the condition to its detection, an upper bound on how late it was noticed."""
+    kind: str
+    state: int
+    previousState: int | None
+    field: tuple[float, float, float]
+    detectedAt: float
+    latencyBound: float
+
+class safetyWatchdog:
+    """Watches a vectorMagnet from a background thread.
+    Every interval seconds (default three query intervals: two for the watchdog, one left free for other traffic)
+    STATE? and FIELD:CART? are read. On entering QUENCH DETECTED (6) quenchAction is applied ('pause', 'zero' or
+    None). Multi-Axis rejects both with -303 until the quench is cleared, so the default is None and a quench is only
+    reported; entering HEATING (7) or COOLING (8) the persistent switches is reported as a switch event; any state
+    change is reported as a state event. If fieldLimit is set, a field magnitude above it applies fieldLimitAction.
+    Callbacks are called on the watchdog thread as callback(event) and should return quickly.
+    The latest maxEvents events are kept in events.
+    Example:
+        watchdog = safetyWatchdog(magnet)
+        watchdog.addCallback('quench', lambda event: print("Quench", event))
+        watchdog.start()
+    """
+    def __init__(self, magnet, interval: float | None = None, quenchAction: str | None = None,
+                 fieldLimit: float | None = None, fieldLimitAction: str | None = 'pause', maxEvents: int = 1000):
+        for action in (quenchAction, fieldLimitAction):
+            if action not in (None, 'pause', 'zero'):
+                raise Exception("Actions must be 'pause', 'zero' or None.")
+        self.magnet = magnet
+        self.interval = 3*magnet.queryLimiter.interval if interval is None else interval
+        self.quenchAction = quenchAction
+        self.fieldLimit = fieldLimit
+        self.fieldLimitAction = fieldLimitAction
+        self.callbacks = {QUENCH: [], SWITCH: [], STATE: [], FIELD: []}
+        self.events = collections.deque(maxlen=maxEvents)
+        self.eventCount = 0
+        self.lastState = None
+        self.lastField = None
+        self.sampleCount = 0
+        self.failureCount = 0
+        self.maxSampleGap = 0.0
+        self._lastSampleTime = None
+        self._overLimit = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    def addCallback(self, kind: str, callback):
+        """Registers callback(event) for 'quench', 'switch', 'state' or 'field' events."""
+        self.callbacks[kind].append(callback)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__watchLoop, name='safetyWatchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def latencyReport(self) -> dict:
+        """Sampling and detection statistics. maxSampleGap is the longest time between successful samples, the
+        worst case detection latency for a condition that starts right after a sample."""
+        latencies = [event.latencyBound for event in self.events]
+        return {
+            'samples': self.sampleCount,
+            'failures': self.failureCount,
+            'interval': self.interval,
+            'maxSampleGap': self.maxSampleGap,
+            'events': self.eventCount,
+            'maxDetectionLatency': max(latencies, default=0.0),
+            'meanDetectionLatency': sum(latencies)/len(latencies) if latencies else 0.0,
+        }
+
+    def __watchLoop(self):
+        while not self._stop.is_set():
+            cycleStart = time.monotonic()
+            try:
+                #The error queue is left to the caller that caused the error
+                stateString, fieldString = self.magnet.channel.submit([(b'STATE', True), (b'FIELD:CART', True)],
+                                                                      checkErrors=False).result()
+                self.check(int(stateString), parseVector(fieldString))
+            except Exception as error:
+                self.failureCount += 1
+                logger.warning("Watchdog sample failed: %s", error)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - cycleStart)))
+
+    def check(self, state: int, field: tuple[float, float, float]):
+        """Evaluates one sample. Called by the watchdog thread; usable directly with samples read elsewhere."""
+        now = time.monotonic()
+        previousSampleTime = self._lastSampleTime
+        latencyBound = 0.0 if previousSampleTime is None else now - previousSampleTime
+        if previousSampleTime is not None:
+            self.maxSampleGap = max(self.maxSampleGap, latencyBound)
+        self._lastSampleTime = now
+        self.sampleCount += 1
+
+        previousState = self.lastState
+        self.lastState = state
+        self.lastField = field
+        if state != previousState:
+            if state == QUENCH_DETECTED:
+                self.__raise(QUENCH, state, previousState, field, latencyBound, self.quenchAction)
+            elif state in (HEATING_SWITCHES, COOLING_SWITCHES):
+                self.__raise(SWITCH, state, previousState, field, latencyBound, None)
+            if previousState is not None:
+                self.__raise(STATE, state, previousState, field, latencyBound, None)
+        if self.fieldLimit is not None:
+            overLimit = sum(b*b for b in field) > self.fieldLimit**2
+            if overLimit and not self._overLimit:
+                self.__raise(FIELD, state, previousState, field, latencyBound, self.fieldLimitAction)
+            self._overLimit = overLimit
+
+    def __raise(self, kind: str, state: int, previousState: int | None, field: tuple[float, float, float],
+                latencyBound: float, action: str | None):
+        event = watchdogEvent(kind, state, previousState, field, time.time(), latencyBound)
+        self.events.append(event)
+        self.eventCount += 1
+        if kind != STATE:
+            logger.warning("Watchdog detected %s: state %s, field %s", kind, state, field)
+        if action is not None:
+            try:
+                if action == 'pause':
+                    self.magnet.enablePauseMode()
+                else:
+                    self.magnet.enableZeroMode()
+            except Exception as error:
+                logger.error("Watchdog %s action failed: %s", action, error)
+        for callback in self.callbacks[kind]:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Watchdog %s callback failed", kind)
@@ -0,0 +1,247 @@
+#Capture and replay of Multi-Axis pipe sessions.
+#recordingProcess wraps the subprocess and appends every chunk written to or read from the pipe to a session file.
+#replayProcess stands in for the subprocess and answers with the recorded responses, at the recorded pace or faster,
+#so analysis code and regressions can be run against real sessions without hardware.
+#File layout: 16-byte header (MAGIC, start time as time.time() double), then one record per chunk:
+#struct '<dBI' (seconds since the start, direction SENT or RECEIVED, length) followed by the bytes.
+import logging
+import struct
+import subprocess
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'VMPIPE01'
+HEADER = struct.Struct('<8sd')
+RECORD = struct.Struct('<dBI')
+
+#Record directions
+SENT = 0
+RECEIVED = 1
+
+class sessionEvent(NamedTuple):
+    """One chunk of pipe traffic. time is seconds since the session started."""
+    time: float
+    direction: int
+    data: bytes
+
+class sessionRecorder:
+    """Appends pipe traffic to filePath as it happens. Each record is flushed, so a crash loses at most one chunk.
+    Safe to call from the channel's writer and reader threads at once."""
+    def __init__(self, filePath: str):
+        self.filePath = filePath
+        self._file = open(filePath, 'wb')
+        self._startTime = time.monotonic()
+        self._lock = threading.Lock()
+        self._file.write(HEADER.pack(MAGIC, time.time()))
+        self._file.flush()
+
+    def record(self, direction: int, data: bytes):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD.pack(time.monotonic() - self._startTime, direction, len(data)) + data)
+            self._file.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def readSession(filePath: str) -> tuple[float, list[sessionEvent]]:
+    """Returns the session start time (time.time()) and its events in order.
+    A record cut short by a crash while recording is dropped."""
+    with open(filePath, 'rb') as sessionFile:
+        content = sessionFile.read()
+    if len(content) < HEADER.size:
+        raise ValueError(filePath + " is not a Multi-Axis session recording")
+    magic, startTime = HEADER.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError(filePath + " is not a Multi-Axis session recording")
+    events = []
+    offset = HEADER.size
+    while offset + RECORD.size <= len(content):
+        timestamp, direction, length = RECORD.unpack_from(content, offset)
+        offset += RECORD.size
+        if offset + length > len(content):
+            break
+        events.append(sessionEvent(timestamp, direction, content[offset:offset + length]))
+        offset += length
+    return startTime, events
+
+class _recordingWriter:
+    def __init__(self, stream, recorder: sessionRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def write(self, data: bytes) -> int:
+        written = self._stream.write(data)
+        self._recorder.record(SENT, data)
+        return written
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self._stream.close()
+
+class _recordingReader:
+    def __init__(self, stream, recorder: sessionRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def readline(self) -> bytes:
+        line = self._stream.readline()
+        if line:
+            self._recorder.record(RECEIVED, line)
+        else:
+            #The program has exited, nothing more will be recorded
+            self._recorder.close()
+        return line
+
+    def close(self):
+        self._stream.close()
+
+class recordingProcess:
+    """Wraps a subprocess.Popen of Multi-Axis, recording all stdin and stdout traffic to filePath.
+    Everything else (poll, wait, kill, returncode, pid) is passed through to the process.
+    The recording is closed by stopRecording(), at the end of the program's output, or by wait()."""
+    def __init__(self, process, filePath: str):
+        self._process = process
+        self.recorder = sessionRecorder(filePath)
+        self.stdin = _recordingWriter(process.stdin, self.recorder)
+        self.stdout = _recordingReader(process.stdout, self.recorder)
+
+    def stopRecording(self):
+        self.recorder.close()
+
+    def wait(self, timeout: float | None = None) -> int:
+        returnCode = self._process.wait(timeout)
+        self.recorder.close()
+        return returnCode
+
+    def __getattr__(self, name):
+        return getattr(self._process, name)
+
+class _replayWriter:
+    def __init__(self, replay: 'replayProcess'):
+        self._replay = replay
+
+    def write(self, data: bytes) -> int:
+        self._replay._sent(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._replay.kill()
+
+class _replayReader:
+    def __init__(self, replay: 'replayProcess'):
+        self._replay = replay
+
+    def readline(self) -> bytes:
+        return self._replay._nextLine()
+
+class replayProcess:
+    """Stands in for the Multi-Axis subprocess and serves a recorded session.
+    Each recorded response is released once the commands sent before it in the recording have been written, and
+    no sooner than the recorded delay after them divided by speed. speed=None serves responses without delay.
+    Commands that differ from the recording are logged and kept in mismatches; the recorded responses are served
+    regardless, in order. Once the recorded responses are used up the output closes, as if the program had exited;
+    later writes are still accepted, like the EXIT that ends a session.
+    Example:
+        magnet = vectorMagnet(replayPath='session.vmpipe', replaySpeed=None)
+        magnet.initialize_program()
+    """
+    def __init__(self, filePath: str, speed: float | None = 1.0):
+        if speed is not None and speed <= 0:
+            raise ValueError("Replay speed must be positive.")
+        self.speed = speed
+        self.startTime, events = readSession(filePath)
+        #Line by line, so pipelined writes and separate writes match alike
+        self._expected = []
+        self._responses = []
+        sentTime = 0.0
+        for event in events:
+            if event.direction == SENT:
+                for line in event.data.splitlines(keepends=True):
+                    self._expected.append(line)
+                sentTime = event.time
+            else:
+                #(commands that must be sent first, recorded delay after the last of them, line)
+                self._responses.append((len(self._expected), event.time - sentTime, event.data))
+        self.mismatches = []
+        self.returncode = None
+        self.pid = None
+        self.stdin = _replayWriter(self)
+        self.stdout = _replayReader(self)
+        self._sentCount = 0
+        self._lastSentAt = time.monotonic()
+        self._nextResponse = 0
+        self._finished = False
+        self._killed = False
+        self._condition = threading.Condition()
+
+    def _sent(self, data: bytes):
+        with self._condition:
+            if self._killed:
+                raise ValueError("write to a closed replay")
+            for line in data.splitlines(keepends=True):
+                if self._sentCount < len(self._expected):
+                    expected = self._expected[self._sentCount]
+                    if expected.rstrip() != line.rstrip():
+                        self.mismatches.append((self._sentCount, expected, line))
+                        logger.warning("Replay expected %r but got %r", expected, line)
+                else:
+                    self.mismatches.append((self._sentCount, None, line))
+                    logger.warning("Replay has no more recorded commands, got %r", line)
+                self._sentCount += 1
+            self._lastSentAt = time.monotonic()
+            self._condition.notify_all()
+
+    def _nextLine(self) -> bytes:
+        with self._condition:
+            while True:
+                if self._finished or self._nextResponse >= len(self._responses):
+                    self._finish()
+                    return b''
+                required, delay, line = self._responses[self._nextResponse]
+                if self._sentCount >= required:
+                    releaseAt = self._lastSentAt + (0.0 if self.speed is None else delay/self.speed)
+                    #Only wait on the pace while no later commands have moved things on
+                    if self._sentCount > required or time.monotonic() >= releaseAt:
+                        self._nextResponse += 1
+                        return line
+                    self._condition.wait(releaseAt - time.monotonic())
+                else:
+                    self._condition.wait()
+
+    def _finish(self):
+        with self._condition:
+            self._finished = True
+            if self.returncode is None:
+                self.returncode = 0
+            self._condition.notify_all()
+
+    def poll(self) -> int | None:
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._finished, timeout):
+                raise subprocess.TimeoutExpired('replay', timeout)
+        return self.returncode
+
+    def kill(self):
+        with self._condition:
+            self._killed = True
+        self._finish()
+
+    terminate = kill
@@ -0,0 +1,165 @@
+#Client-side mirror of the Multi-Axis vector and polar tables.
+#The pipe protocol has no commands to read or edit table rows: CONF:TARG:VEC:CART and CONF:TARG:POL append a row
+#every time they are sent, and the tables are only read or written whole through SAVE:SET and LOAD:SET.
+#The mirror is filled from a saved settings file, targets already in a table are driven by row number instead of
+#appending them again, and planned tables are uploaded in one LOAD:SET with only the missing rows added.
+#Uploads copy the file Multi-Axis saved and change nothing but the two table sections.
+import os
+import tempfile
+import time
+try:
+    from .multiAxisSettings import parseSettings, replaceTables
+    from .multiAxisErrors import MultiAxisTimeoutError
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from multiAxisSettings import parseSettings, replaceTables
+    from multiAxisErrors import MultiAxisTimeoutError
+
+class tableManager:
+    """Mirrors the tables of magnet, a vectorMagnet, and reuses their rows.
+    Vector rows are (Bx, By, Bz, dwell) and polar rows (magnitude, angle, dwell), in the present field units.
+    Rows match when every value agrees within tolerance. Targets sent to magnet directly rather than through this
+    manager also append rows; call refresh() afterwards to see them.
+    Example:
+        tables = tableManager(magnet)
+        for Bx, By, Bz in grid:
+            tables.setTargetVector(Bx, By, Bz)
+            magnet.waitUntilHolding()
+    """
+    def __init__(self, magnet, tolerance: float = 1e-9, workDirectory: str | None = None, saveTimeout: float = 10.0):
+        self.magnet = magnet
+        self.tolerance = tolerance
+        #Longest wait in seconds for Multi-Axis to finish writing a SAVE:SET file
+        self.saveTimeout = saveTimeout
+        #Settings files are written here for SAVE:SET and LOAD:SET. Multi-Axis must be able to reach it.
+        self.workDirectory = tempfile.mkdtemp(prefix='multiAxisTables') if workDirectory is None else workDirectory
+        self.vectorRows = None
+        self.polarRows = None
+        self._settings = None
+        self._savedText = None
+        #Table commands sent: rows driven by number, rows appended by a target, and whole table uploads
+        self.rowTargets = 0
+        self.appendedRows = 0
+        self.uploads = 0
+
+    def _saveSettings(self) -> str:
+        """Has Multi-Axis save its settings and returns the file's text once it has been completely written."""
+        path = os.path.join(self.workDirectory, 'tables.sav')
+        #A file left from an earlier save must not be mistaken for this one
+        if os.path.exists(path):
+            os.remove(path)
+        self.magnet.saveSettings(path)
+        deadline = time.monotonic() + self.saveTimeout
+        lastStatus = None
+        while True:
+            try:
+                status = os.stat(path)
+                status = (status.st_mtime_ns, status.st_size)
+            except FileNotFoundError:
+                status = None
+            #Written and no longer changing between two looks
+            if status is not None and status == lastStatus and status[1] > 0:
+                break
+            if time.monotonic() > deadline:
+                raise MultiAxisTimeoutError("Multi-Axis did not finish writing " + path)
+            lastStatus = status
+            time.sleep(0.05)
+        #newline='' keeps the line endings, so an upload can reproduce the other lines exactly
+        with open(path, encoding='latin-1', newline='') as settingsFile:
+            return settingsFile.read()
+
+    def refresh(self):
+        """Reads the tables back from the program with SAVE:SET. No instrument queries are made."""
+        self._savedText = self._saveSettings()
+        self._settings = parseSettings(self._savedText)
+        self.vectorRows = [tuple(row) for row in self._settings.vectorTable]
+        self.polarRows = [tuple(row) for row in self._settings.polarTable]
+
+    def _rowsFor(self, table: str) -> list:
+        if self.vectorRows is None:
+            self.refresh()
+        return self.vectorRows if table == 'vector' else self.polarRows
+
+    def findRow(self, table: str, row) -> int | None:
+        """Row number (from 1) of the first row in table ('vector' or 'polar') matching row, or None."""
+        row = tuple(float(value) for value in row)
+        for number, existing in enumerate(self._rowsFor(table), 1):
+            if len(existing) == len(row) and all(abs(a - b) <= self.tolerance for a, b in zip(existing, row)):
+                return number
+        return None
+
+    def missingRows(self, table: str, rows) -> list[tuple[float, ...]]:
+        """The rows of a planned table that are not in the mirror yet, without repeats, in order."""
+        missing = []
+        for row in rows:
+            row = tuple(float(value) for value in row)
+            if self.findRow(table, row) is None and row not in missing:
+                missing.append(row)
+        return missing
+
+    def upload(self, vectorRows=(), polarRows=(), replace: bool = False) -> bool:
+        """Makes every planned row available by row number with a single LOAD:SET.
+        Rows already in the tables keep their numbers and only missing rows are appended, unless replace is True,
+        in which case the tables are written to exactly the planned rows. Nothing is sent if nothing would change.
+        The uploaded file is the one Multi-Axis just saved with only the table sections changed. It is refused if
+        anything else would read back differently.
+        Multi-Axis only loads settings while disconnected. Returns True if a table was uploaded.
+        """
+        vectorRows = [tuple(float(value) for value in row) for row in vectorRows]
+        polarRows = [tuple(float(value) for value in row) for row in polarRows]
+        for rows, count in ((vectorRows, 4), (polarRows, 3)):
+            if any(len(row) != count for row in rows):
+                raise Exception("Vector rows need 4 values and polar rows 3, including the dwell time.")
+        #The rest of the settings must be loaded back unchanged
+        self.refresh()
+        if replace:
+            newVector, newPolar = vectorRows, polarRows
+        else:
+            newVector = self.vectorRows + self.missingRows('vector', vectorRows)
+            newPolar = self.polarRows + self.missingRows('polar', polarRows)
+        if newVector == self.vectorRows and newPolar == self.polarRows:
+            return False
+        text = replaceTables(self._savedText, newVector, newPolar)
+        uploaded = parseSettings(text)
+        untouched = lambda settings: {section: values for section, values in settings.raw.items()
+                                      if section.lower() not in ('vector table', 'polar table')}
+        if (uploaded._replace(vectorTable=(), polarTable=(), raw=None)
+                != self._settings._replace(vectorTable=(), polarTable=(), raw=None)
+                or untouched(uploaded) != untouched(self._settings)
+                or list(uploaded.vectorTable) != newVector or list(uploaded.polarTable) != newPolar):
+            raise Exception("Refusing to upload tables: the settings file would not load back unchanged.")
+        path = os.path.join(self.workDirectory, 'upload.sav')
+        with open(path, 'w', encoding='latin-1', newline='') as settingsFile:
+            settingsFile.write(text)
+        self.magnet.loadSettings(path)
+        self.vectorRows, self.polarRows = list(newVector), list(newPolar)
+        self.uploads += 1
+        return True
+
+    def setTargetVector(self, Bx: float, By: float, Bz: float, dwellTime: float = 0.0) -> int:
+        """Ramps to a Cartesian target, by row number if the vector table has it, otherwise by appending it.
+        Returns the row number."""
+        row = (float(Bx), float(By), float(Bz), float(dwellTime))
+        number = self.findRow('vector', row)
+        if number is not None:
+            self.magnet.setTargetToVectorTableRow(number)
+            self.rowTargets += 1
+            return number
+        self.magnet.setTargetFieldCartesian(Bx, By, Bz, dwellTime)
+        self.vectorRows.append(row)
+        self.appendedRows += 1
+        return len(self.vectorRows)
+
+    def setTargetPolar(self, magnitude: float, angle: float, dwellTime: float = 0.0) -> int:
+        """Ramps to a polar target, by row number if the polar table has it, otherwise by appending it.
+        Returns the row number."""
+        row = (float(magnitude), float(angle), float(dwellTime))
+        number = self.findRow('polar', row)
+        if number is not None:
+            self.magnet.setTargetToPolarTableRow(number)
+            self.rowTargets += 1
+            return number
+        self.magnet.setTargetToPolar(magnitude, angle, dwellTime)
+        self.polarRows.append(row)
+        self.appendedRows += 1
+        return len(self.polarRows)
@@ -0,0 +1,91 @@
+#Bounded record of every pipe transaction with timing, for finding where sweep time goes.
+#The command channel appends one record per write/read; summaries and dumps are computed on demand.
+import collections
+import json
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+class transactionRecord(NamedTuple):
+    """One command or query on the pipe. Times are in seconds.
+    latency is write to response (write only for commands), sleepTime is time spent in the rate limiter
+    beforehand, and errorCheck marks the SYST:ERR:COUN?/SYST:ERR? traffic added by error checking.
+    """
+    timestamp: float
+    command: str
+    isQuery: bool
+    bytesSent: int
+    response: str | None
+    latency: float
+    sleepTime: float
+    errorCheck: bool
+
+def percentile(sortedValues: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list, q in 0 to 100."""
+    if not sortedValues:
+        return float('nan')
+    rank = max(1, min(len(sortedValues), int(-(-q*len(sortedValues)//100))))
+    return sortedValues[rank-1]
+
+class transactionLog:
+    """Ring buffer of the last capacity transactions. Appending is cheap and safe from the channel worker.
+    Transactions slower than slowThreshold seconds are also logged as warnings, to catch pipe stalls.
+    """
+    def __init__(self, capacity: int = 10000, slowThreshold: float | None = 5.0):
+        self.records = collections.deque(maxlen=capacity)
+        self.slowThreshold = slowThreshold
+        self._lock = threading.Lock()
+
+    def record(self, command: bytes, isQuery: bool, bytesSent: int, response: str | None, latency: float,
+               sleepTime: float, errorCheck: bool):
+        entry = transactionRecord(time.time(), command.decode('ascii', errors='replace'), isQuery, bytesSent,
+                                  response, latency, sleepTime, errorCheck)
+        with self._lock:
+            self.records.append(entry)
+        if self.slowThreshold is not None and latency > self.slowThreshold:
+            logger.warning("Slow Multi-Axis transaction %s took %.3f s", entry.command, latency)
+
+    def snapshot(self) -> list[transactionRecord]:
+        with self._lock:
+            return list(self.records)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def latencyPercentiles(self, command: str | None = None, percentiles: tuple[float, ...] = (50, 90, 99)) -> dict:
+        """Returns {command: {'count', 'p50', 'p90', 'p99', ...}} over the buffer, or just the entry for one command."""
+        byCommand = collections.defaultdict(list)
+        for entry in self.snapshot():
+            byCommand[entry.command + ('?' if entry.isQuery else '')].append(entry.latency)
+        result = {}
+        for name, latencies in byCommand.items():
+            latencies.sort()
+            stats = {'count': len(latencies)}
+            for q in percentiles:
+                stats['p' + format(q, 'g')] = percentile(latencies, q)
+            result[name] = stats
+        if command is not None:
+            return result.get(command, {'count': 0})
+        return result
+
+    def summary(self) -> dict:
+        """Totals over the buffer: transactions, wall time in the pipe, rate limit sleeps and error check overhead."""
+        records = self.snapshot()
+        return {
+            'transactions': len(records),
+            'queries': sum(entry.isQuery for entry in records),
+            'latencyTotal': sum(entry.latency for entry in records),
+            'sleepTotal': sum(entry.sleepTime for entry in records),
+            'errorCheckTransactions': sum(entry.errorCheck for entry in records),
+            'errorCheckTotal': sum(entry.latency + entry.sleepTime for entry in records if entry.errorCheck),
+        }
+
+    def dump(self, filePath: str):
+        """Writes the buffer as JSON lines, oldest first."""
+        with open(filePath, 'w') as file:
+            for entry in self.snapshot():
+                file.write(json.dumps(entry._asdict()) + '\n')
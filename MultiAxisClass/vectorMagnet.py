@@ -1,108 +1,384 @@
 #Important: Cannot query faster than 1 Hz
 #Parser commands for configuring the magnet parameters are not supported. This must be done via the GUI and then saved
 #Only customizable lines are the two paths in __init__
+import contextlib
+import logging
 import subprocess
+import threading
 import time
 import sys
+from typing import NamedTuple
+
+try:
+    from .commandChannel import commandChannel, rateLimiter
+    from .fieldLimits import fieldLimits
+    from .transactionLog import transactionLog
+    from .multiAxisSettings import readSettings
+    from .sessionRecording import recordingProcess, replayProcess
+    from .multiAxisErrors import MultiAxisTimeoutError, ConnectionAttemptTimeoutError, errorFromString, errorFromCode, \
+        UnrecognizedCommandError, InvalidArgumentError, NonBooleanArgumentError, MissingParameterError, ValueRangeError, \
+        NonNumericalEntryError, MagnitudeLimitError, NegativeMagnitudeError, InclinationRangeError, XCoilLimitError, \
+        XCoilMissingError, YCoilLimitError, YCoilMissingError, ZCoilLimitError, ZCoilMissingError, UnrecognizedQueryError, \
+        NotConnectedError, SwitchTransitionError, QuenchError, UnitsConnectedError, CannotEnterPersistenceError, \
+        PersistentError, NoSwitchError, LoadConnectedError, ProgramExitedError, RampStoppedError
+except ImportError:
+    #Imported as a top level module, e.g. from Matlab with this folder on the python path
+    from commandChannel import commandChannel, rateLimiter
+    from fieldLimits import fieldLimits
+    from transactionLog import transactionLog
+    from multiAxisSettings import readSettings
+    from sessionRecording import recordingProcess, replayProcess
+    from multiAxisErrors import MultiAxisTimeoutError, ConnectionAttemptTimeoutError, errorFromString, errorFromCode, \
+        UnrecognizedCommandError, InvalidArgumentError, NonBooleanArgumentError, MissingParameterError, ValueRangeError, \
+        NonNumericalEntryError, MagnitudeLimitError, NegativeMagnitudeError, InclinationRangeError, XCoilLimitError, \
+        XCoilMissingError, YCoilLimitError, YCoilMissingError, ZCoilLimitError, ZCoilMissingError, UnrecognizedQueryError, \
+        NotConnectedError, SwitchTransitionError, QuenchError, UnitsConnectedError, CannotEnterPersistenceError, \
+        PersistentError, NoSwitchError, LoadConnectedError, ProgramExitedError, RampStoppedError
+
+logger = logging.getLogger(__name__)
+
+#Values returned by getState()
+DISCONNECTED = 0
+RAMPING = 1
+HOLDING = 2
+PAUSED = 3
+ZEROING = 4
+AT_ZERO = 5
+QUENCH_DETECTED = 6
+HEATING_SWITCHES = 7
+COOLING_SWITCHES = 8
+
+#Lab defaults, shared with asyncVectorMagnet
+DEFAULT_PROGRAM_PATH = R'C:\Program Files\American Magnetics, Inc\Multi-Axis Operation\Multi-Axis-Operation'
+DEFAULT_CONFIG_PATH = R'C:\Users\LTSPM3\Desktop\AMI Magnet Log\LTSPM3_1_28_25.sav'
+#The Model 430 answers at most one query per second
+DEFAULT_QUERY_INTERVAL = 1.001
+DEFAULT_READ_TIMEOUT = 10.0
+
+def formatNumericInput(value: int | float) -> bytes:
+    """Formats a number the way Multi-Axis expects it, without trailing zeros."""
+    return f'{value:.10f}'.rstrip('0').rstrip('.').encode('ascii')
+
+def parseVector(vectorString: str) -> tuple[float, float, float]:
+    """Parses a comma separated triple such as the FIELD:CART? response."""
+    vectorList = [float(e) for e in vectorString.split(',')]
+    return vectorList[0], vectorList[1], vectorList[2]
+
+def checkVectorNumber(vectorNumber: int):
+    """Raises unless vectorNumber names alignment vector 1 or 2."""
+    if not(vectorNumber == 1 or vectorNumber == 2):
+        raise Exception("Not a valid vector specification.")
+
+def checkTableRow(tableRow: int):
+    """Raises unless tableRow is a valid (1 based) table row."""
+    if (tableRow<1):
+        raise Exception("Table row must be greater than 0.")
+
+def checkTarget(errorCode: int):
+    """Raises the instrument's exception for an error code from one of the fieldLimits checks, if any."""
+    if errorCode:
+        raise errorFromCode(errorCode)
+
+def limitsInUnits(limits: fieldLimits | None, units: int | None) -> fieldLimits | None:
+    """limits converted to units. None units leave them as they are."""
+    if limits is None or units is None:
+        return limits
+    return limits.inUnits(units)
+
+#Queries refreshed by the background poller and the parser applied to each response
+polledQueries = {b'FIELD:CART': parseVector, b'STATE': int, b'TARG:TIME': float}
+
+class statusSnapshot(NamedTuple):
+    """Field, state, target and time to target read in one transaction by vectorMagnet.getStatusSnapshot().
+    Fields are Cartesian in the present units; timestamp is time.time() when the responses were read."""
+    field: tuple[float, float, float]
+    state: int
+    target: tuple[float, float, float]
+    timeToTarget: float
+    timestamp: float
+
+#Queries read by getStatusSnapshot() and the parser applied to each response
+snapshotQueries = ((b'FIELD:CART', parseVector), (b'STATE', int), (b'TARG:CART', parseVector),
+                   (b'TARG:TIME', float))
+
+#Configuration queries that only change when one of the commands in configInvalidation is sent.
+#Their answers are cached until then, with the parser applied to each response.
+#PERS? is not among them: the flag changes by itself once the switch heaters finish (states 7 and 8).
+configQueries = {b'*IDN': str.strip, b'UNITS': int,
+                 b'ALIGN1': parseVector, b'ALIGN1:CART': parseVector, b'ALIGN2': parseVector,
+                 b'ALIGN2:CART': parseVector, b'PLANE': parseVector}
+#Command header -> cached configuration it makes stale. Alignment vectors are reported in the present units.
+configInvalidation = {
+    b'CONF:UNITS': (b'UNITS', b'ALIGN1', b'ALIGN1:CART', b'ALIGN2', b'ALIGN2:CART'),
+    b'CONF:ALIGN1': (b'ALIGN1', b'ALIGN1:CART', b'PLANE'),
+    b'CONF:ALIGN2': (b'ALIGN2', b'ALIGN2:CART', b'PLANE'),
+    b'LOAD:SET': tuple(configQueries),
+}
+
+class sampleCache:
+    """Thread-safe store of the latest (timestamp, value) sample for each query."""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def put(self, key: bytes, value):
+        with self._lock:
+            self._samples[key] = (self.clock(), value)
+
+    def get(self, key: bytes, maxAge: float | None = None):
+        """Returns (timestamp, value), or None if there is no sample or it is older than maxAge seconds."""
+        with self._lock:
+            sample = self._samples.get(key)
+        if sample is None or (maxAge is not None and self.clock() - sample[0] > maxAge):
+            return None
+        return sample
+
+    def invalidate(self, *keys: bytes):
+        with self._lock:
+            for key in keys:
+                self._samples.pop(key, None)
+
 class vectorMagnet:
     """Controller object for AMI vector magnet Multi-Axis program. Written in python and intended for use via Matlab.
     Care should be taken as the Model 430's are fixed to one sample per second
     Potential exceptions are provided in class properties and should be handled.
+    Raised errors are instances of the matching multiAxisErrors class (e.g. QuenchError, CoilLimitError),
+    so they can be caught by type or branched on by error.code.
     """
-    def __init__(self):
+    #Errors provided for try catch logic. Shared by all instances; compare with str() or catch the type.
+    #This error shouldn't be raised but it is technically possible
+    noError=Exception('0,"No error"')
+    unrecognizedCommandError=UnrecognizedCommandError()
+    invalidArgumentError=InvalidArgumentError()
+    nonBooleanArgumentError=NonBooleanArgumentError()
+    missingParameterError=MissingParameterError()
+    valueRangeError=ValueRangeError()
+    nonNumericalEntryError=NonNumericalEntryError()
+    magnitudeLimitError=MagnitudeLimitError()
+    negativeMagnitudeError=NegativeMagnitudeError()
+    inclinationRangeError=InclinationRangeError()
+    xCoilLimitError=XCoilLimitError()
+    xCoilMissingError=XCoilMissingError()
+    yCoilLimitError=YCoilLimitError()
+    yCoilMissingError=YCoilMissingError()
+    zCoilLimitError=ZCoilLimitError()
+    zCoilMissingError=ZCoilMissingError()
+    unrecognizedQueryError=UnrecognizedQueryError()
+    notConnectedError=NotConnectedError()
+    connectionAttemptTimeout=ConnectionAttemptTimeoutError()
+    switchTransitionError=SwitchTransitionError()
+    quenchConditionError=QuenchError()
+    unitsConnectedError=UnitsConnectedError()
+    cannotEnterPersistenceError=CannotEnterPersistenceError()
+    persistentError=PersistentError()
+    noSwitchError=NoSwitchError()
+    loadConnectedError=LoadConnectedError()
+
+    def __init__(self, multiProgramPath: str | list[str] | None = None, multiAxisConfig: str | None = None,
+                 queryInterval: float = DEFAULT_QUERY_INTERVAL, readTimeout: float | None = DEFAULT_READ_TIMEOUT,
+                 recordPath: str | None = None,
+                 replayPath: str | None = None, replaySpeed: float | None = 1.0):
+        """multiProgramPath may be the executable path string or an argument list, e.g. one from
+        multiAxisSimulator.simulatorCommand() to run against the simulated program. None keeps the lab defaults.
+        queryInterval is the minimum spacing of instrument queries in seconds.
+        readTimeout is the longest wait for any response before MultiAxisTimeoutError is raised, None to wait forever.
+        recordPath, if set, records all pipe traffic of the session to that file (see sessionRecording).
+        replayPath, if set, serves a recorded session instead of starting Multi-Axis, replaySpeed times faster than
+        it was recorded (None for no delays). The query interval is shortened by the same factor.
+        """
         self.multiSubProcess = None
-        self.multiAxisConfig = R'C:\Users\LTSPM3\Desktop\AMI Magnet Log\LTSPM3_1_28_25.sav'
-        self.multiProgramPath = R'C:\Program Files\American Magnetics, Inc\Multi-Axis Operation\Multi-Axis-Operation'
-
-        #Errors provided for try catch logic
-        #This error shouldn't be raised but it is technically possible
-        self.noError=Exception('0,"No error"')
-        self.unrecognizedCommandError=Exception('-101,"Unrecognized command"')
-        self.invalidArgumentError=Exception('-102,"Invalid argument"')
-        self.nonBooleanArgumentError=Exception('-103,"Non-boolean argument"')
-        self.missingParameterError=Exception('-104,"Missing parameter"')
-        self.valueRangeError=Exception('-105,"Value out of range"')
-        self.nonNumericalEntryError=Exception('-151,"Non-numerical entry"')
-        self.magnitudeLimitError=Exception('-152,"Magnitude exceeds limit"')
-        self.negativeMagnitudeError=Exception('-153,"Negative magnitude"')
-        self.inclinationRangeError=Exception('-154,"Inclination out of range"')
-        self.xCoilLimitError=Exception('-155,"Field exceeds x-coil limit"')
-        self.xCoilMissingError=Exception('-156,"Field requires x-coil"')
-        self.yCoilLimitError=Exception('-157,"Field exceeds y-coil limit"')
-        self.yCoilMissingError=Exception('-158,"Field requires y-coil"')
-        self.zCoilLimitError=Exception('-159,"Field exceeds z-coil limit"')
-        self.zCoilMissingError=Exception('-160,"Field requires z-coil"')
-        self.unrecognizedQueryError=Exception('-201,"Unrecognized query"')
-        self.notConnectedError=Exception('-301,"Not connected"')
-        self.connectionAttemptTimeout=Exception('Connection attempt exceeded time limit. Program in unknown state')
-        self.switchTransitionError=Exception('-302,"Switch in transition"')
-        self.quenchConditionError=Exception('-303,"Quench condition"')
-        self.unitsConnectedError=Exception('-304,"No units change while connected"')
-        self.cannotEnterPersistenceError=Exception('-305,"Cannot enter persistence"')
-        self.persistentError=Exception('-306,"System is persistent"')
-        self.noSwitchError=Exception('-307,"No switch installed"')
-        self.loadConnectedError=Exception('-308,"Cannot LOAD while connected"')
+        self.recordPath = recordPath
+        #The last session recorded by this object, so restarting the program cannot overwrite it
+        self._recordedPath = None
+        self.replayPath = replayPath
+        self.replaySpeed = replaySpeed
+        if replayPath is not None:
+            queryInterval = 0.0 if replaySpeed is None else queryInterval/replaySpeed
+        self.readTimeout = readTimeout
+        self.queryLimiter = rateLimiter(queryInterval)
+        #Per thread, so one thread's deferredErrorChecks() block does not skip another thread's checks
+        self._errorCheckThread = threading.local()
+        #Owns the pipe once the program is running. All traffic goes through it so threads can share this object.
+        self.channel = None
+        #Timing of every pipe transaction, see enableTransactionLog()
+        self.transactionLog = None
+        #When True, queryMany() writes all queries at once after a single rate limit wait. Only enable this if the
+        #instrument tolerates back to back queries; otherwise they are spaced by queryInterval as usual.
+        self.pipelineQueries = False
+        self.sampleCache = sampleCache()
+        #Answers to configQueries, kept until a command in configInvalidation changes them
+        self.configCache = sampleCache()
+        self.pollInterval = None
+        self.maxStaleness = None
+        self._pollThread = None
+        self._pollStop = threading.Event()
+        #Client-side target checks, see setFieldLimits(). None sends every target to the instrument unchecked.
+        self.fieldLimits = None
+        #Field units as last set or read, used to convert fieldLimits. None until known.
+        self.fieldUnits = None
+        #multiAxisSettings parsed from the last .sav file loaded, None if none was or it could not be read here
+        self.settings = None
+        #The fieldLimits taken from settings, to tell them apart from limits set with setFieldLimits()
+        self._settingsLimits = None
+        self.multiAxisConfig = DEFAULT_CONFIG_PATH if multiAxisConfig is None else multiAxisConfig
+        self.multiProgramPath = DEFAULT_PROGRAM_PATH if multiProgramPath is None else multiProgramPath
 
     def initialize_program(self):
-        programPathCom=self.multiProgramPath+' -p'
-        print("Opening Multi-Axis")
-        print(programPathCom)
-        self.multiSubProcess=subprocess.Popen(programPathCom, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        if self.recordPath is not None and self.recordPath == self._recordedPath:
+            raise Exception("A session was already recorded to " + self.recordPath + ", set a new recordPath first.")
+        if isinstance(self.multiProgramPath, str):
+            programPathCom=self.multiProgramPath+' -p'
+        else:
+            programPathCom=list(self.multiProgramPath)+['-p']
+        if self.replayPath is not None:
+            logger.info("Replaying Multi-Axis session %s", self.replayPath)
+            self.multiSubProcess=replayProcess(self.replayPath, self.replaySpeed)
+        else:
+            logger.info("Opening Multi-Axis: %s", programPathCom)
+            self.multiSubProcess=subprocess.Popen(programPathCom, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        if self.recordPath is not None:
+            self.multiSubProcess=recordingProcess(self.multiSubProcess, self.recordPath)
+            self._recordedPath=self.recordPath
+        self.channel=commandChannel(self.multiSubProcess, self.queryLimiter, self.__onTransaction, self.transactionLog,
+                                    self.readTimeout)
+        #A freshly started program may be configured differently from the last one
+        self.invalidateConfigCache()
+
+    def waitUntilReady(self, timeout: float = 30.0) -> (str):
+        """Blocks until the freshly started program answers *IDN? and returns the identification string.
+        Replaces a fixed sleep after initialize_program(). Raises ProgramExitedError if the program exits first, or
+        MultiAxisTimeoutError if it has not answered within timeout seconds.
+        """
+        #The probe waits in the pipe until Multi-Axis starts reading, so one query is enough.
+        #The channel raises ProgramExitedError as soon as the program dies.
+        try:
+            identifier=self.channel.submit([(b'*IDN', True)], checkErrors=False, readTimeout=timeout).result()[0]
+        except MultiAxisTimeoutError:
+            raise MultiAxisTimeoutError("Multi-Axis did not answer within " + str(timeout) + " s of starting.") from None
+        logger.info("Multi-Axis ready: %s", identifier)
+        return identifier
+
+    def startup(self, settingsFile: str | bool = False, connect: bool = True, readyTimeout: float = 30.0,
+                connectTimeout: float = 15.0) -> (int | None):
+        """Starts Multi-Axis and returns as soon as it is usable: launches the program, waits until it answers,
+        optionally loads settings and connects. settingsFile is a .sav path, True for multiAxisConfig, or False to
+        keep the settings the program starts with. Returns the state after connecting, or None if connect is False.
+        """
+        self.initialize_program()
+        self.waitUntilReady(readyTimeout)
+        if settingsFile:
+            self.loadSettings(self.multiAxisConfig if settingsFile is True else settingsFile)
+        if connect:
+            return self.connect(connectTimeout)
+        return None
+
+    def enableTransactionLog(self, capacity: int = 10000, slowThreshold: float | None = 5.0) -> transactionLog:
+        """Starts recording every command and query (bytes, response, latency, rate limit sleep, error check
+        overhead) into a ring buffer of the last capacity transactions and returns it.
+        Use latencyPercentiles(), summary() or dump(filePath) on the returned log to inspect it.
+        """
+        self.transactionLog=transactionLog(capacity, slowThreshold)
+        if self.channel is not None:
+            self.channel.transactionLog=self.transactionLog
+        return self.transactionLog
+
+    def disableTransactionLog(self):
+        self.transactionLog=None
+        if self.channel is not None:
+            self.channel.transactionLog=None
 
     def exit_program(self):
         """Disconnects from all system devices and gracefully exits Multi-Axis program"""
-        self.__sendCommand(b'EXIT')
+        self.stopPolling()
+        if self.channel is None:
+            #The program was never started
+            return
+        #No error check afterwards, the program is gone and would never answer
+        try:
+            self._sendUnsafeCommand(b'EXIT')
+        except ProgramExitedError:
+            logger.warning("Multi-Axis had already exited")
+        self.channel.close()
+        if isinstance(self.multiSubProcess, recordingProcess):
+            self.multiSubProcess.stopRecording()
+
+    def __onTransaction(self, commandString: bytes, isQuery: bool, response: str | None):
+        """Runs on the channel worker after every transaction, in pipe order."""
+        if not isQuery:
+            #Any command may change the state, so cached state samples no longer apply
+            self.sampleCache.invalidate(b'STATE', b'TARG:TIME')
+            staleConfig = configInvalidation.get(commandString.split(b' ', 1)[0])
+            if staleConfig:
+                self.configCache.invalidate(*staleConfig)
+        elif commandString in configQueries and response:
+            try:
+                self.configCache.put(commandString, configQueries[commandString](response))
+            except ValueError:
+                pass
+        elif commandString in polledQueries and response:
+            try:
+                self.sampleCache.put(commandString, polledQueries[commandString](response))
+            except ValueError:
+                pass
     
     def __sendCommand(self, commandString:str):
         """Takes in ascii encoded string."""
         #Command inputs should not have \n as that is added here
-        self.multiSubProcess.stdin.write(commandString+b'\n')
-        self.multiSubProcess.stdin.flush()
-
-        errorCount= self.getErrorCount()
-        if errorCount>0:
-            time.sleep(1.001)
-            errorString=self.getError()
-            print("Error detected following command.")
-            raise Exception(errorString)
+        self.channel.command(commandString, checkErrors=not self.deferErrorChecks)
 
     def _sendUnsafeCommand(self, commandString:str):
         """Sends command without error checking. Intended for tests."""
-        self.multiSubProcess.stdin.write(commandString+b'\n')
-        self.multiSubProcess.stdin.flush()
+        self.channel.command(commandString, checkErrors=False)
         
+    def __configValue(self, query: bytes):
+        """Returns the cached answer to one of configQueries, querying the instrument only if it is not cached."""
+        cached=self.configCache.get(query)
+        if cached is not None:
+            return cached[1]
+        response=self.__sendQuery(query)
+        cached=self.configCache.get(query)
+        if cached is not None:
+            return cached[1]
+        return configQueries[query](response)
+
+    def invalidateConfigCache(self):
+        """Forgets all cached configuration. Needed only if settings were changed outside this object, e.g. on the
+        Multi-Axis front panel. Also forgets the field units, which are read again when limits next need them."""
+        self.configCache.invalidate(*configQueries)
+        self.fieldUnits=None
+
     def __formatNumericInput(self, input: int | float):
-        output=f'{input:.10f}'.rstrip('0').rstrip('.').encode('ascii')
-        return output
+        return formatNumericInput(input)
 
-    def __sendQuery(self, commandString:str) -> (str):
+    def __sendQuery(self, commandString:str, checkErrors:bool = True) -> (str):
         """Takes in ascii encoded string."""
         #Automatically includes ?\n at the end of the command
-        self.multiSubProcess.stdin.write(commandString+b'?\n')
-        self.multiSubProcess.stdin.flush()
-        readBits=self.multiSubProcess.stdout.readline()
-        decodedString=readBits.decode('ascii')
-        decodedString=decodedString.rstrip()
+        return self.channel.query(commandString, checkErrors=checkErrors and not self.deferErrorChecks)
 
-        time.sleep(1.001)
-        errorCount = self.getErrorCount()
-
-        if errorCount>0:
-            time.sleep(1.001)
-            errorString=self.getError()
-            print("Error detected following command.")
-            raise Exception(errorString)
-
-        return decodedString
+    def queryMany(self, *queries: bytes, pipelined: bool | None = None) -> list[str]:
+        """Sends several queries as one transaction, with a single error check at the end, and returns the
+        responses in order. No other thread's traffic is interleaved. pipelined defaults to pipelineQueries.
+        Example:
+            fieldString, stateString = magnet.queryMany(b'FIELD:CART', b'STATE')
+        """
+        if pipelined is None:
+            pipelined=self.pipelineQueries
+        return self.channel.submit([(query, True) for query in queries], checkErrors=not self.deferErrorChecks,
+                                   pipelined=pipelined).result()
+
+    def getStatusSnapshot(self, pipelined: bool | None = None) -> statusSnapshot:
+        """Reads field, state, target and time to target in one transaction and returns a statusSnapshot.
+        Replaces four separate getters, each with its own error check."""
+        responses=self.queryMany(*[query for query, _ in snapshotQueries], pipelined=pipelined)
+        timestamp=time.time()
+        values=[parse(response) for (_, parse), response in zip(snapshotQueries, responses)]
+        return statusSnapshot(*values, timestamp)
 
     def _sendUnsafeQuery(self, commandString:str) -> (str):
         """Sends query without without error checking. Intended for tests."""
         #Automatically includes ?\n at the end of the command
-        self.multiSubProcess.stdin.write(commandString+b'?\n')
-        self.multiSubProcess.stdin.flush()
-        readBits=self.multiSubProcess.stdout.readline()
-        decodedString=readBits.decode('ascii')
-        return decodedString
+        return self.channel.query(commandString, checkErrors=False)
 
     def getError(self) -> str:
         """Returns last-in-first-out error string. See manual for decoding.
@@ -110,22 +386,100 @@ class vectorMagnet:
             If there are no errors the return will be:
             {0,"No error"}
         """
-        self.multiSubProcess.stdin.write(b'SYST:ERR?\n')
-        self.multiSubProcess.stdin.flush()
-        readBits=self.multiSubProcess.stdout.readline()
-        errorString=readBits.decode('ascii')
-        errorString=errorString.rstrip()
-        return errorString
+        return self.channel.query(b'SYST:ERR', checkErrors=False)
     
     def getErrorCount(self) -> int:
         """Returns error count as int"""
-        self.multiSubProcess.stdin.write(b'SYST:ERR:COUN?\n')
-        self.multiSubProcess.stdin.flush()
-        readBits=self.multiSubProcess.stdout.readline()
-        decodedString=readBits.decode('ascii')
+        decodedString=self.channel.query(b'SYST:ERR:COUN', checkErrors=False)
         errorCount=int(decodedString.strip())
         return errorCount
     
+    def checkErrors(self):
+        """Raises the most recent queued error, if any. The whole queue is drained.
+        Older errors are reported but only the most recent is raised."""
+        self.channel.submit([], checkErrors=True).result()
+
+    @property
+    def deferErrorChecks(self) -> bool:
+        """True while the calling thread is inside deferredErrorChecks(); its commands and queries then skip the
+        error queue check. Other threads are unaffected."""
+        return getattr(self._errorCheckThread, 'deferred', False)
+
+    @deferErrorChecks.setter
+    def deferErrorChecks(self, deferred: bool):
+        self._errorCheckThread.deferred = deferred
+
+    @contextlib.contextmanager
+    def deferredErrorChecks(self):
+        """Within the block, commands and queries from this thread skip the per-call error count round-trip.
+        The queue is checked once when the block exits normally.
+        Example:
+            with magnet.deferredErrorChecks():
+                magnet.setTargetFieldCartesian(0, 0, 0.1)
+                field = magnet.getFieldCartesian()
+        """
+        previous=self.deferErrorChecks
+        self.deferErrorChecks=True
+        try:
+            yield self
+        finally:
+            self.deferErrorChecks=previous
+        if not previous:
+            self.checkErrors()
+
+    def startPolling(self, pollInterval: float | None = None, maxStaleness: float | None = None):
+        """Starts a background thread that refreshes FIELD:CART?, STATE? and TARG:TIME? every pollInterval seconds.
+        While polling, getFieldCartesian(), getState() and getTimeToTarget() return the cached sample
+        without touching the pipe if it is at most maxStaleness seconds old.
+        pollInterval defaults to, and is never shorter than, one query interval per polled value.
+        """
+        if self._pollThread is not None:
+            return
+        cycleTime=len(polledQueries)*self.queryLimiter.interval
+        self.pollInterval=cycleTime if pollInterval is None else max(pollInterval, cycleTime)
+        self.maxStaleness=self.pollInterval+cycleTime if maxStaleness is None else maxStaleness
+        self._pollStop.clear()
+        self._pollThread=threading.Thread(target=self.__pollLoop, name='vectorMagnetPoller', daemon=True)
+        self._pollThread.start()
+
+    def stopPolling(self):
+        """Stops the background poller. Getters go back to querying the instrument every call."""
+        if self._pollThread is None:
+            return
+        self._pollStop.set()
+        self._pollThread.join()
+        self._pollThread=None
+
+    def getCachedSample(self, query: bytes):
+        """Returns the latest (monotonic timestamp, value) for b'FIELD:CART', b'STATE' or b'TARG:TIME', or None."""
+        return self.sampleCache.get(query)
+
+    def __cachedValue(self, query: bytes):
+        if self._pollThread is None:
+            return None
+        sample=self.sampleCache.get(query, self.maxStaleness)
+        return None if sample is None else sample[1]
+
+    def __pollLoop(self):
+        while not self._pollStop.is_set():
+            cycleStart=time.monotonic()
+            for query in polledQueries:
+                if self._pollStop.is_set():
+                    return
+                try:
+                    if self.multiSubProcess.poll() is not None:
+                        raise ProgramExitedError("Multi-Axis exited")
+                    #The poller leaves the error queue to the caller that caused the error
+                    self.__sendQuery(query, checkErrors=False)
+                except (ValueError, OSError, MultiAxisTimeoutError) as error:
+                    logger.warning("Polling %s failed: %s", query.decode('ascii'), error)
+                except ProgramExitedError as error:
+                    #Getters go back to querying, so they raise ProgramExitedError instead of serving stale samples
+                    logger.warning("Polling stopped: %s", error)
+                    self._pollThread=None
+                    return
+            self._pollStop.wait(max(0.0, self.pollInterval-(time.monotonic()-cycleStart)))
+
     def clearErrorQueue(self):
         self.__sendCommand(b'*CLS')    
 
@@ -141,42 +495,82 @@ class vectorMagnet:
         7: HEATING PERSISTENT SWITCHES
         8: COOLING PERSISTENT SWITCHES
         """
+        cachedVal=self.__cachedValue(b'STATE')
+        if cachedVal is not None:
+            return cachedVal
         returnVal=self.__sendQuery(b'STATE')
         stateVal=int(returnVal.strip())
         return stateVal
 
-    def connect(self) -> (int):
-        """Connects to Model 430's. Returns current state.
-        System settings should be loaded prior."""
+    def connect(self, timeout: float = 15.0, maxBackoff: float = 1.0) -> (int):
+        """Connects to Model 430's. Returns current state as soon as it is no longer DISCONNECTED.
+        System settings should be loaded prior. STATE? is polled at the query rate limit, backing off by up to
+        maxBackoff extra seconds while the connection takes long. Raises ConnectionAttemptTimeoutError after
+        timeout seconds.
+        """
         self.__sendCommand(b'SYST:CONN')
-        print("Waiting for CONNECT", end='')
-        stateVal = 0
-        startTime = time.time()
-        timeOutCheckTime = 5
-        timeoutErrorTime = 15
-        # checking for a connected state
-        time.sleep(1.01)
-        while not stateVal:
+        logger.info("Waiting for CONNECT")
+        startTime = time.monotonic()
+        backoff = 0.0
+        # checking for a connected state, queries are spaced by the rate limiter
+        while True:
             stateVal = self.getState()
-            if not stateVal:
-                print('.', end='')
-                currentTime=time.time()
-                elapsedTime=currentTime-startTime
-                time.sleep(1.01)
-                if(elapsedTime>timeOutCheckTime):
-                    errorCount=self.getErrorCount()
-                    time.sleep(1.01)
-                    if(errorCount>0):
-                        print("Unable to Connect. There is an active error")
-                        currentError=self.getError()
-                        raise Exception(currentError)
-                    elif(elapsedTime>timeoutErrorTime):
-                        print("Connection was not established and program timed out. Program state unknown.")
-                        raise self.connectionAttemptTimeout()
-            else:
-                print("STATE = " + str(stateVal))
+            if stateVal:
+                logger.info("STATE = %d", stateVal)
+                return stateVal
+            if self.getErrorCount() > 0:
+                logger.error("Unable to Connect. There is an active error")
+                raise errorFromString(self.getError())
+            if time.monotonic()-startTime > timeout:
+                logger.error("Connection was not established and program timed out. Program state unknown.")
+                raise ConnectionAttemptTimeoutError()
+            time.sleep(backoff)
+            backoff = min(maxBackoff, 2*backoff if backoff else 0.05)
+
+    def waitUntilHolding(self, timeout: float | None = None, arrivalMargin: float = 2.0, maxSleep: float = 10.0,
+                         expectedDuration: float | None = None) -> (int):
+        """Blocks until the ramp has finished, i.e. HOLDING (2) or AT ZERO FIELD (5), and returns that state.
+        Sleeps through most of the ramp using getTimeToTarget(), waking at least every maxSleep seconds to check
+        for a quench. Within arrivalMargin seconds of the estimate, checks only STATE?, once per query interval, or
+        once per poll interval while startPolling() is running.
+        expectedDuration, e.g. from rampModel.predict(), replaces getTimeToTarget() until that many seconds have passed.
+        Raises QuenchError on QUENCH DETECTED (6), NotConnectedError on DISCONNECTED (0), RampStoppedError on PAUSED (3),
+        switch heating or cooling (7, 8) or any other state that is not ramping, on any queued error, or if timeout
+        seconds pass first.
+        """
+        startTime=time.monotonic()
+        arriving=False
+        while True:
+            stateVal=self.getState()
+            if stateVal in (HOLDING, AT_ZERO):
                 return stateVal
-                
+            if stateVal==QUENCH_DETECTED:
+                raise QuenchError()
+            if stateVal==DISCONNECTED:
+                raise NotConnectedError()
+            remaining=None if timeout is None else timeout-(time.monotonic()-startTime)
+            if remaining is not None and remaining<=0:
+                raise MultiAxisTimeoutError("Target not reached before timeout. STATE = " + str(stateVal))
+            if stateVal not in (RAMPING, ZEROING):
+                raise RampStoppedError("Ramp stopped before reaching the target. STATE = " + str(stateVal))
+            if arriving:
+                #A polled STATE is read from the cache without waiting, so wait here for the next sample
+                waitTime=self.pollInterval if self._pollThread is not None else self.queryLimiter.interval
+                time.sleep(waitTime if remaining is None else min(waitTime, remaining))
+                continue
+            elapsed=time.monotonic()-startTime
+            if expectedDuration is not None and elapsed<expectedDuration:
+                timeLeft=expectedDuration-elapsed
+            else:
+                timeLeft=self.getTimeToTarget()
+            #Close to arrival, STATE? alone says when the ramp is done
+            arriving=timeLeft<=arrivalMargin
+            sleepTime=min(timeLeft-arrivalMargin, maxSleep)
+            if remaining is not None:
+                sleepTime=min(sleepTime, remaining)
+            if sleepTime>0:
+                time.sleep(sleepTime)
+
     def disconnect(self):
         """Disconnects from all system devices"""
         self.__sendCommand(b'SYST:DISC')
@@ -186,7 +580,7 @@ class vectorMagnet:
         Format is: r, phi, theta
         """
         fieldString=self.__sendQuery(b'FIELD')
-        print(fieldString)
+        logger.debug("FIELD? %s", fieldString)
 
         # Handle potential invalid inputs
         fieldList = []
@@ -197,8 +591,11 @@ class vectorMagnet:
     
     def getFieldCartesian(self) -> tuple[float, float, float]:
         """Returns Bx, By, & Bz in Cartesian coordinates with currently active units"""
+        cachedVal=self.__cachedValue(b'FIELD:CART')
+        if cachedVal is not None:
+            return cachedVal
         fieldString=self.__sendQuery(b'FIELD:CART')
-        print(fieldString)
+        logger.debug("FIELD:CART? %s", fieldString)
         
         # Handle potential invalid inputs
         fieldList = []
@@ -207,12 +604,31 @@ class vectorMagnet:
         return fieldList[0], fieldList[1], fieldList[2]
     
     def getIDN(self) -> (str):
-        identifier=self.__sendQuery(b'*IDN')
-        return identifier
+        """Returns the identification string. Cached like the other configuration queries."""
+        return self.__configValue(b'*IDN')
     
     def loadSettings(self, filePath: str):
-        """Loads all magnet parameters, sample alignment settings, and table contents"""
+        """Loads all magnet parameters, sample alignment settings, and table contents.
+        If the file is readable from here it is also parsed into settings and its limits become fieldLimits,
+        so targets are checked locally without any queries. Limits set with setFieldLimits() are then replaced,
+        with a warning. Otherwise limits set with setFieldLimits() are kept and those from a previously loaded file
+        are forgotten, as are the units, which are read again when next needed."""
         self.__sendCommand(b'LOAD:SET '+filePath.encode('ascii'))
+        try:
+            self.settings=readSettings(filePath)
+        except (OSError, ValueError) as error:
+            logger.info("Settings file %s not parsed, only limits set with setFieldLimits() are kept: %s", filePath, error)
+            self.settings=None
+            if self.fieldLimits is self._settingsLimits:
+                self.fieldLimits=None
+            self._settingsLimits=None
+            self.fieldUnits=None
+            self.configCache.invalidate(b'UNITS')
+            return
+        if self.fieldLimits is not None and self.fieldLimits is not self._settingsLimits:
+            logger.warning("Field limits set with setFieldLimits() are replaced by those in %s", filePath)
+        self.fieldLimits=self._settingsLimits=self.settings.fieldLimits()
+        self.fieldUnits=self.settings.units
     
     def saveSettings(self, filePath: str):
         """Creates .Sav settings file at filepath. Includes all magnet settings, sample alignment settings, and table contents.
@@ -226,33 +642,51 @@ class vectorMagnet:
         1: Tesla
         """
         self.__sendCommand(b'CONF:UNITS '+str(units).encode('ascii'))
+        #With deferred error checks the command may yet be rejected, so the units are read again when next needed
+        self.fieldUnits=None if self.deferErrorChecks else units
     
     def getUnits(self) -> (int):
         """Returns current field units.
         0: Kilogauss
         1: Tesla
         """
-        returnVal=self.__sendQuery(b'UNITS')
-        return int(returnVal.strip())
+        self.fieldUnits=self.__configValue(b'UNITS')
+        return self.fieldUnits
+
+    def setFieldLimits(self, xCoilLimit: float | None, yCoilLimit: float | None, zCoilLimit: float | None,
+                       magnitudeLimit: float, units: int = 1):
+        """Enables client-side checking of targets against the coil limits and maximum magnitude.
+        Limits are in the given units (0: kilogauss, 1: tesla); a coil limit of 0 or None means no coil on that axis.
+        Out of range targets then raise the same exceptions as the instrument without sending anything.
+        """
+        self.fieldLimits=fieldLimits(xCoilLimit, yCoilLimit, zCoilLimit, magnitudeLimit, units)
+
+    def activeFieldLimits(self) -> fieldLimits | None:
+        """Returns fieldLimits converted to the present field units, or None if no limits are set.
+        If the units have not been set or read yet they are read with getUnits(), once; later calls use the cache."""
+        if self.fieldLimits is not None and self.fieldUnits is None:
+            self.getUnits()
+        return limitsInUnits(self.fieldLimits, self.fieldUnits)
 
     def setSampleAlignmentVector(self, vectorNumber:int, magnitude:float, azimuth:float, inclination:float):
         """Sets sample alignment vector 1 in spherical coordinates. Magnitude is in the present field units.
         vectorNumber should be 1 or 2.
         """
-        if not(vectorNumber == 1 or vectorNumber == 2):
-            raise Exception("Not a valid vector specification.")
+        checkVectorNumber(vectorNumber)
         self.__sendCommand(b'CONF:ALIGN'+str(vectorNumber).encode('ascii')+b' '+self.__formatNumericInput(magnitude)+b','+self.__formatNumericInput(azimuth)+b','+self.__formatNumericInput(inclination))
 
     def configureTargetToAlignmentVector(self, vectorNumber:int):
         """Sets the target field to the specified alignment vector and begins ramping. Vector number should be 1 or 2."""
-        if not(vectorNumber == 1 or vectorNumber == 2):
-            raise Exception("Not a valid vector specification.")
+        checkVectorNumber(vectorNumber)
         self.__sendCommand(b'CONF:TARG:ALIGN'+str(vectorNumber).encode('ascii'))
     
     def setTargetFieldSpherical(self, magnitude:float, azimuth:float, inclination:float, dwellTime:float|None = None):
         """Sets target field in spherical coordinates, adds it to the vector table, and begins ramping. Magnitude is in the present field units.
         Dwell time is in seconds. If none, a zero entry is generated.
         """
+        limits=self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkSpherical(magnitude, azimuth, inclination))
         if dwellTime is None:
             self.__sendCommand(b'CONF:TARG:VEC '+self.__formatNumericInput(magnitude)+b','+self.__formatNumericInput(azimuth)+b','+self.__formatNumericInput(inclination))
         else:
@@ -262,6 +696,9 @@ class vectorMagnet:
         """Sets target field in Cartesian coordinates, adds it to the vector table, and begins ramping. Magnitude is in the present field units.
         Dwell time is in seconds. If none, a zero entry is generated.
         """
+        limits=self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkCartesian(Bx, By, Bz))
         if dwellTime is None:
             self.__sendCommand(b'CONF:TARG:VEC:CART '+self.__formatNumericInput(Bx)+b','+self.__formatNumericInput(By)+b','+self.__formatNumericInput(Bz))
         else:
@@ -270,15 +707,19 @@ class vectorMagnet:
     def setTargetToVectorTableRow(self, tableRow: int):
         """Sets the target field to the specified table row and begins ramping. Table row should be an int.
         """
-        if (tableRow<1):
-            raise Exception("Table row must be greater than 0.")
+        checkTableRow(tableRow)
 
         self.__sendCommand(b'CONF:TARG:VEC:TAB '+str(tableRow).encode('ascii'))
     
     def setTargetToPolar(self, magnitude:float, angle:float, dwellTime:float|None = None):
         """Sets target field in polar coordinates, adds it to the polar table, and begins ramping. Magnitude is in the present field units.
         Dwell time is in seconds. If none, a zero entry is generated.
+        The target is checked against fieldLimits in the sample plane of the (cached) alignment vectors.
         """
+        limits=self.activeFieldLimits()
+        if limits is not None:
+            checkTarget(limits.checkPolar(magnitude, angle, self.getSampleAlignmentVectorCartesian(1),
+                                          self.getSampleAlignmentVectorCartesian(2)))
         if dwellTime is None:
             self.__sendCommand(b'CONF:TARG:POL '+self.__formatNumericInput(magnitude)+b','+self.__formatNumericInput(angle))
         else:
@@ -287,8 +728,7 @@ class vectorMagnet:
     def setTargetToPolarTableRow(self, tableRow: int):
         """Sets the target field to the specified table row and begins ramping. Table row should be an int.
         """
-        if (tableRow<1):
-            raise Exception("Table row must be greater than 0.")
+        checkTableRow(tableRow)
 
         self.__sendCommand(b'CONF:TARG:POL:TABL '+str(tableRow).encode('ascii'))
     
@@ -309,9 +749,8 @@ class vectorMagnet:
         self.__sendCommand(b'PERS '+str(int(persistentState)).encode('ascii'))
 
     def getPersistentMode(self) -> (bool):
-        """Returns whether persistent mode is enabled."""
-        returnVal=self.__sendQuery(b'PERS')
-        return bool(int(returnVal.strip()))
+        """Returns whether persistent mode is enabled. Always queried, the flag follows the switch heaters."""
+        return bool(int(self.__sendQuery(b'PERS')))
     
     def getSampleAlignmentVectorSpherical(self, vectorNumber:int) -> tuple[float, float, float]:
         """
@@ -326,14 +765,8 @@ class vectorMagnet:
         Raises:
         Exception: If the vector number is not 1 or 2.
         """
-        if not(vectorNumber == 1 or vectorNumber == 2):
-            raise Exception("Not a valid vector specification.")
-        vectorString = self.__sendQuery(b'ALIGN' + str(vectorNumber).encode('ascii'))
-        # Handle potential invalid inputs
-        vectorList = []
-        for e in vectorString.split(','):
-            vectorList.append(float(e))
-        return vectorList[0], vectorList[1], vectorList[2]
+        checkVectorNumber(vectorNumber)
+        return self.__configValue(b'ALIGN' + str(vectorNumber).encode('ascii'))
     
     def getSampleAlignmentVectorCartesian(self, vectorNumber:int) -> tuple[float, float, float]:
         """
@@ -348,14 +781,8 @@ class vectorMagnet:
         Raises:
         Exception: If the vector number is not 1 or 2.
         """
-        if not(vectorNumber == 1 or vectorNumber == 2):
-            raise Exception("Not a valid vector specification.")
-        vectorString = self.__sendQuery(b'ALIGN' + str(vectorNumber).encode('ascii')+b':CART')
-        # Handle potential invalid inputs
-        vectorList = []
-        for e in vectorString.split(','):
-            vectorList.append(float(e))
-        return vectorList[0], vectorList[1], vectorList[2]
+        checkVectorNumber(vectorNumber)
+        return self.__configValue(b'ALIGN' + str(vectorNumber).encode('ascii')+b':CART')
 
     def getSampleAlignmentPlane(self) -> tuple[float, float, float]:
         """
@@ -363,9 +790,7 @@ class vectorMagnet:
         
         Returns (a, b, c) for the plane equation ax + by + cz = 0.
         """
-        planeString = self.__sendQuery(b'PLANE')
-        planeList = [float(e) if e.isnumeric() else e for e in planeString.split(',')]
-        return planeList[0], planeList[1], planeList[2]
+        return self.__configValue(b'PLANE')
     
     def getTargetFieldSpherical(self) -> tuple[float, float, float]:
         """
@@ -402,5 +827,8 @@ class vectorMagnet:
         Returns:
         float: The estimated time to reach the target field in seconds.
         """
+        cachedVal=self.__cachedValue(b'TARG:TIME')
+        if cachedVal is not None:
+            return cachedVal
         timeString = self.__sendQuery(b'TARG:TIME')
         return float(timeString.strip())
\ No newline at end of file
@@ -0,0 +1,214 @@
+#Measures the driver's own cost against the simulated Multi-Axis program: wall time, pipe round-trips and rate limit
+#sleeps per public vectorMagnet call, for connect(), and per point of field sweeps, where the physical ramp time is
+#known exactly and the rest is overhead. Results are JSON and can be compared against a stored baseline.
+#Run from the repository root as: python -m benchmarks.driverBenchmark --help
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+try:
+    from MultiAxisClass.vectorMagnet import vectorMagnet, PAUSED
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+    from MultiAxisClass.fieldSweep import fieldSweep, pathLength
+except ImportError:
+    #Run as a script, put the repository root on the python path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from MultiAxisClass.vectorMagnet import vectorMagnet, PAUSED
+    from MultiAxisClass.multiAxisSimulator import simulatorCommand
+    from MultiAxisClass.fieldSweep import fieldSweep, pathLength
+
+#Per call metrics compared against a baseline
+METRICS = ('wallTime', 'roundTrips', 'sleepTime')
+
+#Differences below these are noise, whatever the relative change
+ABSOLUTE_FLOORS = {'wallTime': 0.005, 'roundTrips': 0.5, 'sleepTime': 0.005}
+
+#Public methods that are not benchmarked call by call, and why
+EXCLUDED_METHODS = {
+    'initialize_program': 'measured as part of startup',
+    'exit_program': 'ends the session',
+    'startup': 'measured as startup',
+    'waitUntilReady': 'measured as part of startup',
+    'connect': 'measured as connect',
+    'waitUntilHolding': 'measured in the sweeps',
+    'enablePersistentMode': 'heats or cools the switches',
+    'loadSettings': 'needs a settings file and a disconnected magnet',
+    'saveSettings': 'writes a file',
+    'configureUnits': 'needs a disconnected magnet',
+    'startPolling': 'runs a thread, not a single call',
+    'stopPolling': 'runs a thread, not a single call',
+    'deferredErrorChecks': 'context manager',
+    'enableTransactionLog': 'used by the benchmark itself',
+    'disableTransactionLog': 'used by the benchmark itself',
+}
+
+def _methodCases(magnet) -> dict:
+    """Calls that exercise each benchmarked public method once with valid arguments, by method name."""
+    return {
+        'getState': magnet.getState,
+        'getFieldCartesian': magnet.getFieldCartesian,
+        'getFieldSpherical': magnet.getFieldSpherical,
+        'getTargetFieldCartesian': magnet.getTargetFieldCartesian,
+        'getTargetFieldSpherical': magnet.getTargetFieldSpherical,
+        'getTimeToTarget': magnet.getTimeToTarget,
+        'getStatusSnapshot': magnet.getStatusSnapshot,
+        'queryMany': lambda: magnet.queryMany(b'STATE', b'FIELD:CART'),
+        'getIDN': magnet.getIDN,
+        'getUnits': magnet.getUnits,
+        'getPersistentMode': magnet.getPersistentMode,
+        'getErrorCount': magnet.getErrorCount,
+        'getError': magnet.getError,
+        'checkErrors': magnet.checkErrors,
+        'clearErrorQueue': magnet.clearErrorQueue,
+        'getCachedSample': lambda: magnet.getCachedSample(b'STATE'),
+        'invalidateConfigCache': magnet.invalidateConfigCache,
+        'getSampleAlignmentVectorSpherical': lambda: magnet.getSampleAlignmentVectorSpherical(1),
+        'getSampleAlignmentVectorCartesian': lambda: magnet.getSampleAlignmentVectorCartesian(1),
+        'getSampleAlignmentPlane': magnet.getSampleAlignmentPlane,
+        'setSampleAlignmentVector': lambda: magnet.setSampleAlignmentVector(1, 1, 0, 90),
+        'setFieldLimits': lambda: magnet.setFieldLimits(1.0, 1.0, 9.0, 9.0),
+        'activeFieldLimits': magnet.activeFieldLimits,
+        'setTargetFieldCartesian': lambda: magnet.setTargetFieldCartesian(0.01, 0, 0),
+        'setTargetFieldSpherical': lambda: magnet.setTargetFieldSpherical(0.01, 0, 90),
+        'setTargetToPolar': lambda: magnet.setTargetToPolar(0.01, 0),
+        'setTargetToVectorTableRow': lambda: magnet.setTargetToVectorTableRow(1),
+        'setTargetToPolarTableRow': lambda: magnet.setTargetToPolarTableRow(1),
+        'configureTargetToAlignmentVector': lambda: magnet.configureTargetToAlignmentVector(1),
+        'enablePauseMode': magnet.enablePauseMode,
+        'enableRampMode': magnet.enableRampMode,
+        'enableZeroMode': magnet.enableZeroMode,
+        'disconnect': lambda: (magnet.disconnect(), magnet.connect()),
+    }
+
+def uncoveredMethods() -> list[str]:
+    """Public vectorMagnet methods neither benchmarked nor in EXCLUDED_METHODS, so new methods are not missed."""
+    public = {name for name, function in inspect.getmembers(vectorMagnet, inspect.isfunction)
+              if function.__qualname__.startswith('vectorMagnet.') and not name.startswith('_')}
+    covered = set(_methodCases(vectorMagnet.__new__(vectorMagnet))) | set(EXCLUDED_METHODS)
+    return sorted(public - covered)
+
+class benchmarkSession:
+    """A vectorMagnet on a fresh simulator with its transaction log on, for measuring calls."""
+    def __init__(self, queryInterval: float = 0.01, rampRate: float = 50.0):
+        self.queryInterval = queryInterval
+        self.rampRate = rampRate
+        self.magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=rampRate, queryInterval=queryInterval*0.8),
+                                   queryInterval=queryInterval)
+        self.log = self.magnet.enableTransactionLog(capacity=1000000, slowThreshold=None)
+
+    def measure(self, function, repeat: int = 1) -> dict:
+        """Calls function repeat times and returns the per call wall time, round-trips and sleep time."""
+        self.log.clear()
+        startTime = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        wallTime = time.perf_counter() - startTime
+        records = self.log.snapshot()
+        return {'calls': repeat, 'wallTime': wallTime/repeat, 'roundTrips': len(records)/repeat,
+                'sleepTime': sum(record.sleepTime for record in records)/repeat}
+
+    def close(self):
+        self.magnet.exit_program()
+        self.magnet.multiSubProcess.wait(timeout=5)
+
+def runBenchmarks(queryInterval: float = 0.01, repeat: int = 20, sweepSizes: tuple[int, ...] = (100, 1000),
+                  rampRate: float = 50.0, seed: int = 0) -> dict:
+    """Runs the whole suite and returns the results as a JSON-ready dict."""
+    results = {}
+    session = benchmarkSession(queryInterval, rampRate)
+    try:
+        magnet = session.magnet
+        results['startup'] = session.measure(lambda: magnet.startup(connect=False))
+        results['connect'] = session.measure(magnet.connect)
+        #Rows for the table targets
+        magnet.setTargetFieldCartesian(0.01, 0, 0)
+        magnet.setTargetToPolar(0.01, 0)
+        magnet.waitUntilHolding()
+        for name, function in _methodCases(magnet).items():
+            results['method.' + name] = session.measure(function, repeat)
+            #Leave the magnet holding for the next case; waitUntilHolding() raises while paused
+            if magnet.getState() == PAUSED:
+                magnet.enableRampMode()
+            magnet.waitUntilHolding()
+
+        rng = np.random.default_rng(seed)
+        for size in sweepSizes:
+            points = rng.uniform(-0.5, 0.5, (size, 3))
+            start = magnet.getFieldCartesian()
+            sweep = fieldSweep(magnet, points, startField=start)
+            result = session.measure(lambda: list(sweep))
+            #Per point figures; the simulator ramps in a straight line at rampRate, so the ramp time is exact
+            rampTime = pathLength(points, np.arange(size), np.asarray(start))/rampRate/size
+            result = {'calls': size, 'wallTime': result['wallTime']/size, 'roundTrips': result['roundTrips']/size,
+                      'sleepTime': result['sleepTime']/size, 'rampTime': rampTime,
+                      'overhead': result['wallTime']/size - rampTime}
+            results['sweep.' + str(size)] = result
+    finally:
+        session.close()
+    return {
+        'meta': {'timestamp': time.time(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'queryInterval': queryInterval, 'rampRate': rampRate, 'repeat': repeat,
+                 'uncoveredMethods': uncoveredMethods()},
+        'results': results,
+    }
+
+def compareResults(current: dict, baseline: dict, tolerance: float = 0.25) -> list[tuple[str, str, float, float]]:
+    """Returns (benchmark, metric, baseline value, current value) for every metric that grew by more than tolerance
+    (relative) and more than its ABSOLUTE_FLOORS entry. Benchmarks missing from either side are ignored."""
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        for metric in METRICS:
+            old, new = reference[metric], result[metric]
+            if new > old*(1 + tolerance) and new - old > ABSOLUTE_FLOORS[metric]:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def formatResults(results: dict) -> str:
+    lines = [f"{'benchmark':40s} {'wall ms':>10s} {'round-trips':>12s} {'sleep ms':>10s}"]
+    for name, result in results['results'].items():
+        line = (f"{name:40s} {1000*result['wallTime']:10.2f} {result['roundTrips']:12.2f} "
+                f"{1000*result['sleepTime']:10.2f}")
+        if 'overhead' in result:
+            line += f"  ramp {1000*result['rampTime']:.2f} ms, overhead {1000*result['overhead']:.2f} ms per point"
+        lines.append(line)
+    if results['meta']['uncoveredMethods']:
+        lines.append("Not benchmarked: " + ', '.join(results['meta']['uncoveredMethods']))
+    return '\n'.join(lines)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark vectorMagnet overhead against the simulated Multi-Axis.')
+    parser.add_argument('--query-interval', type=float, default=0.01,
+                        help='Minimum seconds between instrument queries. 1.001 reproduces the Model 430 limit.')
+    parser.add_argument('--repeat', type=int, default=20, help='Calls per method.')
+    parser.add_argument('--sweep-sizes', type=int, nargs='*', default=[100, 1000], help='Points per sweep.')
+    parser.add_argument('--ramp-rate', type=float, default=50.0, help='Simulated ramp rate in tesla per second.')
+    parser.add_argument('--output', default=None, help='Write the results as JSON to this file.')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Relative growth flagged as a regression.')
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.query_interval, args.repeat, tuple(args.sweep_sizes), args.ramp_rate)
+    print(formatResults(results))
+    if args.output is not None:
+        with open(args.output, 'w') as outputFile:
+            json.dump(results, outputFile, indent=1)
+    if args.baseline is not None:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        if baseline['meta']['queryInterval'] != args.query_interval:
+            print("Warning: the baseline used a different query interval", file=sys.stderr)
+        regressions = compareResults(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"Regression: {name} {metric} {old:.4g} -> {new:.4g}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
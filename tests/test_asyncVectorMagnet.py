@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from MultiAxisClass.asyncVectorMagnet import asyncVectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.multiAxisErrors import RampStoppedError, MultiAxisTimeoutError, XCoilMissingError
+#Runs against the simulated Multi-Axis program, no hardware needed
+
+def runWithMagnet(body, queryInterval=0.05, readTimeout=10.0):
+    async def main():
+        magnet = asyncVectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=queryInterval*0.8),
+                                   queryInterval=queryInterval, readTimeout=readTimeout)
+        await magnet.initialize_program()
+        try:
+            assert await magnet.connect() == 3
+            return await body(magnet)
+        finally:
+            await magnet.exit_program()
+    return asyncio.run(main())
+
+def test_fieldReadback():
+    async def body(magnet):
+        await magnet.setTargetFieldCartesian(0.1, 0.2, 0.3)
+        await asyncio.sleep(0.1)
+        assert await magnet.getFieldCartesian() == pytest.approx((0.1, 0.2, 0.3))
+        assert await magnet.getState() == 2
+        with pytest.raises(Exception, match='-152,"Magnitude exceeds limit"'):
+            await magnet.setTargetFieldCartesian(0, 0, 10)
+        assert await magnet.getErrorCount() == 0
+    runWithMagnet(body)
+
+def test_deferredErrorChecksPerTask():
+    async def body(magnet):
+        deferring = asyncio.Event()
+        async def otherTask():
+            await deferring.wait()
+            with pytest.raises(Exception, match='-152,"Magnitude exceeds limit"'):
+                await magnet.setTargetFieldCartesian(0, 0, 10)
+        #Started outside the block, so it does not inherit the deferral
+        task = asyncio.create_task(otherTask())
+        async with magnet.deferredErrorChecks():
+            deferring.set()
+            await task
+            assert magnet.deferErrorChecks
+            assert await magnet.getErrorCount() == 0
+        assert not magnet.deferErrorChecks
+    runWithMagnet(body)
+
+def test_waitUntilHolding():
+    async def body(magnet):
+        #Connecting leaves the magnet paused
+        with pytest.raises(RampStoppedError):
+            await magnet.waitUntilHolding(timeout=5)
+        await magnet.setTargetFieldCartesian(0, 0.3, 0.4)
+        assert await magnet.waitUntilHolding(timeout=5, arrivalMargin=0.02) == 2
+        assert await magnet.getFieldCartesian() == pytest.approx((0, 0.3, 0.4))
+    runWithMagnet(body)
+
+def test_rateLimitDoesNotBlockLoop():
+    async def body(magnet):
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        tickTask = asyncio.create_task(ticker())
+        states = await asyncio.gather(*(magnet.getState() for _ in range(5)))
+        tickTask.cancel()
+        assert states == [3]*5
+        #Five queries at 0.2 s spacing take about a second, during which the loop kept running
+        assert ticks > 30
+    runWithMagnet(body, queryInterval=0.2)
+
+def test_readTimeout():
+    async def body(magnet):
+        await magnet._sendUnsafeCommand(b'SIM:STALL 0.3')
+        with pytest.raises(MultiAxisTimeoutError):
+            await magnet.getState()
+        #The late answer is discarded, so the next query gets its own response
+        assert (await magnet.getIDN()).startswith('AMERICAN MAGNETICS')
+        assert await magnet.getState() == 3
+    runWithMagnet(body, readTimeout=0.2)
+
+def test_cancelledQuery():
+    async def body(magnet):
+        await magnet._sendUnsafeCommand(b'SIM:STALL 0.2')
+        task = asyncio.create_task(magnet.getState())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        #The cancelled query's answer arrives later and is discarded
+        assert (await magnet.getIDN()).startswith('AMERICAN MAGNETICS')
+        assert await magnet.getState() == 3
+    runWithMagnet(body)
+
+def test_fieldLimits():
+    async def body(magnet):
+        magnet.setFieldLimits(1.0, 1.0, 1.0, 1.5)
+        #Checked locally in the present units, 12 kG is beyond the 1 T coil limit
+        await magnet.disconnect()
+        await magnet.configureUnits(0)
+        with pytest.raises(Exception, match='-155'):
+            await magnet.setTargetFieldCartesian(12, 0, 0)
+        await magnet.configureUnits(1)
+        magnet.setFieldLimits(0, 1.0, 1.0, 1.5)
+        with pytest.raises(XCoilMissingError):
+            await magnet.setTargetToPolar(0.5, 0)
+        with pytest.raises(Exception, match='Table row'):
+            await magnet.setTargetToVectorTableRow(0)
+        assert await magnet.getErrorCount() == 0
+    runWithMagnet(body)
@@ -0,0 +1,79 @@
+import csv
+import io
+import pytest
+from FrontEndPython.cli import parseBatch, runBatch, main
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+
+@pytest.fixture()
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=20, queryInterval=0.008), queryInterval=0.01)
+    magnet.startup()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_parseBatch():
+    lines = ['# field map', 'mode,a,b,c,dwell', '0, 0, 0.1', 'spherical 0.1 90 90 0.5', 'polar,0.1,45', '0.2 0 0 1']
+    assert parseBatch(lines) == [('cartesian', (0, 0, 0.1), 0.0), ('spherical', (0.1, 90, 90), 0.5),
+                                 ('polar', (0.1, 45), 0.0), ('cartesian', (0.2, 0, 0), 1.0)]
+    with pytest.raises(Exception, match="Line 2: polar needs 2 values"):
+        parseBatch(['0 0 0', 'polar 1 2 3 4'])
+    with pytest.raises(Exception, match="Line 2: values must be numbers"):
+        parseBatch(['0 0 0', '0 x 0'])
+
+def test_runAgainstSimulator(tmp_path, capsys):
+    batchFile = tmp_path / 'map.csv'
+    batchFile.write_text('Bx,By,Bz,dwell\n0,0,0.1\n0,0.1,0,0.05\nspherical,0.1,0,90\n')
+    outputFile = tmp_path / 'readback.csv'
+    assert main(['--simulator', '--simulator-ramp-rate', '20', '--query-interval', '0.01', 'run', str(batchFile),
+                 '--output', str(outputFile), '--transactions', '--zero']) == 0
+    rows = list(csv.DictReader(io.StringIO(outputFile.read_text())))
+    assert [row['index'] for row in rows] == ['0', '1', '2']
+    assert float(rows[1]['By']) == pytest.approx(0.1)
+    assert float(rows[2]['Bx']) == pytest.approx(0.1)
+    assert all(row['state'] == '2' for row in rows)
+    assert float(rows[1]['elapsed']) - float(rows[0]['elapsed']) >= 0.05
+    summary = capsys.readouterr().err
+    assert '3 points in' in summary and 'points/min' in summary and 'pipe transactions' in summary
+
+def test_recordAndReplay(tmp_path, capsys):
+    session = tmp_path / 'status.vmpipe'
+    assert main(['--simulator', '--query-interval', '0.01', '--record', str(session), 'status']) == 0
+    recorded = capsys.readouterr().out
+    assert main(['--query-interval', '0.01', '--replay', str(session), '--replay-speed', '0', 'status']) == 0
+    replayed = capsys.readouterr().out
+    #Everything but the local timestamp comes from the recording
+    assert recorded.split('timestamp')[0] == replayed.split('timestamp')[0]
+    assert 'state: 3' in replayed
+
+def test_runBatchValidatesFirst(magnet):
+    output = io.StringIO()
+    magnet.setFieldLimits(1.0, 1.0, 1.0, 1.5)
+    #The polar point lies along alignment vector 2, +y, and is checked against the y coil
+    points = parseBatch(['0 0 0.1', 'polar 1.2 90'])
+    log = magnet.enableTransactionLog()
+    with pytest.raises(Exception, match="rows \\[1\\]"):
+        runBatch(magnet, points, output, log=None)
+    assert not [entry for entry in log.snapshot() if entry.command.startswith('CONF:TARG')]
+    with pytest.raises(Exception, match="Point 1: negative magnitude"):
+        runBatch(magnet, parseBatch(['0 0 0.1', 'spherical -0.1 0 90']), output, log=None)
+    assert output.getvalue() == ''
+    summary = runBatch(magnet, parseBatch(['0 0 0.1', 'polar 0.2 90', 'spherical 0.1 0 90']), output, log=None)
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert summary['points'] == 3 and [row['coordinates'] for row in rows] == ['cartesian', 'polar', 'spherical']
+    assert [float(rows[1][axis]) for axis in ('Bx', 'By', 'Bz')] == pytest.approx([0, 0.2, 0])
+    assert [float(rows[2][axis]) for axis in ('Bx', 'By', 'Bz')] == pytest.approx([0.1, 0, 0])
+
+def test_exitOnStartupFailure(tmp_path, monkeypatch):
+    exits = []
+    exitProgram = vectorMagnet.exit_program
+    monkeypatch.setattr(vectorMagnet, 'exit_program', lambda self: (exits.append(self), exitProgram(self)))
+    settings = tmp_path / 'broken.sav'
+    settings.write_text('[System]\nUnits = 1\n')
+    with pytest.raises(Exception, match='-102'):
+        main(['--simulator', '--query-interval', '0.01', '--settings', str(settings), 'status'])
+    assert len(exits) == 1
+    assert exits[0].multiSubProcess.wait(timeout=5) == 0
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.coordinates import sphericalToCartesian, cartesianToSpherical, alignmentFrame
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_sphericalRoundTrip():
+    rng = np.random.default_rng(2)
+    points = np.column_stack((rng.uniform(0, 2, 50), rng.uniform(-179, 179, 50), rng.uniform(1, 179, 50)))
+    assert cartesianToSpherical(sphericalToCartesian(points)) == pytest.approx(points)
+    assert sphericalToCartesian([1, 90, 90]) == pytest.approx([0, 1, 0])
+    assert cartesianToSpherical([0, 0, 0]) == pytest.approx([0, 0, 0])
+    assert cartesianToSpherical([0, 0, -2]) == pytest.approx([2, 0, 180])
+    assert sphericalToCartesian(points.reshape(5, 10, 3)).shape == (5, 10, 3)
+
+def test_alignmentFrame():
+    frame = alignmentFrame([2, 0, 0], [1, 1, 0])
+    assert frame.u2 == pytest.approx([0, 1, 0])
+    assert frame.plane() == pytest.approx((0, 0, 1))
+    assert frame.polarToCartesian([[1, 0], [2, 90]]) == pytest.approx(np.array([[1, 0, 0], [0, 2, 0]]))
+    rng = np.random.default_rng(3)
+    polar = np.column_stack((rng.uniform(0, 2, 20), rng.uniform(-179, 179, 20)))
+    tilted = alignmentFrame.fromSpherical([1, 30, 60], [1, 120, 80])
+    assert tilted.cartesianToPolar(tilted.polarToCartesian(polar)) == pytest.approx(polar)
+    assert tilted.outOfPlane(tilted.polarToCartesian(polar)) == pytest.approx(np.zeros(20), abs=1e-12)
+    cartesian = rng.normal(size=(20, 3))
+    assert tilted.fromFrame(tilted.toFrame(cartesian)) == pytest.approx(cartesian)
+    with pytest.raises(Exception, match="parallel"):
+        alignmentFrame([1, 0, 0], [2, 0, 0])
+
+def test_matchesInstrument(magnet):
+    magnet.setSampleAlignmentVector(1, 1, 30, 60)
+    magnet.setSampleAlignmentVector(2, 1, 120, 80)
+    frame = alignmentFrame.fromMagnet(magnet)
+    assert frame.plane() == pytest.approx(magnet.getSampleAlignmentPlane(), abs=1e-5)
+    magnet.setTargetToPolar(0.3, 40)
+    target = magnet.getTargetFieldCartesian()
+    assert frame.polarToCartesian([0.3, 40]) == pytest.approx(target, abs=1e-5)
+    assert cartesianToSpherical(target) == pytest.approx(magnet.getTargetFieldSpherical(), abs=1e-4)
+    magnet.enablePauseMode()
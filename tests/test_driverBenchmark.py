@@ -0,0 +1,31 @@
+import json
+from benchmarks.driverBenchmark import compareResults, uncoveredMethods, main
+
+def test_compareResults():
+    baseline = {'results': {'a': {'wallTime': 0.1, 'roundTrips': 2, 'sleepTime': 0.0},
+                            'b': {'wallTime': 0.001, 'roundTrips': 2, 'sleepTime': 0.0}}}
+    current = {'results': {'a': {'wallTime': 0.2, 'roundTrips': 2, 'sleepTime': 0.0},
+                           'b': {'wallTime': 0.002, 'roundTrips': 3, 'sleepTime': 0.0},
+                           'c': {'wallTime': 5.0, 'roundTrips': 9, 'sleepTime': 1.0}}}
+    #b's doubled wall time is below the noise floor; c has no baseline
+    assert compareResults(current, baseline) == [('a', 'wallTime', 0.1, 0.2), ('b', 'roundTrips', 2, 3)]
+    assert compareResults(baseline, baseline) == []
+
+def test_allMethodsCovered():
+    assert uncoveredMethods() == []
+
+def test_runAgainstSimulator(tmp_path, capsys):
+    output = tmp_path / 'results.json'
+    assert main(['--repeat', '1', '--sweep-sizes', '5', '--output', str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results['meta']['queryInterval'] == 0.01
+    assert results['results']['method.getState']['roundTrips'] == 2
+    sweep = results['results']['sweep.5']
+    assert sweep['calls'] == 5 and sweep['wallTime'] >= sweep['rampTime'] > 0
+    assert 'sweep.5' in capsys.readouterr().out
+    #A baseline with every benchmark twice as slow flags nothing
+    for result in results['results'].values():
+        for metric in ('wallTime', 'roundTrips', 'sleepTime'):
+            result[metric] *= 2
+    output.write_text(json.dumps(results))
+    assert main(['--repeat', '1', '--sweep-sizes', '5', '--baseline', str(output)]) == 0
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.fieldLimits import fieldLimits
+from MultiAxisClass.fieldSweep import fieldSweep
+
+@pytest.fixture
+def limits():
+    return fieldLimits(1.0, 1.0, 9.0, 9.0)
+
+def test_checkCartesian(limits):
+    assert limits.checkCartesian(0.5, -1.0, 8) == 0
+    assert limits.checkCartesian(0, 0, 9.5) == -152
+    assert limits.checkCartesian(1.5, 0, 0) == -155
+    assert limits.checkCartesian(0, -1.5, 0) == -157
+    assert limits.checkCartesian(0, 0, -9.5) == -152
+    assert fieldLimits(1.0, 1.0, None, 1.0).checkCartesian(0, 0, 0.1) == -160
+
+def test_checkSpherical(limits):
+    assert limits.checkSpherical(-1, 0, 0) == -153
+    assert limits.checkSpherical(1, 0, 181) == -154
+    assert limits.checkSpherical(2, 0, 90) == -155
+    assert limits.checkSpherical(2, 90, 90) == -157
+    assert fieldLimits(1.0, 1.0, None, 1.0).checkSpherical(1, 45, 90) == 0
+
+def test_checkPolar(limits):
+    assert limits.checkPolar(10, 0) == -152
+    assert limits.checkPolar(2, 0) == 0
+    assert limits.checkPolar(2, 0, (1, 0, 0), (0, 0, 1)) == -155
+    assert limits.checkPolar(2, 90, (1, 0, 0), (0, 0, 1)) == 0
+
+def test_parallelAlignment(limits):
+    parallel = ((1, 0, 0), (2, 0, 0))
+    with pytest.raises(Exception, match='parallel'):
+        limits.checkPolar(0.5, 0, *parallel)
+    with pytest.raises(Exception, match='parallel'):
+        limits.validatePolar([(0.5, 0)], *parallel)
+
+def test_validateMatchesScalar(limits):
+    rng = np.random.default_rng(2)
+    cartesian = rng.uniform(-10, 10, (2000, 3))
+    assert limits.validateCartesian(cartesian).tolist() == [limits.checkCartesian(*p) for p in cartesian]
+    spherical = np.column_stack((rng.uniform(-1, 10, 2000), rng.uniform(-180, 180, 2000), rng.uniform(-10, 190, 2000)))
+    assert limits.validateSpherical(spherical).tolist() == [limits.checkSpherical(*p) for p in spherical]
+    polar = np.column_stack((rng.uniform(-1, 10, 2000), rng.uniform(-180, 180, 2000)))
+    alignment = ((1, 0, 0), (1, 1, 1))
+    assert limits.validatePolar(polar, *alignment).tolist() == [limits.checkPolar(*p, *alignment) for p in polar]
+
+def test_units(limits):
+    kilogauss = limits.inUnits(0)
+    assert kilogauss.coilLimits == (10, 10, 90) and kilogauss.magnitudeLimit == 90
+    assert kilogauss.checkCartesian(15, 0, 0) == -155
+
+def test_vectorMagnetRejectsLocally():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(), queryInterval=0.01)
+    magnet.initialize_program()
+    try:
+        magnet.connect()
+        #Tighter than the simulated instrument, so only the client-side check can reject these
+        magnet.setFieldLimits(0.5, 0.5, 1, 1)
+        with pytest.raises(Exception, match=str(magnet.xCoilLimitError)):
+            magnet.setTargetFieldCartesian(0.6, 0, 0)
+        with pytest.raises(Exception, match=str(magnet.magnitudeLimitError)):
+            magnet.setTargetFieldSpherical(2, 0, 0)
+        with pytest.raises(Exception, match="rows \\[1\\]"):
+            fieldSweep(magnet, [[0, 0, 0.5], [0, 0.7, 0]])
+        assert magnet.getTargetFieldCartesian() == (0, 0, 0)
+        magnet.setTargetFieldCartesian(0.4, 0, 0)
+        assert magnet.getTargetFieldCartesian() == pytest.approx((0.4, 0, 0))
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
@@ -0,0 +1,90 @@
+import time
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.fieldLog import fieldLogRecorder, fieldLogReader
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_appendGrowAndSlice(tmp_path):
+    filePath = str(tmp_path / 'field.log')
+    recorder = fieldLogRecorder(None, filePath, chunkSize=4)
+    for i in range(10):
+        recorder.append(1000.0 + i, (0.1*i, 0, -0.1*i), 2)
+    assert recorder.capacity == 12
+    #Only flushed samples are visible to readers
+    recorder.flush()
+    recorder.append(1010.0, (1, 1, 1), 1)
+    reader = fieldLogReader(filePath)
+    assert len(reader) == 10
+    recorder.close()
+    reader.refresh()
+    assert len(reader) == 11
+
+    samples = reader.timeRange(1003.0, 1006.0)
+    assert list(samples['time']) == [1003.0, 1004.0, 1005.0]
+    assert tuple(samples['field'][0]) == pytest.approx((0.3, 0, -0.3))
+    assert list(reader.timeRange(1009.5)['state']) == [1]
+
+    #Reopening appends after the existing samples
+    with fieldLogRecorder(None, filePath, chunkSize=4) as recorder:
+        recorder.append(1011.0, (0, 0, 0), 3)
+    reader.refresh()
+    assert len(reader) == 12 and reader[11]['state'] == 3
+    with pytest.raises(Exception, match="holds cartesian"):
+        fieldLogRecorder(None, filePath, coordinates='spherical')
+
+def test_clockStepBack(magnet, tmp_path, monkeypatch):
+    filePath = str(tmp_path / 'field.log')
+    with fieldLogRecorder(None, filePath) as recorder:
+        recorder.append(time.time() + 3600, (0, 0, 0), 2)
+    #Appending after the wall clock went back an hour still continues in order
+    with fieldLogRecorder(magnet, filePath) as recorder:
+        recorder.sample()
+        monkeypatch.setattr(time, 'time', lambda: 0.0)
+        recorder.sample()
+    times = fieldLogReader(filePath).timeRange()['time']
+    assert len(times) == 3 and (np.diff(times) >= 0).all()
+
+def test_recordFromMagnet(magnet, tmp_path):
+    filePath = str(tmp_path / 'field.log')
+    units = magnet.getUnits()
+    recorder = fieldLogRecorder(magnet, filePath, coordinates='spherical', interval=0.05)
+    recorder.start()
+    while recorder.count < 3:
+        recorder._stop.wait(0.01)
+    recorder.close()
+    reader = fieldLogReader(filePath)
+    assert len(reader) >= 3
+    assert reader.coordinates == 'spherical' and reader.units == units
+    assert (reader.timeRange()['state'] == magnet.getState()).all()
+
+def test_sphericalFromPollCache(magnet, tmp_path):
+    magnet.setTargetFieldCartesian(0, 0.1, 0.1)
+    magnet.waitUntilHolding(timeout=5)
+    #Refreshes the cached field
+    magnet.getFieldCartesian()
+    recorder = fieldLogRecorder(magnet, str(tmp_path / 'polled.log'), coordinates='spherical')
+    log = magnet.enableTransactionLog()
+    magnet.startPolling(maxStaleness=10)
+    try:
+        for _ in range(3):
+            recorder.sample()
+    finally:
+        magnet.stopPolling()
+        magnet.disableTransactionLog()
+    recorder.close()
+    #FIELD? is never polled, so reading it would cost a query per sample
+    assert 'FIELD' not in [entry.command for entry in log.snapshot()]
+    assert fieldLogReader(str(tmp_path / 'polled.log')).timeRange()['field'][-1] == \
+        pytest.approx(magnet.getFieldSpherical())
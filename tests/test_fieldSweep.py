@@ -0,0 +1,58 @@
+import itertools
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.fieldSweep import fieldSweep, nearestNeighbourOrder, twoOptOrder, pathLength, sphericalToCartesianArray
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=20, queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_sphericalToCartesian():
+    cartesian = sphericalToCartesianArray(np.array([[0.09, -6.5, 56.5], [1, 90, 90]]))
+    assert np.round(cartesian[0], 4) == pytest.approx([0.0746, -0.0085, 0.0497])
+    assert cartesian[1] == pytest.approx([0, 1, 0])
+
+def test_ordering():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-1, 1, (7, 3))
+    nearest = nearestNeighbourOrder(points)
+    assert sorted(nearest) == list(range(7))
+    shortest = twoOptOrder(points, nearest)
+    assert sorted(shortest) == list(range(7))
+    best = min(pathLength(points, np.array(p)) for p in itertools.permutations(range(7)))
+    assert pathLength(points, shortest) <= pathLength(points, nearest) + 1e-12
+    assert pathLength(points, shortest) <= best*1.1
+
+def test_validation(magnet):
+    with pytest.raises(Exception, match="Inclination out of range at rows \\[1\\]"):
+        fieldSweep(magnet, [[0.1, 0, 0], [0.1, 0, 200]], coordinates='spherical')
+    with pytest.raises(Exception, match="non-finite"):
+        fieldSweep(magnet, [[0.1, 0, np.nan]])
+    with pytest.raises(Exception, match="\\(N, 3\\)"):
+        fieldSweep(magnet, [[0.1, 0]])
+
+def test_sweep(magnet):
+    points = np.array([[0.1, 0, 0], [-0.1, 0, 0], [0.11, 0, 0], [-0.11, 0, 0]])
+    sweep = fieldSweep(magnet, points, order='nearest', startField=(0, 0, 0))
+    assert sweep.totalDistance() < pathLength(points, np.arange(4))
+    readbacks = list(sweep)
+    assert [r.index for r in readbacks] == [0, 2, 1, 3]
+    for readback in readbacks:
+        assert readback.state == 2
+        assert readback.field == pytest.approx(points[readback.index])
+
+def test_sphericalSweep(magnet):
+    points = np.array([[0.1, 90, 90], [0.2, 0, 0]])
+    readbacks = list(fieldSweep(magnet, points, coordinates='spherical', dwellTimes=0.01))
+    assert [r.index for r in readbacks] == [0, 1]
+    assert readbacks[0].field == pytest.approx((0.1, 90, 90))
+    assert readbacks[1].field[0] == pytest.approx(0.2)
@@ -0,0 +1,43 @@
+import time
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from FrontEndPython.gui import decimate, sampleHistory, fieldAcquisition
+
+def test_decimateKeepsSpikes():
+    times = np.arange(100000, dtype=float)
+    values = np.zeros(100000)
+    values[54321] = 5.0
+    values[12345] = -3.0
+    keptTimes, keptValues = decimate(times, values, 800)
+    assert len(keptTimes) <= 800
+    assert keptValues.max() == 5.0 and keptValues.min() == -3.0
+    assert (np.diff(keptTimes) >= 0).all()
+    assert len(decimate(times[:10], values[:10], 800)[0]) == 10
+
+def test_historyHalvesWhenFull():
+    history = sampleHistory(capacity=10)
+    for i in range(25):
+        history.append(float(i), (i, 0, 0))
+    rows = history.window(None)
+    assert len(rows) <= 10
+    assert rows[-1, 0] == 24.0 and rows[0, 0] == 0.0
+    assert (np.diff(rows[:, 0]) > 0).all()
+    assert list(history.window(3.5)[:, 0]) == [r for r in rows[:, 0] if r >= 20.5]
+
+def test_acquisitionRunsInBackground():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10), queryInterval=0.01)
+    magnet.startup()
+    acquisition = fieldAcquisition(magnet, interval=0.05)
+    try:
+        magnet.setTargetFieldCartesian(0.1, 0, 0)
+        acquisition.start()
+        sample = acquisition.samples.get(timeout=2)
+        assert sample.state in (1, 2)
+        time.sleep(0.3)
+    finally:
+        acquisition.stop()
+        magnet.exit_program()
+    assert acquisition.history.count >= 3
+    assert acquisition.history.window(None)[-1, 1] == pytest.approx(0.1)
@@ -0,0 +1,34 @@
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisErrors import (MultiAxisError, errorFromString, errorFromCode, errorClasses, QuenchError,
+                                            CoilLimitError, YCoilLimitError, TargetError, MultiAxisTimeoutError,
+                                            ConnectionAttemptTimeoutError)
+
+def test_errorFromString():
+    error = errorFromString('-157,"Field exceeds y-coil limit"\n')
+    assert type(error) is YCoilLimitError
+    assert isinstance(error, CoilLimitError) and isinstance(error, TargetError)
+    assert error.code == -157 and error.axis == 'y'
+    assert str(error) == '-157,"Field exceeds y-coil limit"'
+    assert isinstance(errorFromString('-303,"Quench condition"'), QuenchError)
+
+def test_unknownErrors():
+    error = errorFromString('-999,"Something new"')
+    assert type(error) is MultiAxisError and error.code == -999 and str(error) == '-999,"Something new"'
+    assert str(errorFromString('garbled')) == 'garbled'
+    assert type(errorFromCode(-152)) is errorClasses[-152]
+
+def test_codesMatchInstanceAttributes():
+    magnet = vectorMagnet()
+    assert str(magnet.loadConnectedError) == '-308,"Cannot LOAD while connected"'
+    assert str(magnet.xCoilMissingError) == '-156,"Field requires x-coil"'
+    assert len(errorClasses) == 24
+    for code, errorClass in errorClasses.items():
+        assert errorClass().code == code
+
+def test_timeouts():
+    error = ConnectionAttemptTimeoutError()
+    assert isinstance(error, TimeoutError) and isinstance(error, MultiAxisTimeoutError)
+    assert str(error) == str(vectorMagnet.connectionAttemptTimeout)
+    with pytest.raises(TimeoutError):
+        raise error
@@ -0,0 +1,60 @@
+import threading
+import time
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet, statusSnapshot
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.multiAxisServer import multiAxisServer, multiAxisClient
+from MultiAxisClass.multiAxisErrors import XCoilLimitError
+
+@pytest.fixture(scope="module")
+def server():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=0.04), queryInterval=0.05)
+    magnet.startup()
+    server = multiAxisServer(magnet, port=0)
+    server.start()
+
+    yield server
+
+    server.close()
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_sameMethods(server):
+    with multiAxisClient(port=server.address[1]) as client:
+        client.setTargetFieldCartesian(0, 0, 0.2)
+        assert client.waitUntilHolding(timeout=5) == 2
+        assert client.getFieldCartesian() == pytest.approx((0, 0, 0.2))
+        snapshot = client.getStatusSnapshot()
+        assert isinstance(snapshot, statusSnapshot) and snapshot.state == 2
+        assert client.getIDN() == server.magnet.getIDN()
+        assert not hasattr(client, 'exit_program')
+
+def test_errorsKeepTheirClass(server):
+    with multiAxisClient(port=server.address[1]) as client:
+        with pytest.raises(XCoilLimitError, match=str(XCoilLimitError())):
+            client.setTargetFieldCartesian(5, 0, 0)
+        with pytest.raises(Exception, match="not available"):
+            client._call('exit_program')
+
+def test_coalescing(server):
+    clients = [multiAxisClient(port=server.address[1]) for _ in range(10)]
+    #Hold the pipe so all ten requests arrive while the first read is waiting
+    server.magnet.getState()
+    before = (server.requestCount, server.executeCount)
+    results = [None]*len(clients)
+    def read(index):
+        results[index] = clients[index].getFieldCartesian()
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(len(clients))]
+    blocker = threading.Thread(target=lambda: [server.magnet.getState() for _ in range(3)])
+    blocker.start()
+    time.sleep(0.01)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    blocker.join()
+    for client in clients:
+        client.close()
+    assert server.requestCount - before[0] == 10
+    assert server.executeCount - before[1] < 5
+    assert len(set(results)) == 1
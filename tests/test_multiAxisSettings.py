@@ -0,0 +1,167 @@
+import os
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import multiAxisSimulator, simulatorCommand
+from MultiAxisClass.multiAxisSettings import parseSettings, formatSettings, readSettings, diffSettings, \
+    clearSettingsCache, replaceTables
+from MultiAxisClass.multiAxisErrors import XCoilLimitError, ZCoilMissingError
+
+SAMPLE = """[System]
+Units = 1
+Magnitude Limit = 1.5
+Sample Alignment 1 = "1, 0, 90"
+Sample Alignment 2 = "1, 90, 90"
+Serial = "AMI-1234"
+
+[X Axis]
+Installed = TRUE
+Coil Constant = 0.1
+Current Limit = 10
+Field Limit = 1.0
+Ramp Rate = 0.2
+Switch Installed = TRUE
+
+[Y Axis]
+installed = true
+coil constant = 0.05
+current limit = 20
+field limit = 1.0
+ramp rate = 0.2
+
+[Z Axis]
+Installed = FALSE
+
+[Vector Table]
+Row 2 = "0, 0.5, 0, 10"
+Row 1 = "0.5, 0, 0, 0"
+
+[Polar Table]
+Row 1 = "0.25, 45, 5"
+"""
+
+@pytest.fixture()
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_parse():
+    settings = parseSettings(SAMPLE)
+    assert settings.units == 1
+    assert settings.magnitudeLimit == 1.5
+    assert settings.alignment2 == (1, 90, 90)
+    assert settings.axes[0].switchInstalled and not settings.axes[1].switchInstalled
+    assert settings.axes[1].fieldRampRate == pytest.approx(0.01)
+    assert not settings.axes[2].installed
+    assert settings.vectorTable == ((0.5, 0, 0, 0), (0, 0.5, 0, 10))
+    assert settings.polarTable == ((0.25, 45, 5),)
+    assert settings.raw['System']['serial'] == '"AMI-1234"'
+    limits = settings.fieldLimits()
+    assert limits.coilLimits == (1.0, 1.0, None)
+    assert limits.checkCartesian(0, 0, 0.1) == ZCoilMissingError.code
+    assert settings.rampModel().predict((0, 0, 0), (0.1, 0.05, 0)) == pytest.approx(5.0)
+    assert parseSettings(formatSettings(settings))._replace(raw={}) == settings._replace(raw={})
+
+def test_malformed():
+    with pytest.raises(ValueError, match="magnitude limit"):
+        parseSettings(SAMPLE.replace("Magnitude Limit = 1.5\n", ""))
+    with pytest.raises(ValueError, match="Ramp Rate|ramp rate"):
+        parseSettings(SAMPLE.replace("Ramp Rate = 0.2", "Ramp Rate = fast"))
+    with pytest.raises(ValueError, match="Vector Table"):
+        parseSettings(SAMPLE.replace("Row 2 =", "Row 3 ="))
+    with pytest.raises(ValueError):
+        parseSettings("not a settings file")
+
+def test_readCache(tmp_path):
+    clearSettingsCache()
+    path = tmp_path / 'magnet.sav'
+    path.write_text(SAMPLE)
+    first = readSettings(str(path))
+    assert readSettings(str(path)) is first
+    path.write_text(SAMPLE.replace("Magnitude Limit = 1.5", "Magnitude Limit = 1.25"))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    second = readSettings(str(path))
+    assert second.magnitudeLimit == 1.25
+    assert diffSettings(first, second) == [('magnitudeLimit', 1.5, 1.25)]
+
+def test_diff():
+    old = parseSettings(SAMPLE)
+    new = parseSettings(SAMPLE.replace("Ramp Rate = 0.2\nSwitch", "Ramp Rate = 0.1\nSwitch")
+                        + 'Row 2 = "0.5, 90, 0"\n')
+    assert diffSettings(old, new) == [('axes.x.rampRate', 0.2, 0.1), ('polarTable[2]', None, (0.5, 90, 0))]
+    assert diffSettings(new, new) == []
+
+def test_replaceTables():
+    text = SAMPLE.replace('\n', '\r\n') + '[Network]\r\nAddress = "192.168.0.2"\r\n'
+    replaced = replaceTables(text, [(0.1, 0, 0, 0)], [])
+    assert replaced == text.replace('Row 2 = "0, 0.5, 0, 10"\r\nRow 1 = "0.5, 0, 0, 0"\r\n',
+                                    'Row 1 = "0.1, 0, 0, 0"\r\n').replace('Row 1 = "0.25, 45, 5"\r\n', '')
+    assert parseSettings(replaced).vectorTable == ((0.1, 0, 0, 0),)
+    #Missing sections are added
+    text = SAMPLE.split('[Vector Table]')[0].rstrip('\n')
+    replaced = replaceTables(text, [], [(0.5, 90, 1)])
+    assert replaced.startswith(text + '\n\n[Vector Table]\n')
+    assert parseSettings(replaced).polarTable == ((0.5, 90, 1),)
+
+def test_simulatorRoundTrip(tmp_path):
+    path = str(tmp_path / 'simulated.sav')
+    simulator = multiAxisSimulator(rampRate=0.05, coilLimits=(1.0, 0.0, 2.0), magnitudeLimit=2.0)
+    simulator.handleLine('CONF:UNITS 0')
+    simulator.handleLine('SAVE:SET ' + path)
+    settings = readSettings(path)
+    assert settings.units == 0
+    assert settings.axes[0].fieldLimit == pytest.approx(10.0)
+    assert not settings.axes[1].installed
+    assert settings.axes[2].fieldRampRate == pytest.approx(0.5)
+    loaded = multiAxisSimulator()
+    loaded.handleLine('LOAD:SET ' + path)
+    assert loaded.handleLine('SYST:ERR:COUN?') == '0'
+    assert (loaded.units, loaded.coilLimits, loaded.rampRate) == (0, pytest.approx((1.0, 0.0, 2.0)), pytest.approx(0.05))
+
+def test_loadSettings(magnet, tmp_path):
+    path = tmp_path / 'magnet.sav'
+    path.write_text(SAMPLE)
+    magnet.loadSettings(str(path))
+    assert magnet.settings.magnitudeLimit == 1.5
+    assert magnet.getUnits() == 1
+    magnet.connect()
+    with pytest.raises(XCoilLimitError):
+        magnet.setTargetFieldCartesian(1.2, 0, 0)
+    #The simulator loaded the same limits
+    magnet.fieldLimits = None
+    with pytest.raises(XCoilLimitError):
+        magnet.setTargetFieldCartesian(1.2, 0, 0)
+
+def test_loadSettingsNotParsed(magnet, tmp_path):
+    path = tmp_path / 'magnet.sav'
+    path.write_text(SAMPLE)
+    magnet.loadSettings(str(path))
+    assert magnet.fieldLimits is not None and magnet.getUnits() == 1
+    #A file that cannot be parsed leaves nothing behind from the previous one
+    path.write_text(SAMPLE.replace("Magnitude Limit = 1.5\n", ""))
+    clearSettingsCache()
+    with pytest.raises(Exception):
+        with magnet.deferredErrorChecks():
+            magnet.loadSettings(str(path))
+    assert (magnet.settings, magnet.fieldLimits, magnet.fieldUnits) == (None, None, None)
+    assert magnet.configCache.get(b'UNITS') is None
+
+def test_loadSettingsUserLimits(magnet, tmp_path, caplog):
+    path = tmp_path / 'magnet.sav'
+    path.write_text(SAMPLE.replace("Magnitude Limit = 1.5\n", ""))
+    magnet.setFieldLimits(0.5, 0.5, 0.5, 0.5)
+    userLimits = magnet.fieldLimits
+    #Nothing to replace them with, so the user's limits stay
+    with pytest.raises(Exception):
+        with magnet.deferredErrorChecks():
+            magnet.loadSettings(str(path))
+    assert magnet.fieldLimits is userLimits
+    path.write_text(SAMPLE)
+    clearSettingsCache()
+    magnet.loadSettings(str(path))
+    assert magnet.fieldLimits.magnitudeLimit == 1.5
+    assert "replaced" in caplog.text
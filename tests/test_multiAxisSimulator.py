@@ -0,0 +1,112 @@
+import pytest
+import time
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import multiAxisSimulator, simulatorCommand
+
+class fakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return fakeClock()
+
+@pytest.fixture
+def simulator(clock):
+    simulator = multiAxisSimulator(rampRate=0.1, clock=clock, sleep=clock.sleep)
+    simulator.handleLine('SYST:CONN')
+    return simulator
+
+def test_connectState(clock):
+    simulator = multiAxisSimulator(connectDelay=2, clock=clock, sleep=clock.sleep)
+    assert simulator.handleLine('STATE?') == '0'
+    simulator.handleLine('SYST:CONN')
+    assert simulator.handleLine('STATE?') == '0'
+    clock.now = 2
+    assert simulator.handleLine('STATE?') == '3'
+
+def test_errorQueue(simulator):
+    assert simulator.handleLine('SYST:ERR:COUN?') == '0'
+    assert simulator.handleLine('SYST:ERR?') == '0,"No error"'
+    simulator.handleLine('LOAD:SET C:\\config.sav')
+    simulator.handleLine('CONF:UNITS 0')
+    assert simulator.handleLine('SYST:ERR:COUN?') == '2'
+    assert simulator.handleLine('SYST:ERR?') == '-304,"No units change while connected"'
+    assert simulator.handleLine('SYST:ERR?') == '-308,"Cannot LOAD while connected"'
+    simulator.handleLine('BOGUS')
+    assert simulator.handleLine('BOGUS?') == ''
+    simulator.handleLine('*CLS')
+    assert simulator.handleLine('SYST:ERR:COUN?') == '0'
+
+def test_targetLimits(simulator):
+    simulator.handleLine('CONF:TARG:VEC:CART 2,0,0')
+    simulator.handleLine('CONF:TARG:VEC -1,0,0')
+    simulator.handleLine('CONF:TARG:VEC 1,0,190')
+    simulator.handleLine('CONF:TARG:VEC 10,0,0')
+    errors = [simulator.handleLine('SYST:ERR?') for _ in range(4)]
+    assert [int(e.split(',')[0]) for e in errors] == [-152, -154, -153, -155]
+    assert simulator.vectorTable == []
+
+def test_ramp(simulator, clock):
+    simulator.handleLine('CONF:TARG:VEC:CART 0.3,0,0.4')
+    assert simulator.handleLine('STATE?') == '1'
+    assert float(simulator.handleLine('TARG:TIME?')) == pytest.approx(5)
+    clock.now = 2.5
+    Bx, By, Bz = (float(e) for e in simulator.handleLine('FIELD:CART?').split(','))
+    assert (Bx, By, Bz) == pytest.approx((0.15, 0, 0.2))
+    simulator.handleLine('PAUSE')
+    clock.now = 10
+    assert simulator.handleLine('STATE?') == '3'
+    simulator.handleLine('RAMP')
+    clock.now = 12.5
+    assert simulator.handleLine('STATE?') == '2'
+    r, phi, theta = (float(e) for e in simulator.handleLine('FIELD?').split(','))
+    assert (r, phi, theta) == pytest.approx((0.5, 0, 36.8698976))
+    simulator.handleLine('CONF:UNITS 0')
+    simulator.handleLine('ZERO')
+    clock.now = 20
+    assert simulator.handleLine('STATE?') == '5'
+
+def test_vectorTable(simulator, clock):
+    simulator.handleLine('CONF:TARG:VEC 0.09,-6.5,56.5')
+    simulator.handleLine('CONF:TARG:VEC:CART 0.1,0,0,5')
+    simulator.handleLine('CONF:TARG:VEC:TAB 1')
+    Bx, By, Bz = (float(e) for e in simulator.handleLine('TARG:CART?').split(','))
+    assert (round(Bx, 4), round(By, 4), round(Bz, 4)) == (0.0746, -0.0085, 0.0497)
+    simulator.handleLine('CONF:TARG:VEC:TAB 3')
+    assert simulator.handleLine('SYST:ERR?') == '-105,"Value out of range"'
+
+def test_polarTarget(simulator):
+    simulator.handleLine('CONF:ALIGN1 1,0,90')
+    simulator.handleLine('CONF:ALIGN2 1,0,0')
+    assert simulator.handleLine('PLANE?') == '0,-1,0'
+    simulator.handleLine('CONF:TARG:POL 0.2,90')
+    Bx, By, Bz = (float(e) for e in simulator.handleLine('TARG:CART?').split(','))
+    assert (Bx, By, Bz) == pytest.approx((0, 0, 0.2))
+
+def test_queryInterval(clock):
+    simulator = multiAxisSimulator(queryInterval=1.0, clock=clock, sleep=clock.sleep)
+    simulator.handleLine('STATE?')
+    simulator.handleLine('SYST:ERR:COUN?')
+    simulator.handleLine('FIELD?')
+    assert clock.now == pytest.approx(1.0)
+    assert simulator.handleLine('SIM:VIOL?') == '1'
+
+def test_vectorMagnetAgainstSimulator():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10))
+    magnet.initialize_program()
+    try:
+        assert magnet.connect() == 3
+        magnet.setTargetFieldCartesian(0.1, 0.2, 0.3)
+        time.sleep(0.1)
+        Bx, By, Bz = magnet.getFieldCartesian()
+        assert (Bx, By, Bz) == pytest.approx((0.1, 0.2, 0.3))
+        with pytest.raises(Exception, match=str(magnet.magnitudeLimitError)):
+            magnet.setTargetFieldCartesian(0, 0, 10)
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
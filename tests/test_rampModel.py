@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.fieldSweep import fieldSweep
+from MultiAxisClass.rampModel import rampModel
+
+RAMP_RATE = 1.0
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=RAMP_RATE, queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_predict():
+    model = rampModel((0.1, 0.2, None))
+    assert model.predict((0, 0, 0), (0.1, 0, 0)) == pytest.approx(1.0)
+    assert model.predict((0, 0, 0), (0.1, 0.4, 5)) == pytest.approx(2.0)
+    assert model.predict((0, 0, 0), (0, 0, 0)) == 0.0
+    starts = np.zeros((3, 3))
+    targets = np.array([[0.1, 0, 0], [0, 0.1, 0], [-0.2, 0.2, 0]])
+    assert model.predict(starts, targets) == pytest.approx([1.0, 0.5, 2.0])
+    assert rampModel(vectorRate=0.5).predict((0, 0, 0), (0.3, 0.4, 0)) == pytest.approx(1.0)
+    assert rampModel.fromCurrentRates((0.1, 0.2, 0.05), (0.1, 0.05, 0.2)).axisRates == pytest.approx((0.01, 0.01, 0.01))
+    with pytest.raises(Exception):
+        rampModel()
+    with pytest.raises(Exception):
+        rampModel((0.1, 0, 0.1))
+
+def test_predictPath():
+    model = rampModel((0.1, 0.1, 0.1), overhead=2.0)
+    points = np.array([[0.1, 0, 0], [0.1, 0, 0], [0.1, 0.3, 0]])
+    assert model.predictPath(points, start=(0, 0, 0)) == pytest.approx([3.0, 0.0, 5.0])
+
+def test_calibrate():
+    model = rampModel((1, 1, 1))
+    rng = np.random.default_rng(4)
+    for _ in range(20):
+        start, target = rng.uniform(-1, 1, (2, 3))
+        model.observe(start, target, 1.5 + 2*np.abs(target - start).max())
+    assert model.calibrate() == pytest.approx((2.0, 1.5))
+    assert model.residuals() == pytest.approx(np.zeros(20), abs=1e-9)
+    #Too few observations keep the previous values
+    assert rampModel((1, 1, 1), overhead=3.0).calibrate() == (1.0, 3.0)
+
+def test_simulatedSweep(magnet):
+    points = np.array([[0.2, 0, 0], [0.2, 0.2, 0], [0, 0, 0.3], [0, 0, 0]])
+    model = rampModel(vectorRate=RAMP_RATE)
+    sweep = fieldSweep(magnet, points, startField=magnet.getFieldCartesian(), rampModel=model)
+    predicted = sweep.estimatedDuration()
+    readbacks = list(sweep)
+    assert [r.state for r in readbacks] == [2, 2, 2, 2]
+    #Arrival is noticed at most a few query intervals after the ramp ends
+    assert readbacks[-1].elapsed == pytest.approx(predicted, abs=0.25)
+    scale, overhead = model.calibrate()
+    assert scale == pytest.approx(1.0, abs=0.3)
+    assert np.abs(model.residuals()).max() < 0.1
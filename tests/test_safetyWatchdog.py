@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.safetyWatchdog import safetyWatchdog
+
+@pytest.fixture
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=1, queryInterval=0.015, switchTime=0.2),
+                          queryInterval=0.02)
+    magnet.startup()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_quench(magnet):
+    detected = threading.Event()
+    watchdog = safetyWatchdog(magnet, quenchAction=None)
+    watchdog.addCallback('quench', lambda event: detected.set())
+    watchdog.start()
+    try:
+        time.sleep(0.1)
+        quenchTime = time.time()
+        magnet._sendUnsafeCommand(b'SIM:QUENCH')
+        assert detected.wait(timeout=2)
+    finally:
+        watchdog.stop()
+    quench = [event for event in watchdog.events if event.kind == 'quench']
+    assert len(quench) == 1
+    assert quench[0].detectedAt - quenchTime < 2*watchdog.interval + 0.05
+    report = watchdog.latencyReport()
+    assert report['samples'] >= 2 and report['failures'] == 0
+    assert report['maxDetectionLatency'] <= report['maxSampleGap']
+
+def test_defaultQuenchAction(magnet, caplog):
+    watchdog = safetyWatchdog(magnet, maxEvents=2)
+    watchdog.start()
+    try:
+        magnet._sendUnsafeCommand(b'SIM:QUENCH')
+        deadline = time.monotonic() + 2
+        while watchdog.lastState != 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watchdog.stop()
+    assert [event.kind for event in watchdog.events] == ['quench', 'state']
+    #Nothing was sent that the quenched magnet would reject
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert magnet.getErrorCount() == 0
+    for state in (7, 8, 2):
+        watchdog.check(state, (0, 0, 0))
+    assert len(watchdog.events) == 2 and watchdog.latencyReport()['events'] == 7
+
+def test_fieldLimitPauses(magnet):
+    watchdog = safetyWatchdog(magnet, fieldLimit=0.1)
+    magnet.setTargetFieldCartesian(0, 0, 0.5)
+    watchdog.start()
+    try:
+        deadline = time.monotonic() + 2
+        while not watchdog.events and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watchdog.stop()
+    assert watchdog.events[0].kind == 'field'
+    assert magnet.getState() == 3
+    #Paused short of the target
+    assert magnet.getFieldCartesian()[2] < 0.3
+
+def test_switchAndCommandsNotStarved(magnet):
+    magnet.setTargetFieldCartesian(0, 0, 0.01)
+    magnet.waitUntilHolding(timeout=5)
+    watchdog = safetyWatchdog(magnet)
+    watchdog.start()
+    try:
+        magnet.enablePersistentMode(True)
+        #User queries still get through at about one per free slot
+        start = time.monotonic()
+        for _ in range(5):
+            magnet.getState()
+        assert time.monotonic() - start < 5*watchdog.interval
+        time.sleep(0.3)
+    finally:
+        watchdog.stop()
+    kinds = [event.kind for event in watchdog.events]
+    assert 'switch' in kinds and 'quench' not in kinds
@@ -0,0 +1,91 @@
+import subprocess
+import sys
+import time
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.multiAxisErrors import ProgramExitedError
+from MultiAxisClass.sessionRecording import readSession, replayProcess, recordingProcess, HEADER, RECORD, MAGIC, SENT, RECEIVED
+
+def writeSession(path, events):
+    with open(path, 'wb') as sessionFile:
+        sessionFile.write(HEADER.pack(MAGIC, 0.0))
+        for timestamp, direction, data in events:
+            sessionFile.write(RECORD.pack(timestamp, direction, len(data)) + data)
+
+def runSession(magnet):
+    magnet.initialize_program()
+    magnet.connect()
+    magnet.setTargetFieldCartesian(0.1, 0, 0.2)
+    results = [magnet.waitUntilHolding(), magnet.getFieldCartesian(), magnet.getStatusSnapshot()[:4]]
+    magnet.exit_program()
+    return results
+
+def test_recordAndReplay(tmp_path):
+    path = str(tmp_path / 'session.vmpipe')
+    recorder = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=2, queryInterval=0.008), queryInterval=0.01,
+                            recordPath=path)
+    recorded = runSession(recorder)
+    startTime, events = readSession(path)
+    assert abs(startTime - time.time()) < 60
+    sent = b''.join(event.data for event in events if event.direction == SENT)
+    assert sent.startswith(b'SYST:CONN\n') and sent.endswith(b'EXIT\n')
+    assert any(event.data == b'2\n' for event in events if event.direction == RECEIVED)
+    assert [event.time for event in events] == sorted(event.time for event in events)
+
+    #exit_program() closed the recording, and restarting must not overwrite it
+    assert recorder.multiSubProcess.recorder.closed
+    with pytest.raises(Exception, match='already recorded'):
+        recorder.initialize_program()
+    assert readSession(path)[1] == events
+
+    magnet = vectorMagnet(queryInterval=0.01, replayPath=path, replaySpeed=None)
+    startTime = time.monotonic()
+    assert runSession(magnet) == recorded
+    assert time.monotonic() - startTime < events[-1].time
+    assert magnet.multiSubProcess.mismatches == []
+    assert magnet.multiSubProcess.wait(timeout=5) == 0
+
+def test_pace(tmp_path):
+    path = str(tmp_path / 'paced.vmpipe')
+    writeSession(path, [(0.0, SENT, b'STATE?\n'), (0.4, RECEIVED, b'1\n'), (1.0, SENT, b'STATE?\n'),
+                        (1.1, RECEIVED, b'2\n')])
+    for speed, low, high in ((1.0, 0.35, 0.8), (10.0, 0.0, 0.2)):
+        replay = replayProcess(path, speed)
+        replay.stdin.write(b'STATE?\n')
+        startTime = time.monotonic()
+        assert replay.stdout.readline() == b'1\n'
+        assert low <= time.monotonic() - startTime < high
+        replay.stdin.write(b'FIELD?\n')
+        assert replay.stdout.readline() == b'2\n'
+        assert replay.stdout.readline() == b''
+        assert replay.poll() == 0
+        assert replay.mismatches == [(1, b'STATE?\n', b'FIELD?\n')]
+
+def test_truncatedRecording(tmp_path):
+    path = tmp_path / 'crashed.vmpipe'
+    writeSession(str(path), [(0.0, SENT, b'*IDN?\n'), (0.1, RECEIVED, b'AMI Multi-Axis\n')])
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [event.data for event in readSession(str(path))[1]] == [b'*IDN?\n']
+    #The replay runs out, like the program exiting
+    magnet = vectorMagnet(queryInterval=0.01, replayPath=str(path), replaySpeed=None)
+    magnet.initialize_program()
+    with pytest.raises(ProgramExitedError):
+        magnet.getIDN()
+    with pytest.raises(ValueError):
+        replayProcess(str(tmp_path / 'crashed.vmpipe'), speed=0)
+    (tmp_path / 'other.bin').write_bytes(b'not a recording at all')
+    with pytest.raises(ValueError):
+        readSession(str(tmp_path / 'other.bin'))
+
+def test_recordingClosedAtEndOfOutput(tmp_path):
+    path = str(tmp_path / 'exited.vmpipe')
+    process = recordingProcess(subprocess.Popen([sys.executable, '-c', 'print("bye")'], stdin=subprocess.PIPE,
+                                                stdout=subprocess.PIPE), path)
+    assert process.stdout.readline().strip() == b'bye'
+    assert not process.recorder.closed
+    assert process.stdout.readline() == b''
+    assert process.recorder.closed
+    process.stdin.close()
+    process._process.wait(timeout=5)
+    assert [event.data.strip() for event in readSession(path)[1]] == [b'bye']
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.fieldSweep import fieldSweep
+from MultiAxisClass import tableManager as tableManagerModule
+from MultiAxisClass.tableManager import tableManager
+from tests.test_multiAxisSettings import SAMPLE
+
+@pytest.fixture()
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=20, queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_reuseRows(magnet, tmp_path):
+    magnet.connect()
+    tables = tableManager(magnet, workDirectory=str(tmp_path))
+    assert tables.setTargetVector(0.1, 0, 0) == 1
+    magnet.waitUntilHolding()
+    assert tables.setTargetVector(0, 0.1, 0, 2.5) == 2
+    magnet.waitUntilHolding()
+    assert tables.setTargetVector(0.1, 0, 0) == 1
+    assert magnet.waitUntilHolding() == 2
+    assert magnet.getFieldCartesian() == pytest.approx((0.1, 0, 0))
+    assert tables.setTargetPolar(0.2, 30) == 1
+    magnet.waitUntilHolding()
+    assert tables.setTargetPolar(0.2, 30) == 1
+    assert (tables.appendedRows, tables.rowTargets) == (3, 2)
+    #The program's tables agree with the mirror
+    mirrored = (list(tables.vectorRows), list(tables.polarRows))
+    tables.refresh()
+    assert (tables.vectorRows, tables.polarRows) == mirrored
+
+def test_upload(magnet, tmp_path):
+    tables = tableManager(magnet, workDirectory=str(tmp_path))
+    assert tables.upload(vectorRows=[(0.1, 0, 0, 0), (0.2, 0, 0, 0)], polarRows=[(0.1, 45, 0)])
+    assert tables.upload(vectorRows=[(0.2, 0, 0, 0), (0.3, 0, 0, 0)])
+    assert tables.vectorRows == [(0.1, 0, 0, 0), (0.2, 0, 0, 0), (0.3, 0, 0, 0)]
+    assert not tables.upload(vectorRows=[(0.3, 0, 0, 0)], polarRows=[(0.1, 45, 0)])
+    assert tables.uploads == 2
+    assert tables.upload(vectorRows=[(0.3, 0, 0, 0)], replace=True)
+    tables.refresh()
+    assert (tables.vectorRows, tables.polarRows) == ([(0.3, 0, 0, 0)], [])
+    with pytest.raises(Exception):
+        tables.upload(vectorRows=[(0.3, 0, 0)])
+
+def test_repeatedSweep(magnet, tmp_path):
+    tables = tableManager(magnet, workDirectory=str(tmp_path))
+    points = np.array([[0.1, 0, 0], [0, 0.1, 0], [0, 0, 0.1]])
+    assert fieldSweep(magnet, points, tables=tables).uploadTable()
+    magnet.connect()
+    for _ in range(2):
+        readbacks = list(fieldSweep(magnet, points, tables=tables))
+        assert [r.field for r in readbacks] == [pytest.approx(point) for point in points]
+    assert (tables.appendedRows, tables.rowTargets) == (0, 6)
+    tables.refresh()
+    assert len(tables.vectorRows) == 3
+
+class savedFileMagnet:
+    """Saves a fixed settings file, like a Multi-Axis with settings the simulator does not model."""
+    def __init__(self, text):
+        self.text = text
+        self.loaded = []
+
+    def saveSettings(self, path):
+        with open(path, 'w', newline='') as settingsFile:
+            settingsFile.write(self.text)
+
+    def loadSettings(self, path):
+        with open(path, newline='') as settingsFile:
+            self.loaded.append(settingsFile.read())
+
+def test_uploadKeepsOtherSettings(tmp_path, monkeypatch):
+    text = SAMPLE.replace('\n', '\r\n').replace('[Y Axis]', 'Quench Detection = "2"\r\n\r\n[Y Axis]')
+    magnet = savedFileMagnet(text)
+    tables = tableManager(magnet, workDirectory=str(tmp_path))
+    assert tables.upload(polarRows=[(0.5, 90, 0)])
+    uploaded = magnet.loaded[-1]
+    assert uploaded.split('[Vector Table]')[0] == text.split('[Vector Table]')[0]
+    assert uploaded.endswith('Row 1 = "0.25, 45, 5"\r\nRow 2 = "0.5, 90, 0"\r\n')
+    #A file that would not load back unchanged is refused
+    monkeypatch.setattr(tableManagerModule, 'replaceTables',
+                        lambda text, vectorTable, polarTable: text.replace('Quench Detection = "2"\r\n', ''))
+    with pytest.raises(Exception):
+        tables.upload(polarRows=[(0.75, 90, 0)])
+    assert len(magnet.loaded) == 1
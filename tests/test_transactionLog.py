@@ -0,0 +1,70 @@
+import json
+import pytest
+from MultiAxisClass.vectorMagnet import vectorMagnet
+from MultiAxisClass.transactionLog import transactionLog, percentile
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=0.04), queryInterval=0.05)
+    magnet.enableTransactionLog()
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_percentile():
+    values = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 99) == 10.0
+    assert percentile(values, 0) == 1.0
+
+def test_ringBuffer():
+    log = transactionLog(capacity=3, slowThreshold=None)
+    for i in range(5):
+        log.record(b'STATE', True, 7, str(i), 0.01*i, 0.0, False)
+    records = log.snapshot()
+    assert [entry.response for entry in records] == ['2', '3', '4']
+    assert log.latencyPercentiles('STATE?')['count'] == 3
+    assert log.latencyPercentiles('FIELD?') == {'count': 0}
+
+def test_recordsTransactions(magnet):
+    magnet.transactionLog.clear()
+    magnet.getState()
+    magnet.getState()
+    magnet.getFieldCartesian()
+    records = magnet.transactionLog.snapshot()
+    #Each query is followed by its SYST:ERR:COUN? check
+    assert [(entry.command, entry.errorCheck) for entry in records] == [
+        ('STATE', False), ('SYST:ERR:COUN', True), ('STATE', False), ('SYST:ERR:COUN', True),
+        ('FIELD:CART', False), ('SYST:ERR:COUN', True)]
+    assert records[0].bytesSent == len(b'STATE?\n')
+    assert records[2].sleepTime > 0
+    stats = magnet.transactionLog.latencyPercentiles()
+    assert stats['STATE?']['count'] == 2
+    assert stats['STATE?']['p50'] <= stats['STATE?']['p99']
+    summary = magnet.transactionLog.summary()
+    assert summary['transactions'] == 6
+    assert summary['errorCheckTransactions'] == 3
+
+def test_errorReadsAreFlagged(magnet):
+    magnet.clearErrorQueue()
+    magnet.transactionLog.clear()
+    with pytest.raises(Exception, match=str(magnet.magnitudeLimitError)):
+        magnet.setTargetFieldCartesian(0, 0, 10)
+    records = magnet.transactionLog.snapshot()
+    assert [entry.command for entry in records if entry.errorCheck] == ['SYST:ERR:COUN', 'SYST:ERR']
+    assert records[0].isQuery is False and records[0].response is None
+
+def test_dump(magnet, tmp_path):
+    magnet.getState()
+    filePath = tmp_path / 'transactions.jsonl'
+    magnet.transactionLog.dump(str(filePath))
+    lines = [json.loads(line) for line in filePath.read_text().splitlines()]
+    assert len(lines) == len(magnet.transactionLog.snapshot())
+    assert set(lines[0]) == {'timestamp', 'command', 'isQuery', 'bytesSent', 'response', 'latency', 'sleepTime',
+                             'errorCheck'}
@@ -6,7 +6,7 @@ from MultiAxisClass.vectorMagnet import vectorMagnet
 def magnet():
     magnet = vectorMagnet()
     magnet.initialize_program()
-    time.sleep(2)
+    magnet.waitUntilReady()
     yield magnet
 
     time.sleep(1)
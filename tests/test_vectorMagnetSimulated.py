@@ -0,0 +1,343 @@
+import pytest
+import sys
+import threading
+import time
+from MultiAxisClass.vectorMagnet import vectorMagnet, rateLimiter
+from MultiAxisClass.multiAxisSimulator import simulatorCommand
+from MultiAxisClass.multiAxisErrors import MultiAxisError, MultiAxisTimeoutError, ProgramExitedError, RampStoppedError
+#Runs the driver against the simulated Multi-Axis program, no hardware needed
+
+@pytest.fixture(scope="module")
+def magnet():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=10, queryInterval=0.04), queryInterval=0.05)
+    magnet.initialize_program()
+    magnet.connect()
+
+    yield magnet
+
+    magnet.exit_program()
+    magnet.multiSubProcess.wait(timeout=5)
+
+def test_rateLimiter():
+    now = [0.0]
+    slept = []
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+    limiter = rateLimiter(1.0, clock=lambda: now[0], sleep=sleep)
+    assert limiter.wait() == 0
+    now[0] += 0.25
+    assert limiter.wait() == pytest.approx(0.75)
+    now[0] += 3
+    assert limiter.wait() == 0
+    assert slept == [pytest.approx(0.75)]
+
+def test_queriesRespectInterval(magnet):
+    magnet.getState()
+    start = time.monotonic()
+    for _ in range(4):
+        magnet.getState()
+    assert time.monotonic() - start >= 3.9*0.05
+    assert magnet._sendUnsafeQuery(b'SIM:VIOL').strip() == '0'
+
+def test_deferredErrorChecks(magnet):
+    magnet.clearErrorQueue()
+    with pytest.raises(Exception, match=str(magnet.magnitudeLimitError)):
+        with magnet.deferredErrorChecks():
+            magnet.setTargetFieldCartesian(0, 0, 10)
+            assert magnet.getErrorCount() == 1
+            magnet.getState()
+    assert magnet.getErrorCount() == 0
+    assert not magnet.deferErrorChecks
+
+def test_deferredErrorChecksPerThread(magnet):
+    errors = []
+    def otherThread():
+        try:
+            magnet.setTargetFieldCartesian(0, 0, 10)
+        except Exception as error:
+            errors.append(error)
+    with magnet.deferredErrorChecks():
+        thread = threading.Thread(target=otherThread)
+        thread.start()
+        thread.join()
+        #The other thread still checked, and drained, its own error
+        assert [str(error) for error in errors] == [str(magnet.magnitudeLimitError)]
+        assert magnet.getErrorCount() == 0
+
+def test_deferredUnitsRejected(magnet):
+    units = magnet.getUnits()
+    #CONF:UNITS is refused while connected, which only shows when the block exits
+    with pytest.raises(MultiAxisError):
+        with magnet.deferredErrorChecks():
+            magnet.configureUnits(1-units)
+            assert magnet.fieldUnits is None
+    assert magnet.fieldUnits is None
+    assert magnet.getUnits() == units
+
+def test_immediateErrorCheck(magnet):
+    with pytest.raises(Exception, match=str(magnet.xCoilLimitError)):
+        magnet.setTargetFieldCartesian(5, 0, 0)
+    assert magnet.getErrorCount() == 0
+
+def test_polling(magnet):
+    magnet.setTargetFieldCartesian(0.1, 0, 0)
+    magnet.startPolling()
+    try:
+        time.sleep(0.5)
+        timestamp, state = magnet.getCachedSample(b'STATE')
+        assert state == 2
+        start = time.monotonic()
+        for _ in range(20):
+            Bx, By, Bz = magnet.getFieldCartesian()
+        #Served from the cache, so far faster than 20 query intervals
+        assert time.monotonic() - start < 0.05*5
+        assert (Bx, By, Bz) == pytest.approx((0.1, 0, 0))
+        #A new target invalidates the cached state
+        beforeTarget = time.monotonic()
+        magnet.setTargetFieldCartesian(0.2, 0, 0)
+        sample = magnet.getCachedSample(b'STATE')
+        assert sample is None or sample[0] >= beforeTarget
+    finally:
+        magnet.stopPolling()
+    assert magnet.getCachedSample(b'FIELD:CART') is not None
+
+def test_concurrentCallers(magnet):
+    magnet.setTargetFieldCartesian(0.1, 0.2, 0.3)
+    time.sleep(0.1)
+    calls = [magnet.getIDN, magnet.getUnits, magnet.getErrorCount, magnet.getFieldCartesian, magnet.getState]
+    expected = [call() for call in calls]
+    results = [[] for _ in calls]
+    def worker(index):
+        for _ in range(3):
+            results[index].append(calls[index]())
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for index, values in enumerate(results):
+        assert values == [expected[index]]*3
+
+def test_waitUntilHolding(magnet):
+    magnet.setTargetFieldCartesian(0, 0, 0)
+    assert magnet.waitUntilHolding(timeout=5) == 2
+    #0.5 T at 10 T/s is a 0.05 s ramp
+    magnet.setTargetFieldCartesian(0.3, 0, 0.4)
+    start = time.monotonic()
+    assert magnet.waitUntilHolding(timeout=5, arrivalMargin=0.02) == 2
+    assert time.monotonic() - start < 0.5
+    assert magnet.getFieldCartesian() == pytest.approx((0.3, 0, 0.4))
+    magnet.enableZeroMode()
+    assert magnet.waitUntilHolding(timeout=5) == 5
+
+def test_waitUntilHoldingStopped(magnet):
+    log = magnet.enableTransactionLog()
+    try:
+        #Within the margin from the start, only STATE? is polled until arrival
+        magnet.setTargetFieldCartesian(0, 0.5, 0)
+        log.clear()
+        assert magnet.waitUntilHolding(timeout=5, arrivalMargin=1.0) == 2
+        queried = [entry.command for entry in log.snapshot() if entry.isQuery and not entry.errorCheck]
+        assert queried.count('TARG:TIME') == 1 and queried[-1] == 'STATE'
+    finally:
+        magnet.disableTransactionLog()
+    magnet.setTargetFieldCartesian(0, 0, 0)
+    magnet.enablePauseMode()
+    with pytest.raises(RampStoppedError):
+        magnet.waitUntilHolding(timeout=5)
+    magnet.enableRampMode()
+    assert magnet.waitUntilHolding(timeout=5) == 2
+
+def test_waitUntilHoldingPolled():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(rampRate=2, queryInterval=0.04), queryInterval=0.05)
+    magnet.initialize_program()
+    try:
+        magnet.connect()
+        calls = []
+        getState = magnet.getState
+        magnet.getState = lambda: (calls.append(None), getState())[1]
+        magnet.startPolling()
+        #A 0.5 s ramp, all of it within the arrival margin
+        magnet.setTargetFieldCartesian(0, 0, 1.0)
+        start = time.monotonic()
+        assert magnet.waitUntilHolding(timeout=5, arrivalMargin=5.0) == 2
+        #About one check per poll interval rather than a spin on the cached sample
+        assert len(calls) <= (time.monotonic() - start)/magnet.pollInterval + 3
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_waitUntilHoldingQuench(magnet):
+    magnet.setTargetFieldCartesian(0.5, 0, 0)
+    magnet._sendUnsafeCommand(b'SIM:QUENCH')
+    with pytest.raises(Exception, match=str(magnet.quenchConditionError)):
+        magnet.waitUntilHolding(timeout=5)
+    #Reconnecting clears the simulated quench for the tests that follow
+    magnet.disconnect()
+    magnet.connect()
+
+def test_configCache(magnet):
+    log = magnet.enableTransactionLog()
+    try:
+        queried = lambda: [entry.command for entry in log.snapshot() if entry.isQuery and not entry.errorCheck]
+        magnet.setSampleAlignmentVector(1, 1, 0, 90)
+        magnet.setSampleAlignmentVector(2, 1, 0, 0)
+        magnet.invalidateConfigCache()
+        log.clear()
+        units = magnet.getUnits()
+        assert magnet.getUnits() == units
+        assert magnet.getIDN() == magnet.getIDN()
+        assert magnet.getSampleAlignmentVectorCartesian(2) == pytest.approx((0, 0, 1))
+        assert magnet.getSampleAlignmentPlane() == pytest.approx((0, -1, 0))
+        magnet.getSampleAlignmentPlane()
+        assert queried() == ['UNITS', '*IDN', 'ALIGN2:CART', 'PLANE']
+        #Only the entries the setter affects are queried again
+        log.clear()
+        magnet.setSampleAlignmentVector(2, 1, 90, 90)
+        assert magnet.getSampleAlignmentVectorCartesian(2) == pytest.approx((0, 1, 0))
+        assert magnet.getSampleAlignmentPlane() == pytest.approx((0, 0, 1))
+        magnet.getUnits()
+        magnet.getIDN()
+        assert queried() == ['ALIGN2:CART', 'PLANE']
+        magnet.invalidateConfigCache()
+        log.clear()
+        magnet.getUnits()
+        assert queried() == ['UNITS']
+        #The persistent flag is never cached
+        log.clear()
+        assert magnet.getPersistentMode() == magnet.getPersistentMode()
+        assert queried() == ['PERS', 'PERS']
+    finally:
+        magnet.disableTransactionLog()
+
+def test_polarLimitsUseAlignment(magnet):
+    magnet.setSampleAlignmentVector(1, 1, 0, 90)
+    magnet.setSampleAlignmentVector(2, 1, 0, 0)
+    magnet.setFieldLimits(1, 1, 0.2, 1.5, units=1)
+    try:
+        #90 degrees from x toward z is along z, beyond the z-coil limit
+        with pytest.raises(type(magnet.zCoilLimitError)):
+            magnet.setTargetToPolar(0.3*10**(1-magnet.getUnits()), 90)
+        assert magnet.getErrorCount() == 0
+    finally:
+        magnet.fieldLimits = None
+
+def test_limitsReadUnits():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(queryInterval=0.008), queryInterval=0.01)
+    magnet.initialize_program()
+    try:
+        magnet.configureUnits(0)
+        #Units changed behind the driver's back, e.g. on the front panel
+        magnet.invalidateConfigCache()
+        assert magnet.fieldUnits is None
+        magnet.setFieldLimits(1.0, 1.0, 1.0, 1.5, units=1)
+        log = magnet.enableTransactionLog()
+        assert magnet.activeFieldLimits().coilLimits == (10.0, 10.0, 10.0)
+        magnet.connect()
+        with pytest.raises(type(magnet.xCoilLimitError)):
+            magnet.setTargetFieldCartesian(12, 0, 0)
+        assert [entry.command for entry in log.snapshot()].count('UNITS') == 1
+        assert magnet.getErrorCount() == 0
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_startup():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(startupDelay=0.3, connectDelay=0.2), queryInterval=0.05)
+    start = time.monotonic()
+    try:
+        assert magnet.startup() == 3
+        assert time.monotonic() - start < 1.5
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_startupProgramExits():
+    magnet = vectorMagnet(multiProgramPath=[sys.executable, '-c', 'pass'], queryInterval=0.05)
+    magnet.initialize_program()
+    try:
+        with pytest.raises(MultiAxisError, match="exited"):
+            magnet.waitUntilReady(timeout=5)
+    finally:
+        magnet.channel.close()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_readTimeout():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(), queryInterval=0.01, readTimeout=0.2)
+    magnet.initialize_program()
+    try:
+        magnet.getState()
+        magnet._sendUnsafeCommand(b'SIM:STALL 0.3')
+        start = time.monotonic()
+        with pytest.raises(MultiAxisTimeoutError):
+            magnet.getState()
+        assert time.monotonic() - start < 0.4
+        #The late answer is discarded, so the next query gets its own response
+        assert magnet.getIDN() == magnet._sendUnsafeQuery(b'*IDN')
+        assert magnet.getState() == 0
+    finally:
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_programExited():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(), queryInterval=0.01, readTimeout=None)
+    magnet.initialize_program()
+    magnet.getState()
+    magnet.multiSubProcess.kill()
+    magnet.multiSubProcess.wait(timeout=5)
+    start = time.monotonic()
+    with pytest.raises(ProgramExitedError, match="exited"):
+        magnet.getState()
+    with pytest.raises(ProgramExitedError):
+        magnet.getFieldCartesian()
+    assert time.monotonic() - start < 1
+    magnet.exit_program()
+
+def test_pollingSurvivesTimeout(caplog):
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(), queryInterval=0.01, readTimeout=0.1)
+    magnet.initialize_program()
+    try:
+        magnet.startPolling()
+        magnet._sendUnsafeCommand(b'SIM:STALL 0.2')
+        time.sleep(0.5)
+        assert magnet._pollThread.is_alive()
+        assert "Polling" in caplog.text
+        assert magnet.getIDN() == magnet._sendUnsafeQuery(b'*IDN')
+    finally:
+        magnet.stopPolling()
+        magnet.exit_program()
+        magnet.multiSubProcess.wait(timeout=5)
+
+def test_pollingStopsWhenProgramExits():
+    magnet = vectorMagnet(multiProgramPath=simulatorCommand(), queryInterval=0.01, readTimeout=None)
+    magnet.initialize_program()
+    magnet.startPolling()
+    thread = magnet._pollThread
+    magnet.multiSubProcess.kill()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert magnet._pollThread is None
+    with pytest.raises(ProgramExitedError):
+        magnet.getState()
+    magnet.exit_program()
+
+def test_statusSnapshot(magnet):
+    magnet.setTargetFieldCartesian(0, 0.2, 0)
+    magnet.waitUntilHolding(timeout=5)
+    log = magnet.enableTransactionLog()
+    try:
+        snapshot = magnet.getStatusSnapshot()
+        assert snapshot.field == pytest.approx((0, 0.2, 0))
+        assert snapshot.target == pytest.approx((0, 0.2, 0))
+        assert snapshot.state == 2 and snapshot.timeToTarget == 0
+        #One error check for the whole transaction
+        assert [entry.command for entry in log.snapshot()] == ['FIELD:CART', 'STATE', 'TARG:CART', 'TARG:TIME',
+                                                              'SYST:ERR:COUN']
+        log.clear()
+        assert magnet.queryMany(b'STATE', b'UNITS', pipelined=True) == [str(snapshot.state), str(magnet.getUnits())]
+        records = log.snapshot()
+        #Both queries went out after a single rate limit wait
+        assert records[1].sleepTime == 0
+    finally:
+        magnet.disableTransactionLog()
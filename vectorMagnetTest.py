@@ -2,10 +2,7 @@ from MultiAxisClass.vectorMagnet import vectorMagnet
 import time
 multiAxisControl = vectorMagnet()
 
-multiAxisControl.initialize_program()
-time.sleep(1)
-multiAxisControl.connect()
-time.sleep(1)
+multiAxisControl.startup()
 a=multiAxisControl.getError()
 # vectorMagnet.time.sleep(1.01)
 # errorCount=multiAxisControl.getErrorCount()